@@ -0,0 +1,146 @@
+"""
+Рассылка на 100 000 получателей без сети: Broadcaster и очередь отправки бота
+поверх фальшивой сессии Bot API и временной БД. Часть получателей заблокировала бота (403),
+часть отвечает ошибкой (400). С --interrupt рассылка прерывается посередине, как при
+остановке бота, и продолжается новым экземпляром Broadcaster с последней контрольной точки.
+
+Запуск из корня репозитория:
+    python -m bench.broadcast --users 100000 --interrupt 0.5
+
+Лимиты отправки берутся из окружения, по умолчанию их нет — меряется сам бот;
+SEND_GLOBAL_RATE=30 даёт время рассылки при лимитах Telegram.
+
+Отчёт: длительность и сообщений в секунду, sent/blocked/failed из broadcasts,
+контрольные точки (число и время записи), повторно отправленные и недоставленные сообщения.
+"""
+from bench.harness import configure, ms, percentile, temp_database
+
+configure()
+
+import argparse
+import asyncio
+import logging
+import math
+import random
+import time
+from collections import Counter
+from typing import List
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import SendMessage
+from config.database import db
+from services.broadcast import Broadcaster
+from utils.sender import sender
+from fakes import BlockingSession
+
+TEXT = "📣 Клиника не работает 4 ноября"
+
+
+class DeliverySession(BlockingSession):
+    """Считает доставленные сообщения по чатам; чаты из failing отвечают 400"""
+
+    def __init__(self, blocked, failing):
+        super().__init__(blocked, record=False)
+        self.failing = set(failing)
+        self.delivered = Counter()
+
+    async def make_request(self, bot, method, timeout=None):
+        if isinstance(method, SendMessage) and method.chat_id in self.failing:
+            raise TelegramBadRequest(method=method, message="Bad Request: chat not found")
+        result = await super().make_request(bot, method, timeout)
+        if isinstance(method, SendMessage):
+            self.delivered[method.chat_id] += 1
+        return result
+
+
+class MeasuredBroadcaster(Broadcaster):
+    """Запоминает время записи каждой контрольной точки (общий список до и после перезапуска)"""
+    checkpoints: List[float] = []
+
+    def _checkpoint(self, conn, *args) -> bool:
+        started = time.perf_counter()
+        try:
+            return Broadcaster._checkpoint(conn, *args)
+        finally:
+            self.checkpoints.append(time.perf_counter() - started)
+
+
+def _add_users(conn, count: int):
+    with conn:
+        conn.executemany("INSERT INTO users (user_id, first_name, last_name) VALUES (?, 'Test', 'User')",
+                         [(user_id,) for user_id in range(1, count + 1)])
+
+
+async def _wait(broadcaster: Broadcaster, broadcast_id: int, done) -> dict:
+    while not done(row := await broadcaster.get(broadcast_id)):
+        await asyncio.sleep(0.05)
+    return row
+
+
+def report(args, elapsed: float, row, session: DeliverySession, blocked: set, failing: set):
+    print(f"\nРассылка #{row['id']}: {row['status']} за {elapsed:.2f} с — "
+          f"{session.requests / elapsed:.0f} сообщений/с")
+    print(f"broadcasts: total={row['total']} sent={row['sent']} blocked={row['blocked']} failed={row['failed']}")
+
+    checkpoints = sorted(MeasuredBroadcaster.checkpoints)
+    print(f"\nКонтрольных точек: {len(checkpoints)} (пачек: {math.ceil(args.users / args.batch_size)}), "
+          f"запись p50/p99/max, мс: " + " ".join(ms(percentile(checkpoints, q)) for q in (0.5, 0.99, 1.0)))
+
+    delivered = session.delivered
+    expected = set(range(1, args.users + 1)) - blocked - failing
+    repeated = sum(count - 1 for count in delivered.values() if count > 1)
+    missing = len(expected - set(delivered))
+    print(f"Доставлено: {len(delivered)} получателям, повторно: {repeated}, не доставлено: {missing}")
+    if len(delivered) != row["sent"] or row["blocked"] != len(blocked) or row["failed"] != len(failing):
+        print("⚠️ Статистика broadcasts расходится с ответами Bot API")
+
+
+async def run(args):
+    db.open()
+    rng = random.Random(args.seed)
+    users = range(1, args.users + 1)
+    blocked = set(rng.sample(users, int(args.users * args.blocked)))
+    failing = set(rng.sample([user_id for user_id in users if user_id not in blocked], int(args.users * args.failed)))
+    await db.run(_add_users, args.users)
+
+    session = DeliverySession(blocked, failing)
+    sender.init(Bot("42:BENCH", session=session))
+    sender.start()
+    print(f"Получателей: {args.users} (заблокировали бота {len(blocked)}, ошибка {len(failing)}), "
+          f"пачка {args.batch_size}, лимит отправки {sender.global_rate:g}/с, воркеров {sender.workers}")
+
+    broadcaster = MeasuredBroadcaster(args.batch_size)
+    started = time.perf_counter()
+    broadcast_id, _ = await broadcaster.start(TEXT, created_by=None)
+    if args.interrupt:
+        row = await _wait(broadcaster, broadcast_id, lambda row: row["last_user_id"] >= args.users * args.interrupt)
+        await broadcaster.close()  # Остановка бота посреди рассылки
+        row = await broadcaster.get(broadcast_id)
+        print(f"Прервана: статус {row['status']}, контрольная точка — пользователь {row['last_user_id']}, "
+              f"отправлено {row['sent']}; продолжает новый экземпляр")
+        broadcaster = MeasuredBroadcaster(args.batch_size)
+        await broadcaster.resume()
+    row = await _wait(broadcaster, broadcast_id, lambda row: row["status"] != "running")
+    await sender.close()
+    report(args, time.perf_counter() - started, row, session, blocked, failing)
+    db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Рассылка на всех пользователей через фальшивую сессию Bot API")
+    parser.add_argument("--users", type=int, default=100_000, help="получателей рассылки")
+    parser.add_argument("--batch-size", type=int, default=100, help="получателей в пачке между контрольными точками")
+    parser.add_argument("--blocked", type=float, default=0.05, help="доля заблокировавших бота (403)")
+    parser.add_argument("--failed", type=float, default=0.01, help="доля получателей с ошибкой отправки (400)")
+    parser.add_argument("--interrupt", type=float, default=0.0,
+                        help="прервать после этой доли получателей и продолжить (0 — без перерыва)")
+    parser.add_argument("--seed", type=int, default=1, help="зерно выбора заблокировавших и ошибочных получателей")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    with temp_database():
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
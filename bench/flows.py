@@ -0,0 +1,97 @@
+"""
+Нагрузочный прогон бота без сети: синтетические Update идут через Dispatcher.feed_update
+в диспетчер работающего бота (main.setup_dispatcher) с фиктивной сессией Bot API
+и временной БД. Сценарии: запись на приём (start → подтверждение), консультация, поддержка.
+
+Запуск из корня репозитория:
+    python -m bench.flows --users 2000 --concurrency 200
+
+Отчёт: обновлений в секунду, p50/p95/p99 обработки обновления по сценариям
+(точные, по каждому feed_update), по обработчикам и ожидание пула БД (по корзинам гистограмм
+bot_handler_seconds и bot_db_wait_seconds — оценка сверху).
+"""
+from bench.harness import (
+    FLOWS, QUANTILES, configure, drive, ms, patients, percentile, start_bot, stop_bot, temp_database
+)
+
+configure()
+
+import argparse
+import asyncio
+import logging
+import random
+import time
+from typing import Dict, List
+from config.database import db
+from utils.fsm_storage import SQLiteStorage
+from utils.metrics import Histogram, metrics
+
+
+def report(elapsed: float, latencies: Dict[str, List[float]], requests: int):
+    total = sum(len(values) for values in latencies.values())
+    print(f"\n{total} обновлений за {elapsed:.2f} с — {total / elapsed:.0f} обновлений/с, "
+          f"{requests} запросов к Bot API")
+
+    print(f"\n{'Сценарий':<42}{'обновл.':>8}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}")
+    for flow in FLOWS:
+        values = sorted(latencies.get(flow, []))
+        if values:
+            print(f"{flow:<42}{len(values):>8}  " + "  ".join(ms(percentile(values, q)) for q in QUANTILES))
+
+    print(f"\n{'Обработчик':<42}{'вызовов':>8}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}")
+    for labels, histogram in sorted(metrics.histograms("bot_handler_seconds").items()):
+        name = dict(labels)["handler"]
+        print(f"{name:<42}{histogram.count:>8}  " + "  ".join(ms(histogram.quantile(q)) for q in QUANTILES))
+    for title, name in (("Ожидание пула БД", "bot_db_wait_seconds"), ("Запросы к Bot API", "bot_api_seconds")):
+        histograms = metrics.histograms(name).values()
+        count = sum(h.count for h in histograms)
+        if not count:
+            continue
+        # Для общей строки корзины всех меток складываются
+        merged = Histogram()
+        for h in histograms:
+            merged.counts = [a + b for a, b in zip(merged.counts, h.counts)]
+            merged.count += h.count
+        print(f"{title:<42}{count:>8}  " + "  ".join(ms(merged.quantile(q)) for q in QUANTILES))
+
+    bookings = metrics.counters("bot_bookings_total")
+    if bookings:
+        print("\nЗаписи: " + ", ".join(f"{dict(labels).get('result', '-')}={int(value)}"
+                                       for labels, value in sorted(bookings.items())))
+
+
+async def run(args):
+    db.open()
+    storage = SQLiteStorage()
+    dp, bot = await start_bot(storage, args.api_latency / 1000)
+
+    weights = [args.booking, args.consultation, args.support]
+    users = patients(args.users, 100000, random.Random(args.seed), weights)
+    print(f"Пациентов: {args.users} (одновременно до {args.concurrency}), "
+          f"сценарии booking/consultation/support = {'/'.join(map(str, weights))}, seed {args.seed}")
+    started = time.perf_counter()
+    latencies = await drive(dp, bot, users, args.concurrency)
+    report(time.perf_counter() - started, latencies, bot.session.requests)
+
+    await stop_bot(bot, storage)
+    db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон сценариев бота через feed_update")
+    parser.add_argument("--users", type=int, default=1000, help="сколько пациентов пройдут сценарии")
+    parser.add_argument("--concurrency", type=int, default=100, help="сколько пациентов действуют одновременно")
+    parser.add_argument("--seed", type=int, default=1, help="зерно выбора сценариев, дней, врачей и слотов")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="задержка ответа Bot API, мс")
+    parser.add_argument("--booking", type=int, default=6, help="доля сценария записи")
+    parser.add_argument("--consultation", type=int, default=2, help="доля сценария консультации")
+    parser.add_argument("--support", type=int, default=2, help="доля сценария поддержки")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    with temp_database():
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Общее для нагрузочных прогонов (python -m bench.<прогон> из корня репозитория):
+окружение бота, временная БД, сценарии пациентов и квантили.
+Настройки бота читаются при импорте config.settings, поэтому модули бота здесь
+импортируются внутри функций — после configure().
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+
+# Фальшивая сессия Bot API, построители Update и заглушка Redis — те же, что в тестах
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests"))
+
+FLOWS = ("booking", "consultation", "support")
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def configure(**env):
+    """
+    Окружение прогона: без сети (эндпоинт метрик, сверка настроек клиники), без антифлуда
+    и лимитов Telegram на отправку — меряется сам бот. Значения из окружения запуска сохраняются,
+    REDIS_URL — только явно переданный.
+    """
+    os.environ.update(REDIS_URL="", METRICS_PORT="0", CONFIG_REFRESH_INTERVAL="0")
+    for key, value in {
+        "THROTTLE_MESSAGE_BURST": "1000",
+        "THROTTLE_CALLBACK_BURST": "1000",
+        "SEND_GLOBAL_RATE": "1000000",
+        "SEND_CHAT_INTERVAL": "0",
+        "SUPPORT_OPERATORS": "9001,9002,9003",
+    }.items():
+        os.environ.setdefault(key, value)
+    os.environ.update(env)
+
+
+@contextmanager
+def temp_database():
+    """Чистая БД во временном каталоге; возвращает путь к файлу"""
+    import config.database as database
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "clinic.db")
+        database.DB_PATH = path
+        database.db.path = path
+        database.init_db()
+        yield path
+
+
+def use_database(path: str):
+    """Подключает процесс к уже созданной БД (воркеры прогона с несколькими процессами)"""
+    import config.database as database
+    database.DB_PATH = path
+    database.db.path = path
+
+
+def patient_script(flow: str, user_id: int, rng: random.Random) -> list:
+    """Последовательность обновлений одного пациента в сценарии flow"""
+    from utils.calendar_engine import calendar
+    from utils.clinic_config import clinic
+    from fakes import callback_update, message_update
+
+    name = "Иван Иванов"
+    if flow == "booking":
+        doctor = rng.choice(list(clinic.doctors))
+        day = rng.choice(calendar.dates()).isoformat()
+        slot = rng.randrange(len(calendar.slots))
+        return [
+            callback_update(user_id, "sign_up"),
+            message_update(user_id, name),
+            callback_update(user_id, f"day_{day}"),
+            callback_update(user_id, f"doctor_{doctor}"),
+            callback_update(user_id, f"time_{slot}_{doctor}"),
+            callback_update(user_id, "confirm"),
+        ]
+    if flow == "consultation":
+        doctor = rng.choice([code for code in clinic.doctors if clinic.chat_id(code)])
+        return [
+            callback_update(user_id, "consultation"),
+            callback_update(user_id, f"consult_{doctor}"),
+            message_update(user_id, name),
+            message_update(user_id, f"Вопрос врачу №{user_id}"),
+        ]
+    return [
+        callback_update(user_id, "support"),
+        message_update(user_id, name),
+        message_update(user_id, f"Обращение №{user_id}"),
+    ]
+
+
+def patients(count: int, first_user_id: int, rng: random.Random, weights: Sequence[int]) -> List[Tuple[str, list]]:
+    """count пациентов с user_id от first_user_id; сценарий каждого выбирается по весам weights"""
+    return [
+        (flow, patient_script(flow, first_user_id + i, rng))
+        for i, flow in enumerate(rng.choices(FLOWS, weights=weights, k=count))
+    ]
+
+
+async def start_bot(storage, api_latency: float = 0.0):
+    """
+    Диспетчер работающего бота поверх фальшивой сессии Bot API (БД уже открыта).
+    Возвращает (dp, bot); api_latency — задержка ответа Bot API в секундах.
+    """
+    from aiogram import Bot
+    from main import setup_dispatcher
+    from middlewares.metrics import ApiMetricsMiddleware
+    from services.support import support_pool
+    from utils.clinic_config import clinic
+    from utils.occupancy import occupancy
+    from utils.sender import sender
+    from fakes import FakeSession
+
+    await clinic.load()
+    await occupancy.load()
+    await support_pool.load()
+    await storage.load()
+    bot = Bot("42:BENCH", session=FakeSession(latency=api_latency, record=False))
+    bot.session.middleware(ApiMetricsMiddleware())
+    dp = setup_dispatcher(storage)
+    sender.init(bot)
+    sender.start()
+    return dp, bot
+
+
+async def stop_bot(bot, storage):
+    from services.support import support_pool
+    from utils.reminders import reminders
+    from utils.sender import sender
+
+    await support_pool.close()
+    await reminders.close()
+    await storage.close()
+    await sender.close()
+    await bot.session.close()
+
+
+async def drive(dp, bot, users: List[Tuple[str, list]], concurrency: int) -> Dict[str, List[float]]:
+    """
+    Пациенты проходят сценарии параллельно (не больше concurrency одновременно),
+    обновления одного пациента — по очереди. Возвращает время каждого feed_update по сценариям.
+    """
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    slots = asyncio.Semaphore(concurrency)
+
+    async def patient(flow: str, updates: list):
+        async with slots:
+            for update in updates:
+                started = time.perf_counter()
+                await dp.feed_update(bot, update)
+                latencies[flow].append(time.perf_counter() - started)
+
+    await asyncio.gather(*(patient(flow, updates) for flow, updates in users))
+    return latencies
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Квантиль по ближайшему рангу; values отсортирован"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, round(q * len(values)) - 1))]
+
+
+def ms(seconds: float) -> str:
+    return f"{seconds * 1000:8.2f}"
@@ -0,0 +1,125 @@
+"""
+Масштабирование по числу процессов бота: N воркеров с общим состоянием в Redis
+(заглушка tests/resp_server.py в отдельном процессе) и общей SQLite-БД вместе
+обслуживают одинаковое число пациентов; для каждого N — обновлений в секунду.
+
+Запуск из корня репозитория:
+    python -m bench.workers --users 2000 --workers 1,2,4
+
+Пропускная способность растёт с N, только пока хватает ядер: на машине с одним ядром
+воркеры делят его между собой и с сервером Redis.
+"""
+from bench.harness import configure, drive, patients, percentile, start_bot, stop_bot, temp_database, use_database
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import random
+import time
+
+# Воркеры — копии родителя (fork): модули бота импортируются в родителе уже с адресом Redis
+_context = multiprocessing.get_context("fork")
+
+
+def _serve_redis(conn):
+    """Процесс сервера Redis; адрес отправляет в conn"""
+    from resp_server import RespServer
+
+    async def serve():
+        server = await RespServer().start()
+        conn.send(server.url)
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+async def _work(index: int, count: int, first_user: int, first_update: int, args, barrier) -> tuple:
+    from config.database import db
+    from utils.fsm_storage import create_storage
+    from utils.shared_state import shared_state
+    from fakes import start_ids
+
+    start_ids(first_update)
+    db.open()
+    storage = create_storage()  # С REDIS_URL — общее для воркеров хранилище FSM
+    dp, bot = await start_bot(storage)
+    users = patients(count, first_user, random.Random(args.seed + index), [args.booking, args.consultation, args.support])
+
+    barrier.wait()  # Все воркеры начинают одновременно
+    started = time.time()
+    latencies = await drive(dp, bot, users, args.concurrency)
+    finished = time.time()
+
+    await stop_bot(bot, storage)
+    await shared_state.close()
+    db.close()
+    return started, finished, [value for values in latencies.values() for value in values]
+
+
+def _worker(index: int, count: int, first_user: int, first_update: int, db_path: str, args, barrier, results):
+    logging.basicConfig(level=logging.WARNING)
+    use_database(db_path)
+    results.put(asyncio.run(_work(index, count, first_user, first_update, args, barrier)))
+
+
+def run_round(workers: int, round_index: int, args) -> tuple:
+    """Один прогон: args.users пациентов на workers процессов; (обновлений, секунд, задержки)"""
+    barrier = _context.Barrier(workers + 1)
+    results = _context.Queue()
+    with temp_database() as path:
+        processes = []
+        for index in range(workers):
+            count = args.users // workers + (index < args.users % workers)
+            first_user = 100000 + round_index * args.users + index * (args.users // workers + 1)
+            first_update = (round_index * 64 + index + 1) * 10_000_000  # update_id не пересекаются между воркерами
+            processes.append(_context.Process(
+                target=_worker, args=(index, count, first_user, first_update, path, args, barrier, results)
+            ))
+        for process in processes:
+            process.start()
+        barrier.wait()
+        reports = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+    latencies = sorted(value for _, _, values in reports for value in values)
+    elapsed = max(finished for _, finished, _ in reports) - min(started for started, _, _ in reports)
+    return len(latencies), elapsed, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пропускная способность бота в зависимости от числа процессов")
+    parser.add_argument("--users", type=int, default=2000, help="пациентов в каждом прогоне (делятся между воркерами)")
+    parser.add_argument("--workers", default="1,2,4", help="числа воркеров через запятую")
+    parser.add_argument("--concurrency", type=int, default=100, help="одновременных пациентов в каждом воркере")
+    parser.add_argument("--seed", type=int, default=1, help="зерно выбора сценариев, дней, врачей и слотов")
+    parser.add_argument("--booking", type=int, default=6, help="доля сценария записи")
+    parser.add_argument("--consultation", type=int, default=2, help="доля сценария консультации")
+    parser.add_argument("--support", type=int, default=2, help="доля сценария поддержки")
+    args = parser.parse_args()
+    counts = [int(part) for part in args.workers.split(",") if part.strip()]
+
+    logging.basicConfig(level=logging.WARNING)
+    receiver, sender = _context.Pipe(duplex=False)
+    server = _context.Process(target=_serve_redis, args=(sender,), daemon=True)
+    server.start()
+    url = receiver.recv()
+    configure(REDIS_URL=url)
+
+    print(f"Пациентов в прогоне: {args.users}, ядер: {os.cpu_count()}, Redis: {url}")
+    print(f"\n{'воркеров':>8}{'обновл.':>10}{'сек':>8}{'обновл./с':>12}{'p50, мс':>10}{'p99, мс':>10}")
+    baseline = None
+    for round_index, workers in enumerate(counts):
+        updates, elapsed, latencies = run_round(workers, round_index, args)
+        rate = updates / elapsed
+        baseline = baseline or rate
+        print(f"{workers:>8}{updates:>10}{elapsed:>8.2f}{rate:>12.0f}"
+              f"{percentile(latencies, 0.5) * 1000:>10.2f}{percentile(latencies, 0.99) * 1000:>10.2f}"
+              f"   ×{rate / baseline:.2f}")
+    server.terminate()
+
+
+if __name__ == "__main__":
+    main()
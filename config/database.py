@@ -1,9 +1,193 @@
 import sqlite3
 import logging
+import asyncio
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from config.settings import DB_PATH, DB_POOL_SIZE, DOCTORS, DOCTOR_TITLES
+from utils.calendar_engine import DAY_NAMES, DEFAULT_SCHEDULE
+from utils.metrics import metrics
 
-def init_db():
+# «SELECT ... FROM appointments» -> «select appointments»: метка операции для метрик
+_STATEMENT_RE = re.compile(
+    r"^\s*(\w+)(?:.*?\b(?:FROM|INTO|TABLE|INDEX)\s+(?:IF (?:NOT )?EXISTS\s+)?|\s+)(\w+)", re.I | re.S
+)
+
+
+class DatabasePool:
+    """Пул долгоживущих соединений SQLite, запросы выполняются вне event loop"""
+
+    def __init__(self, path: str = DB_PATH, size: int = DB_POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._connections = queue.Queue()
+        self._executor = None
+        self._local = threading.local()  # Метка текущей операции в потоке пула
+
+    def _connect(self) -> sqlite3.Connection:
+        # Соединение настраивается один раз при создании, а не на каждый запрос
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.set_trace_callback(self._trace)
+        return conn
+
+    def _trace(self, statement: str):
+        # Первый запрос операции определяет её метку; BEGIN/COMMIT пропускаем
+        if self._local.label is None and not statement.startswith(("BEGIN", "COMMIT")):
+            match = _STATEMENT_RE.match(statement)
+            self._local.label = f"{match[1]} {match[2]}".lower() if match else statement.split(None, 1)[0].lower()
+
+    def open(self):
+        """Создаёт соединения и потоки пула"""
+        if self._executor is not None:
+            return
+        for _ in range(self.size):
+            self._connections.put(self._connect())
+        self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="db")
+        logging.info(f"Database pool opened: {self.size} connections to {self.path}")
+
+    def close(self):
+        """Закрывает все соединения пула"""
+        if self._executor is None:
+            return
+        self._executor.shutdown(wait=True)
+        self._executor = None
+        while not self._connections.empty():
+            self._connections.get_nowait().close()
+        logging.info("Database pool closed")
+
+    def _call(self, queued: float, func, *args):
+        conn = self._connections.get()
+        # Ожидание свободного потока и соединения — показатель конкуренции за пул
+        started = time.perf_counter()
+        metrics.observe("bot_db_wait_seconds", started - queued)
+        self._local.label = None
+        try:
+            return func(conn, *args)
+        finally:
+            self._connections.put(conn)
+            metrics.observe("bot_db_seconds", time.perf_counter() - started,
+                            query=self._local.label or func.__name__)
+
+    async def run(self, func, *args):
+        """Выполняет func(conn, *args) в потоке пула и возвращает результат"""
+        if self._executor is None:
+            self.open()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._call, time.perf_counter(), func, *args)
+
+    async def execute(self, sql: str, params=()) -> sqlite3.Cursor:
+        """Выполняет изменяющий запрос в отдельной транзакции"""
+        def _execute(conn, sql, params):
+            with conn:
+                return conn.execute(sql, params)
+        return await self.run(_execute, sql, params)
+
+    async def fetchall(self, sql: str, params=()) -> list:
+        def _fetchall(conn, sql, params):
+            return conn.execute(sql, params).fetchall()
+        return await self.run(_fetchall, sql, params)
+
+    async def fetchone(self, sql: str, params=()):
+        def _fetchone(conn, sql, params):
+            return conn.execute(sql, params).fetchone()
+        return await self.run(_fetchone, sql, params)
+
+
+# Общий пул соединений для всех обработчиков
+db = DatabasePool()
+
+
+def _add_column(cursor, table: str, column: str, column_type: str):
+    """Добавляет столбец в существующую таблицу, если его ещё нет"""
+    columns = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+def _seed_clinic_config(cursor):
+    """Первичное заполнение врачей и расписания значениями из config/settings.py"""
+    cursor.executemany(
+        "INSERT OR IGNORE INTO doctors (code, title, chat_id, position) VALUES (?, ?, ?, ?)",
+        [(code, DOCTOR_TITLES.get(code, code), chat_id, i) for i, (code, chat_id) in enumerate(DOCTORS.items())]
+    )
+    cursor.executemany(
+        "INSERT OR IGNORE INTO clinic_settings (key, value) VALUES (?, ?)",
+        [
+            ("work_hours", ",".join(map(str, DEFAULT_SCHEDULE.hours))),
+            ("work_minutes", ",".join(map(str, DEFAULT_SCHEDULE.minutes))),
+            ("work_days", ",".join(map(str, DEFAULT_SCHEDULE.days))),
+            ("version", "1"),
+        ]
+    )
+
+def _backfill_dates(cursor):
+    """Проставляет дату и индекс слота старым записям, где был только день недели"""
+    # Неделя записи — понедельник той недели, на которую она сделана
+    # (в выходные записывались уже на следующую неделю)
+    rows = cursor.execute('''SELECT id, day, time, date(created_at, 'localtime', '-4 days', 'weekday 1')
+                             FROM appointments WHERE date IS NULL''').fetchall()
+    for appointment_id, day, slot, week_start in rows:
+        if day not in DAY_NAMES or week_start is None:
+            continue
+        appointment_date = date.fromisoformat(week_start) + timedelta(days=DAY_NAMES.index(day))
+        cursor.execute(
+            "UPDATE appointments SET date = ?, slot = ? WHERE id = ?",
+            (appointment_date.isoformat(), DEFAULT_SCHEDULE.slot_index.get(slot), appointment_id)
+        )
+
+def _remove_duplicate_bookings(cursor) -> int:
+    """
+    Однократная миграция перед созданием уникального индекса (doctor, date, slot):
+    из старых дублей остаётся самая ранняя запись, остальные переносятся
+    в appointments_duplicates и пишутся в лог. Возвращает число перенесённых.
+    """
+    exists = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_appointments_doctor_date_slot'"
+    ).fetchone()
+    if exists:
+        return 0
+
+    cursor.execute('''CREATE TABLE IF NOT EXISTS appointments_duplicates (
+        id INTEGER PRIMARY KEY,
+        kept_id INTEGER,
+        user_id INTEGER,
+        day TEXT,
+        time TEXT,
+        doctor TEXT,
+        date TEXT,
+        slot INTEGER,
+        created_at TIMESTAMP,
+        removed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''')
+    rows = cursor.execute('''SELECT a.id, k.kept_id, a.user_id, a.day, a.time, a.doctor, a.date, a.slot, a.created_at
+                             FROM appointments a
+                             JOIN (SELECT doctor, date, slot, MIN(id) AS kept_id FROM appointments
+                                   WHERE slot IS NOT NULL GROUP BY doctor, date, slot HAVING COUNT(*) > 1) k
+                               ON a.doctor = k.doctor AND a.date = k.date AND a.slot = k.slot
+                             WHERE a.id <> k.kept_id''').fetchall()
+    for row in rows:
+        logging.warning(f"Duplicate appointment {row[0]} moved to appointments_duplicates "
+                        f"(user {row[2]}, {row[6]} {row[4]}, {row[5]}; kept appointment {row[1]})")
+    cursor.executemany(
+        '''INSERT INTO appointments_duplicates (id, kept_id, user_id, day, time, doctor, date, slot, created_at)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+        rows
+    )
+    cursor.executemany("DELETE FROM appointments WHERE id = ?", [(row[0],) for row in rows])
+    return len(rows)
+
+def init_db() -> int:
+    """Создаёт и переносит схему; возвращает число дублей записей, убранных миграцией"""
+    conn = None
     try:
-        conn = sqlite3.connect('clinic.db')
+        conn = sqlite3.connect(DB_PATH)
         cursor = conn.cursor()
 
         # Таблица пользователей
@@ -25,6 +209,27 @@ def init_db():
             FOREIGN KEY(user_id) REFERENCES users(user_id) ON DELETE CASCADE
         )''')
 
+        # Архив записей прошедших недель (для отчётов)
+        cursor.execute('''CREATE TABLE IF NOT EXISTS appointments_archive (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER,
+            day TEXT,
+            time TEXT,
+            doctor TEXT,
+            created_at TIMESTAMP,
+            week_start DATE,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''')
+
+        # Записи по датам: date — "YYYY-MM-DD", slot — индекс слота рабочего дня
+        _add_column(cursor, "appointments", "date", "TEXT")
+        _add_column(cursor, "appointments", "slot", "INTEGER")
+        _add_column(cursor, "appointments_archive", "date", "TEXT")
+        _add_column(cursor, "appointments_archive", "slot", "INTEGER")
+        _backfill_dates(cursor)
+        # Отправленные напоминания о приёме: бит i — напоминание i из REMINDER_OFFSETS
+        _add_column(cursor, "appointments", "reminders_sent", "INTEGER NOT NULL DEFAULT 0")
+
         # Таблица консультаций
         cursor.execute('''CREATE TABLE IF NOT EXISTS consultations (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -34,15 +239,108 @@ def init_db():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY(user_id) REFERENCES users(user_id) ON DELETE CASCADE
         )''')
+        # Кому адресован вопрос, статус (open/answered) и время ответа
+        _add_column(cursor, "consultations", "doctor_type", "TEXT")
+        _add_column(cursor, "consultations", "patient_name", "TEXT")
+        _add_column(cursor, "consultations", "status", "TEXT NOT NULL DEFAULT 'open'")
+        _add_column(cursor, "consultations", "answered_at", "TIMESTAMP")
+        cursor.execute('''UPDATE consultations SET status = 'answered'
+                       WHERE response IS NOT NULL AND status = 'open' ''')
+
+        # Таблица FSM-состояний (незавершённые диалоги)
+        cursor.execute('''CREATE TABLE IF NOT EXISTS fsm_states (
+            key TEXT PRIMARY KEY,
+            state TEXT,
+            data TEXT,
+            updated_at REAL
+        )''')
+
+        # Обращения в поддержку: кому назначено и в каком статусе (open/answered)
+        cursor.execute('''CREATE TABLE IF NOT EXISTS support_tickets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            user_name TEXT,
+            message TEXT,
+            operator_id INTEGER,
+            status TEXT NOT NULL DEFAULT 'open',
+            response TEXT,
+            assigned_at REAL,
+            reassign_count INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            answered_at TIMESTAMP
+        )''')
+
+        # Рассылки администратора: last_user_id — до какого пользователя разослано (для продолжения)
+        cursor.execute('''CREATE TABLE IF NOT EXISTS broadcasts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            text TEXT NOT NULL,
+            created_by INTEGER,
+            status TEXT NOT NULL DEFAULT 'running',
+            total INTEGER NOT NULL DEFAULT 0,
+            last_user_id INTEGER NOT NULL DEFAULT 0,
+            sent INTEGER NOT NULL DEFAULT 0,
+            blocked INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP
+        )''')
+        # Пользователь заблокировал бота — рассылки его пропускают
+        _add_column(cursor, "users", "blocked_at", "TIMESTAMP")
+
+        # Врачи: код (в callback-данных), название для пациентов и Telegram ID для консультаций
+        cursor.execute('''CREATE TABLE IF NOT EXISTS doctors (
+            code TEXT PRIMARY KEY,
+            title TEXT NOT NULL,
+            chat_id INTEGER,
+            position INTEGER NOT NULL DEFAULT 0,
+            active INTEGER NOT NULL DEFAULT 1
+        )''')
+        # Настройки клиники (расписание) и номер их версии для сброса кэшей
+        cursor.execute('''CREATE TABLE IF NOT EXISTS clinic_settings (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )''')
+        _seed_clinic_config(cursor)
+
+        # Отметки последнего запуска периодических задач
+        cursor.execute('''CREATE TABLE IF NOT EXISTS scheduler_runs (
+            job TEXT PRIMARY KEY,
+            last_run TEXT
+        )''')
 
         # Индексы
-        cursor.execute('''CREATE INDEX IF NOT EXISTS idx_appointments_day_time 
-                       ON appointments(day, time)''')
+        cursor.execute('''DROP INDEX IF EXISTS idx_appointments_day_time''')
         cursor.execute('''CREATE INDEX IF NOT EXISTS idx_appointments_user 
                        ON appointments(user_id)''')
 
+        cursor.execute('''CREATE INDEX IF NOT EXISTS idx_archive_week_doctor
+                       ON appointments_archive(week_start, doctor)''')
+        cursor.execute('''CREATE INDEX IF NOT EXISTS idx_fsm_states_updated
+                       ON fsm_states(updated_at)''')
+
+        # Один слот врача в конкретную дату — одна запись. Старые дубли (если есть)
+        # один раз переносятся в appointments_duplicates, иначе уникальный индекс не создастся.
+        # Индекс (doctor, date, slot) обслуживает и выборки по диапазону дат
+        cursor.execute('''DROP INDEX IF EXISTS idx_appointments_slot''')
+        duplicates = _remove_duplicate_bookings(cursor)
+        cursor.execute('''CREATE UNIQUE INDEX IF NOT EXISTS idx_appointments_doctor_date_slot
+                       ON appointments(doctor, date, slot)''')
+        # Порядок постраничного просмотра /занятые_записи: (date, slot, id)
+        cursor.execute('''DROP INDEX IF EXISTS idx_appointments_date''')
+        cursor.execute('''CREATE INDEX IF NOT EXISTS idx_appointments_date_slot
+                       ON appointments(date, slot)''')
+        # Открытые обращения: нагрузка операторов и поиск просроченных назначений
+        cursor.execute('''CREATE INDEX IF NOT EXISTS idx_support_tickets_status_operator
+                       ON support_tickets(status, operator_id)''')
+        cursor.execute('''CREATE INDEX IF NOT EXISTS idx_support_tickets_status_assigned
+                       ON support_tickets(status, assigned_at)''')
+        # Входящие врача: неотвеченные вопросы по порядку поступления
+        cursor.execute('''CREATE INDEX IF NOT EXISTS idx_consultations_doctor_status_created
+                       ON consultations(doctor_type, status, created_at)''')
+
         conn.commit()
         logging.info("Database initialized successfully")
+        return duplicates
     except sqlite3.Error as e:
         logging.error(f"Failed to initialize database: {e}")
         raise
@@ -51,4 +349,4 @@ def init_db():
             conn.close()
 
 if __name__ == "__main__":
-    init_db()
\ No newline at end of file
+    init_db()
@@ -4,6 +4,8 @@ BOT_TOKEN = "7107311050:AAFeWNHNLD5m3i3APHUswEfbfYYvsxniC-8"
 
 ADMIN_ID = 869613280
 DOCTOR_ID = 123456789
+# Начальные врачи и расписание; после первого запуска они хранятся в БД
+# и меняются командами /врач, /врач_убрать и /расписание
 DOCTORS = {
     "pediatrician": 869613280,  # ID педиатра в Telegram
     "surgeon": 869613280,       # ID хирурга
@@ -17,9 +19,84 @@ DOCTOR_TITLES = {
 
 WORK_HOURS = [10, 11, 12, 13]
 WORK_MINUTES = ['00', '30']     # Добавляем поддержку 30-минутных интервалов
+WORK_DAYS = [0, 1, 2, 3, 4]     # Рабочие дни недели (0 — понедельник)
+CALENDAR_WEEKS = int(os.getenv("CALENDAR_WEEKS", "2"))  # На сколько недель вперёд открыта запись
 
 DB_PATH = "clinic.db"
+CONFIG_REFRESH_INTERVAL = float(os.getenv("CONFIG_REFRESH_INTERVAL", "30"))  # Сверка версии настроек клиники в БД (сек)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "4"))  # Количество соединений в пуле БД
+
+APPOINTMENTS_PAGE_SIZE = int(os.getenv("APPOINTMENTS_PAGE_SIZE", "10"))  # Записей на странице /занятые_записи
+INBOX_PAGE_SIZE = int(os.getenv("INBOX_PAGE_SIZE", "5"))  # Вопросов на странице /вопросы
+INBOX_OVERVIEW_SIZE = int(os.getenv("INBOX_OVERVIEW_SIZE", "3"))  # Вопросов каждого врача в обзоре /вопросы
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))  # Записей за одну транзакцию архивации
+
+# Настройки хранилища FSM-состояний
+FSM_TTL_SECONDS = int(os.getenv("FSM_TTL_SECONDS", str(24 * 3600)))  # Время жизни неактивного диалога
+FSM_FLUSH_INTERVAL = float(os.getenv("FSM_FLUSH_INTERVAL", "1"))     # Период записи изменений в БД (сек)
+
+# Настройки антифлуда (token bucket: токенов в секунду и максимальный запас)
+THROTTLE_MESSAGE_RATE = float(os.getenv("THROTTLE_MESSAGE_RATE", str(1 / 3)))
+THROTTLE_MESSAGE_BURST = int(os.getenv("THROTTLE_MESSAGE_BURST", "3"))
+THROTTLE_CALLBACK_RATE = float(os.getenv("THROTTLE_CALLBACK_RATE", "1"))
+THROTTLE_CALLBACK_BURST = int(os.getenv("THROTTLE_CALLBACK_BURST", "4"))
+THROTTLE_MAX_USERS = int(os.getenv("THROTTLE_MAX_USERS", "10000"))        # Сколько корзин держать в памяти
+THROTTLE_WARNING_WINDOW = float(os.getenv("THROTTLE_WARNING_WINDOW", "10"))  # Не больше 1 предупреждения за окно
+
+# Порядок обработки: обновления одного чата — по очереди, разных чатов — параллельно
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "100"))  # Одновременно выполняемых обработчиков
+CHAT_QUEUE_LIMIT = int(os.getenv("CHAT_QUEUE_LIMIT", "20"))       # Обновлений в очереди одного чата
+
+# Защита от повторных нажатий кнопок (двойной тап, повторная доставка обновления)
+IDEMPOTENCY_UPDATE_TTL = float(os.getenv("IDEMPOTENCY_UPDATE_TTL", "3600"))  # Сколько помнить обработанные update_id (сек)
+IDEMPOTENCY_TAP_TTL = float(os.getenv("IDEMPOTENCY_TAP_TTL", "3"))           # Окно, в котором то же нажатие — повтор (сек)
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))       # Ключей в памяти на каждый вид
+
+# Лимиты исходящих сообщений (ограничения Telegram Bot API)
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", "30"))     # Сообщений в секунду на всего бота
+SEND_CHAT_INTERVAL = float(os.getenv("SEND_CHAT_INTERVAL", "1"))  # Минимальный интервал между сообщениями в чат (сек)
+SEND_WORKERS = int(os.getenv("SEND_WORKERS", "4"))
+SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", "3"))         # Повторы при сетевых ошибках
+
+# Режим получения обновлений: "polling" (по умолчанию) или "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")            # Внешний адрес, например https://bot.example.com
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")      # Секрет для заголовка X-Telegram-Bot-Api-Secret-Token
 
 # Настройки логирования
 LOG_FILE = os.getenv("LOG_FILE", "bot.log")
-LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
\ No newline at end of file
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(5 * 1024 * 1024)))  # Размер сегмента до ротации
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "10"))            # Сколько сжатых сегментов хранить
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN", "")                     # Ротация по времени, например "midnight"
+# Метрики: эндпоинт Prometheus (только localhost по умолчанию, 0 — отключить)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
+
+# Поддержка: пул операторов и распределение обращений
+SUPPORT_OPERATORS = [int(x) for x in os.getenv("SUPPORT_OPERATORS", str(ADMIN_ID)).split(",") if x.strip()]
+SUPPORT_ASSIGNMENT = os.getenv("SUPPORT_ASSIGNMENT", "least_open")                 # "least_open" или "round_robin"
+SUPPORT_REASSIGN_TIMEOUT = float(os.getenv("SUPPORT_REASSIGN_TIMEOUT", "900"))     # Без ответа дольше — передать другому (сек)
+SUPPORT_CHECK_INTERVAL = float(os.getenv("SUPPORT_CHECK_INTERVAL", "60"))          # Период проверки просроченных обращений
+
+# Напоминания пациентам о приёме (0 — напоминание отключено)
+REMINDER_HOURS_BEFORE = float(os.getenv("REMINDER_HOURS_BEFORE", "24"))
+REMINDER_MINUTES_BEFORE = float(os.getenv("REMINDER_MINUTES_BEFORE", "60"))
+REMINDER_OFFSETS = [s for s in (REMINDER_HOURS_BEFORE * 3600, REMINDER_MINUTES_BEFORE * 60) if s > 0]  # Секунд до приёма
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "500"))            # Напоминаний за одну проверку в БД
+REMINDER_RELOAD_INTERVAL = float(os.getenv("REMINDER_RELOAD_INTERVAL", "300"))  # Сверка с БД при нескольких процессах (сек)
+
+# Рассылки: получателей в одной пачке (после каждой пачки прогресс записывается в БД)
+BROADCAST_BATCH_SIZE = int(os.getenv("BROADCAST_BATCH_SIZE", "100"))
+
+# Плавная остановка: сколько ждать завершения обработки обновлений и фоновых задач (сек)
+SHUTDOWN_TIMEOUT = float(os.getenv("SHUTDOWN_TIMEOUT", "30"))
+
+# Общее состояние для нескольких процессов бота (FSM, антифлуд, ведущий планировщика).
+# Пусто — один процесс, состояние в памяти и SQLite; например redis://localhost:6379/0
+REDIS_URL = os.getenv("REDIS_URL", "")
+REDIS_POOL_SIZE = int(os.getenv("REDIS_POOL_SIZE", "10"))       # Соединений с Redis на процесс
+LEADER_LEASE_TTL = float(os.getenv("LEADER_LEASE_TTL", "60"))   # Срок аренды роли ведущего (сек)
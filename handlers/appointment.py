@@ -2,22 +2,24 @@
 from aiogram import types, F, Router
 from aiogram.fsm.context import FSMContext  # Контекст FSM-состояний
 from aiogram.fsm.state import State, StatesGroup  # Описание состояний
-from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup  # Инлайн кнопки
-from config.settings import WORK_HOURS, WORK_MINUTES  # Временные слоты
 from keyboard.appointment import (  # Клавиатуры для записи
     days_keyboard,
-    times_keyboard,
+    doctor_times_keyboard,
     doctor_keyboard,
     confirm_keyboard
 )
 from models.user import save_user  # Функция для сохранения пользователя
 from models.appointment import save_appointment  # Функция для сохранения записи
+from utils.occupancy import occupancy  # Индекс занятости слотов в памяти
+from utils.calendar_engine import calendar  # Календарь записи по датам
+from utils.clinic_config import clinic  # Врачи и расписание из БД
+from utils.metrics import metrics  # Счётчики записей
+from datetime import date
 import logging
 import sqlite3
-from contextlib import closing  # Для безопасной работы с БД
 
 # Функция создания роутера записи на приём
-def create_appointment_router(week_manager=None):
+def create_appointment_router():
     router = Router()
 
     # Класс состояний FSM
@@ -61,13 +63,13 @@ def create_appointment_router(week_manager=None):
 
             try:
                 # Сохраняем пользователя в БД
-                save_user(message.from_user.id, first_name, last_name)
+                await save_user(message.from_user.id, first_name, last_name)
                 await state.set_state(AppointmentStates.waiting_for_day)
-                await message.answer("📅 Выберите день недели:", reply_markup=days_keyboard(week_manager))
+                await message.answer("📅 Выберите день:", reply_markup=days_keyboard())
             except sqlite3.IntegrityError:
                 # Пользователь уже есть — продолжаем
                 await state.set_state(AppointmentStates.waiting_for_day)
-                await message.answer("📅 Выберите день недели:", reply_markup=days_keyboard(week_manager))
+                await message.answer("📅 Выберите день:", reply_markup=days_keyboard())
             except sqlite3.Error as e:
                 logging.error(f"Database error: {e}")
                 await message.answer("⚠️ Ошибка базы данных. Попробуйте позже.")
@@ -80,19 +82,19 @@ def create_appointment_router(week_manager=None):
             await message.answer("⚠️ Произошла ошибка. Начните запись заново.")
             await state.clear()
 
-    # Обработка выбора дня недели
+    # Обработка выбора дня
     @router.callback_query(F.data.startswith("day_"), AppointmentStates.waiting_for_day)
     async def process_day(callback: types.CallbackQuery, state: FSMContext):
         try:
-            day = callback.data.split("_")[1]
+            selected = date.fromisoformat(callback.data.split("_")[1])
 
-            # Проверка: доступен ли день для записи
-            if week_manager and hasattr(week_manager, 'is_day_available'):
-                if not week_manager.is_day_available(day):
-                    await callback.answer("❌ Этот день уже прошел! Новые записи доступны с понедельника.", show_alert=True)
-                    return
+            # Проверка: день в горизонте записи и ещё не прошёл
+            if not calendar.is_bookable(selected):
+                await callback.answer("❌ Запись на этот день недоступна. Выберите другой день.", show_alert=True)
+                return
 
-            await state.update_data(day=day)
+            day = calendar.day_label(selected)
+            await state.update_data(date=selected.isoformat(), day=day)
             await state.set_state(AppointmentStates.waiting_for_doctor)
             await callback.message.edit_text(f"📅 Выбран день: {day}\n\n👨‍⚕️ Выберите врача:", reply_markup=doctor_keyboard())
         except Exception as e:
@@ -106,39 +108,15 @@ def create_appointment_router(week_manager=None):
     async def process_doctor(callback: types.CallbackQuery, state: FSMContext):
         try:
             doctor = callback.data.split("_")[1]
+            if doctor not in clinic.doctors:
+                await callback.answer("❌ Запись к этому врачу недоступна. Выберите другого.", show_alert=True)
+                return
             await state.update_data(doctor=doctor)
             data = await state.get_data()
 
-            # Получаем занятые слоты из БД
-            with closing(sqlite3.connect('clinic.db')) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT time FROM appointments WHERE doctor=? AND day=?", (doctor, data['day']))
-                busy_times = {row[0] for row in cursor.fetchall()}
-
-            # Формируем список доступных и занятых слотов
-            buttons = []
-            for hour in WORK_HOURS:
-                for minute in WORK_MINUTES:
-                    time_str = f"{hour}:{minute}"
-                    status = "⛔ занято" if time_str in busy_times else "🕒"
-                    buttons.append([
-                        InlineKeyboardButton(
-                            text=f"{status} {time_str}",
-                            callback_data=f"time_{time_str}_{doctor}"
-                        )
-                    ])
-
-            # Добавляем кнопки "Назад"
-            buttons.append([
-                InlineKeyboardButton(text="◀️ Назад к врачам", callback_data="back_to_doctors")
-            ])
-            buttons.append([
-                InlineKeyboardButton(text="◀️ Назад к дням", callback_data="back_to_days")
-            ])
-
             await callback.message.edit_text(
-                f"📅 День: {data.get('day', 'не указан')}\n👨‍⚕️ Врач: {doctor}",
-                reply_markup=InlineKeyboardMarkup(inline_keyboard=buttons)
+                f"📅 День: {data.get('day', 'не указан')}\n👨‍⚕️ Врач: {clinic.title(doctor)}",
+                reply_markup=doctor_times_keyboard(doctor, date.fromisoformat(data['date']))
             )
             await state.set_state(AppointmentStates.waiting_for_time)
         except Exception as e:
@@ -151,17 +129,19 @@ def create_appointment_router(week_manager=None):
     @router.callback_query(F.data.startswith("time_"), AppointmentStates.waiting_for_time)
     async def process_time(callback: types.CallbackQuery, state: FSMContext):
         try:
-            time, doctor = callback.data.split("_")[1:3]
-            await state.update_data(time=time, doctor=doctor)
+            slot, doctor = callback.data.split("_")[1:3]
+            slot = int(slot)
             data = await state.get_data()
 
-            # Проверка занятости времени
-            with closing(sqlite3.connect('clinic.db')) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT 1 FROM appointments WHERE day=? AND time=? AND doctor=?", (data['day'], time, doctor))
-                if cursor.fetchone():
-                    await callback.answer("⚠️ Этот слот уже занят для выбранного врача.", show_alert=True)
-                    return
+            # Проверка: слот есть в расписании, не прошёл и не занят
+            if doctor not in clinic.doctors or not calendar.is_bookable(date.fromisoformat(data['date']), slot):
+                await callback.answer("⌛ Это время недоступно. Выберите другое.", show_alert=True)
+                return
+            if occupancy.is_busy(doctor, data['date'], slot):
+                await callback.answer("⚠️ Этот слот уже занят для выбранного врача.", show_alert=True)
+                return
+            time = calendar.slots[slot]
+            await state.update_data(slot=slot, time=time, doctor=doctor)
 
             # Подтверждение записи
             await callback.message.edit_text(
@@ -169,7 +149,7 @@ def create_appointment_router(week_manager=None):
                 f"📅 День: {data.get('day', 'не указан')}\n"
                 f"🕒 Время: {time}\n"
                 f"👤 Пациент: {data.get('first_name', '')} {data.get('last_name', '')}\n"
-                f"👨‍⚕️ Врач: {doctor}",
+                f"👨‍⚕️ Врач: {clinic.title(doctor)}",
                 reply_markup=confirm_keyboard()
             )
             await state.set_state(AppointmentStates.waiting_for_doctor)
@@ -184,23 +164,40 @@ def create_appointment_router(week_manager=None):
     async def confirm_appointment(callback: types.CallbackQuery, state: FSMContext):
         try:
             data = await state.get_data()
-            save_appointment(
+            # Индекс слота — по выбранному времени: расписание могло измениться после выбора
+            slot = calendar.schedule.slot_index.get(data['time'])
+            if slot is None or not calendar.is_bookable(date.fromisoformat(data['date']), slot):
+                await callback.message.edit_text(
+                    "⌛ Это время больше недоступно.\n"
+                    "Пожалуйста, начните запись заново и выберите другое время."
+                )
+                return
+            reserved = await save_appointment(
                 user_id=data['user_id'],
-                day=data['day'],
-                time=data['time'],
+                date=data['date'],
+                slot=slot,
                 doctor=data['doctor']
             )
 
+            # Слот успели занять раньше — сообщаем пациенту
+            if not reserved:
+                await callback.message.edit_text(
+                    "⛔ Этот слот только что занял другой пациент.\n"
+                    "Пожалуйста, начните запись заново и выберите другое время."
+                )
+                return
+
             await callback.message.edit_text(
                 "✅ Запись успешно создана!\n\n"
                 f"📅 День: {data['day']}\n"
                 f"🕒 Время: {data['time']}\n"
                 f"👤 Пациент: {data['first_name']} {data['last_name']}\n"
-                f"👨‍⚕️ Врач: {data['doctor']}\n\n"
+                f"👨‍⚕️ Врач: {clinic.title(data['doctor'])}\n\n"
                 "Мы ждем вас в указанное время!"
             )
         except Exception as e:
             logging.error(f"Error in confirm_appointment: {e}")
+            metrics.inc("bot_bookings_total", result="error")
             await callback.answer("⚠️ Ошибка при подтверждении записи", show_alert=True)
         finally:
             await state.clear()
@@ -237,8 +234,8 @@ def create_appointment_router(week_manager=None):
     async def back_to_days(callback: types.CallbackQuery, state: FSMContext):
         await state.set_state(AppointmentStates.waiting_for_day)
         await callback.message.edit_text(
-            "📅 Выберите день недели:",
-            reply_markup=days_keyboard(week_manager)
+            "📅 Выберите день:",
+            reply_markup=days_keyboard()
         )
         await callback.answer()
 
@@ -1,7 +1,21 @@
 from aiogram import F, Router, types
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from config.settings import DOCTORS
+from aiogram.filters import Command, CommandObject
+from config.settings import ADMIN_ID, INBOX_PAGE_SIZE, INBOX_OVERVIEW_SIZE
+from models.consultation import (  # Хранение вопросов и ответов консультаций
+    save_consultation,
+    get_consultation,
+    answer_consultation as save_answer,
+    reopen_consultation,
+    get_open_consultations,
+    count_open_consultations,
+    count_open_by_doctor
+)
+from utils.sender import sender  # Очередь исходящих сообщений
+from utils.metrics import metrics
+from utils.clinic_config import clinic  # Врачи из настроек клиники
+from keyboard.appointment import doctors_markup
 import logging
 
 router = Router()
@@ -12,15 +26,9 @@ class ConsultationStates(StatesGroup):
     waiting_for_question = State()
     waiting_for_answer = State()
 
-# Клавиатура выбора врача
+# Клавиатура выбора врача (по одному в ряд)
 def doctors_keyboard():
-    return types.InlineKeyboardMarkup(
-        inline_keyboard=[
-            [types.InlineKeyboardButton(text="👩‍⚕️ Педиатр", callback_data="consult_pediatrician")],
-            [types.InlineKeyboardButton(text="👨‍⚕️ Хирург", callback_data="consult_surgeon")],
-            [types.InlineKeyboardButton(text="👩‍⚕️ Гинеколог", callback_data="consult_gynecologist")]
-        ]
-    )
+    return doctors_markup("consult_", per_row=1, consultations=True)
 
 # Обработка кнопки "💬 Консультация" из инлайн-клавиатуры
 @router.callback_query(F.data == "consultation")
@@ -39,7 +47,10 @@ async def start_consultation(message: types.Message, state: FSMContext):
 @router.callback_query(F.data.startswith("consult_"), ConsultationStates.waiting_for_doctor)
 async def select_doctor(callback: types.CallbackQuery, state: FSMContext):
     doctor_type = callback.data.split("_")[1]
-    await state.update_data(doctor_type=doctor_type, doctor_id=DOCTORS[doctor_type])
+    if not clinic.chat_id(doctor_type):
+        await callback.answer("❌ Консультации этого врача недоступны. Выберите другого.", show_alert=True)
+        return
+    await state.update_data(doctor_type=doctor_type)
     await state.set_state(ConsultationStates.waiting_for_fullname)
     await callback.message.edit_text("👤 Пожалуйста, введите ваше имя и фамилию:")
     await callback.answer()
@@ -63,34 +74,54 @@ async def receive_fullname(message: types.Message, state: FSMContext):
 @router.message(ConsultationStates.waiting_for_question)
 async def process_question(message: types.Message, state: FSMContext):
     data = await state.get_data()
+    await state.clear()
+
+    # Сначала сохраняем вопрос: даже если врач не получит уведомление, вопрос останется во входящих
+    try:
+        consultation_id = await save_consultation(
+            user_id=message.from_user.id,
+            doctor_type=data['doctor_type'],
+            patient_name=data['patient_name'],
+            question=message.text
+        )
+    except Exception as e:
+        logging.error(f"Error saving consultation: {e}")
+        await message.answer("⚠️ Не удалось отправить вопрос. Попробуйте позже.")
+        return
 
-    await state.update_data(question=message.text)
+    metrics.inc("bot_consultations_total", event="question", doctor=data['doctor_type'])
+    await message.answer("✅ Ваш вопрос отправлен врачу. Ожидайте ответа.")
 
     try:
-        await message.bot.send_message(
-            chat_id=data['doctor_id'],
+        await sender.send_message(
+            # doctor_id — только в диалогах, начатых до переноса врачей в БД
+            chat_id=clinic.chat_id(data['doctor_type']) or data.get('doctor_id'),
             text=f"❓ Новый вопрос от {data['patient_name']}:\n\n{message.text}",
-            reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[
-                [types.InlineKeyboardButton(
-                    text="Ответить",
-                    callback_data=f"answer_{message.from_user.id}_{data['doctor_type']}"
-                )]
-            ])
+            reply_markup=answer_keyboard(consultation_id)
         )
-        await message.answer("✅ Ваш вопрос отправлен врачу. Ожидайте ответа.")
-        await state.clear()
     except Exception as e:
-        logging.error(f"Error sending to doctor: {e}")
-        await message.answer("⚠️ Не удалось отправить вопрос. Попробуйте позже.")
-        await state.clear()
+        logging.error(f"Error notifying doctor about consultation {consultation_id}: {e}")
 
 # Ответ врача
 @router.callback_query(F.data.startswith("answer_"))
-async def answer_consultation(callback: types.CallbackQuery, state: FSMContext):
+async def doctor_answer_button(callback: types.CallbackQuery, state: FSMContext):
     parts = callback.data.split("_")
-    patient_id = int(parts[1])
-    doctor_type = parts[2] if len(parts) > 2 else "врач"
-    await state.update_data(patient_id=patient_id, doctor_type=doctor_type)
+    if len(parts) == 2:
+        consultation = await get_consultation(int(parts[1]))
+        if consultation is None:
+            await callback.answer("Вопрос не найден", show_alert=True)
+            return
+        if consultation["status"] != "open":
+            await callback.answer("На этот вопрос уже ответили", show_alert=True)
+            return
+        await state.update_data(
+            consultation_id=consultation["id"],
+            patient_id=consultation["user_id"],
+            doctor_type=consultation["doctor_type"]
+        )
+    else:
+        # Кнопки старого формата answer_{patient_id}_{doctor_type} в уже отправленных сообщениях
+        await state.update_data(patient_id=int(parts[1]), doctor_type=parts[2] if len(parts) > 2 else "врач")
     await state.set_state(ConsultationStates.waiting_for_answer)
     await callback.message.answer("Напишите ответ пациенту:")
     await callback.answer()
@@ -99,22 +130,132 @@ async def answer_consultation(callback: types.CallbackQuery, state: FSMContext):
 @router.message(ConsultationStates.waiting_for_answer)
 async def send_answer(message: types.Message, state: FSMContext):
     data = await state.get_data()
+    doctor_label = clinic.title(data["doctor_type"]) if data.get("doctor_type") in clinic.doctors else "👩‍⚕️ Врач"
 
-    doctor_labels = {
-        "pediatrician": "👩‍⚕️ Педиатр",
-        "surgeon": "👨‍⚕️ Хирург",
-        "gynecologist": "👩‍⚕️ Гинеколог"
-    }
-    doctor_label = doctor_labels.get(data.get("doctor_type"), "👩‍⚕️ Врач")
-
+    consultation_id = data.get("consultation_id")
     try:
-        await message.bot.send_message(
-            chat_id=data['patient_id'],
-            text=f"{doctor_label} ответил(а):\n\n{message.text}"
-        )
+        if consultation_id is not None:
+            # Вопрос занимается одним условным UPDATE: если два врача отвечают одновременно,
+            # пациент получит только ответ того, кто успел первым
+            if not await save_answer(consultation_id, message.text):
+                if await get_consultation(consultation_id) is None:
+                    await message.answer("❌ Вопрос не найден.")
+                else:
+                    await message.answer("ℹ️ На этот вопрос уже ответили.")
+                return
+
+        try:
+            await sender.send_message(
+                chat_id=data['patient_id'],
+                text=f"{doctor_label} ответил(а):\n\n{message.text}"
+            )
+        except Exception:
+            # Ответ не доставлен — вопрос возвращается во входящие
+            if consultation_id is not None:
+                await reopen_consultation(consultation_id)
+            raise
+        metrics.inc("bot_consultations_total", event="answer", doctor=data.get("doctor_type", "unknown"))
         await message.answer("✅ Ответ отправлен пациенту.")
     except Exception as e:
         logging.error(f"Error sending answer: {e}")
         await message.answer("⚠️ Не удалось отправить ответ.")
     finally:
         await state.clear()
+
+def answer_keyboard(consultation_id: int):
+    return types.InlineKeyboardMarkup(inline_keyboard=[
+        [types.InlineKeyboardButton(text="Ответить", callback_data=f"answer_{consultation_id}")]
+    ])
+
+def inbox_doctors(user_id: int) -> list:
+    """Специализации, чьи входящие может смотреть пользователь: врач — свои, админ — любые"""
+    return list(clinic.doctors) if user_id == ADMIN_ID else clinic.codes_for(user_id)
+
+def inbox_doctor(user_id: int, requested: str = None):
+    """
+    Специализация, чьи входящие смотрит пользователь: указанная, если она ему доступна,
+    а без указания — единственная доступная (при нескольких нужен обзор, см. render_overview).
+    """
+    allowed = inbox_doctors(user_id)
+    if requested:
+        return requested.strip() if requested.strip() in allowed else None
+    return allowed[0] if len(allowed) == 1 else None
+
+async def render_overview(doctor_types: list):
+    """Обзор неотвеченных вопросов по всем специализациям: по несколько старейших и кнопка входящих врача"""
+    counts = await count_open_by_doctor()
+    doctor_types = [doctor_type for doctor_type in doctor_types if counts.get(doctor_type)]
+    if not doctor_types:
+        return "📭 Неотвеченных вопросов нет", None
+
+    lines = [f"📥 Неотвеченных вопросов — {sum(counts[doctor_type] for doctor_type in doctor_types)}\n"]
+    buttons = []
+    for doctor_type in doctor_types:
+        lines.append(f"{clinic.title(doctor_type)} — {counts[doctor_type]}")
+        for row in await get_open_consultations(doctor_type, limit=INBOX_OVERVIEW_SIZE):
+            question = row["message"] if len(row["message"]) <= 100 else row["message"][:100] + "…"
+            lines.append(f"  #{row['id']} · {row['patient_name']}: {question}")
+        lines.append("")
+        buttons.append([types.InlineKeyboardButton(
+            text=f"{clinic.title(doctor_type)} ({counts[doctor_type]})", callback_data=f"inbox|{doctor_type}|"
+        )])
+    return "\n".join(lines), types.InlineKeyboardMarkup(inline_keyboard=buttons)
+
+async def render_inbox(doctor_type: str, after_id: int = None):
+    """Текст и клавиатура страницы входящих: кнопка ответа на каждый вопрос и «Далее»"""
+    rows = await get_open_consultations(doctor_type, after_id, INBOX_PAGE_SIZE + 1)
+    has_next = len(rows) > INBOX_PAGE_SIZE
+    rows = rows[:INBOX_PAGE_SIZE]
+    if not rows:
+        return "📭 Неотвеченных вопросов нет", None
+
+    total = await count_open_consultations(doctor_type)
+    lines = [f"📥 {clinic.title(doctor_type)}: неотвеченных вопросов — {total}\n"]
+    buttons = []
+    for row in rows:
+        question = row["message"] if len(row["message"]) <= 300 else row["message"][:300] + "…"
+        lines.append(f"#{row['id']} · {row['created_at']} · {row['patient_name']}\n{question}\n")
+        buttons.append([types.InlineKeyboardButton(
+            text=f"Ответить на #{row['id']}", callback_data=f"answer_{row['id']}"
+        )])
+
+    navigation = []
+    if after_id is not None:
+        navigation.append(types.InlineKeyboardButton(text="⏮ В начало", callback_data=f"inbox|{doctor_type}|"))
+    if has_next:
+        navigation.append(types.InlineKeyboardButton(
+            text="Далее ▶", callback_data=f"inbox|{doctor_type}|{rows[-1]['id']}"
+        ))
+    if navigation:
+        buttons.append(navigation)
+    return "\n".join(lines), types.InlineKeyboardMarkup(inline_keyboard=buttons)
+
+# Команда врача: /вопросы [специализация] — неотвеченные вопросы постранично;
+# без специализации у админа (или врача нескольких специализаций) — обзор по всем
+@router.message(Command("вопросы"))
+async def show_inbox(message: types.Message, command: CommandObject):
+    allowed = inbox_doctors(message.from_user.id)
+    if not allowed:
+        await message.answer("❌ Команда доступна только врачам.")
+        return
+    if not command.args and len(allowed) > 1:
+        text, keyboard = await render_overview(allowed)
+        await message.answer(text, reply_markup=keyboard)
+        return
+    doctor_type = inbox_doctor(message.from_user.id, command.args)
+    if doctor_type is None:
+        await message.answer(f"❌ Нет такой специализации. Доступны: {', '.join(allowed)}")
+        return
+    text, keyboard = await render_inbox(doctor_type)
+    await message.answer(text, reply_markup=keyboard)
+
+# Листание входящих: inbox|{doctor_type}|{id последнего вопроса на странице}
+@router.callback_query(F.data.startswith("inbox|"))
+async def page_inbox(callback: types.CallbackQuery):
+    _, doctor_type, after_id = callback.data.split("|")
+    if inbox_doctor(callback.from_user.id, doctor_type) != doctor_type:
+        await callback.answer("❌ Нет доступа", show_alert=True)
+        return
+    text, keyboard = await render_inbox(doctor_type, int(after_id) if after_id else None)
+    await callback.message.edit_text(text, reply_markup=keyboard)
+    await callback.answer()
@@ -2,6 +2,9 @@ from aiogram import F, Router, types
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from config.settings import ADMIN_ID
+from utils.sender import sender  # Очередь исходящих сообщений
+from utils.metrics import metrics
+from services.support import support_pool  # Распределение обращений между операторами
 import logging
 
 router = Router()
@@ -43,31 +46,40 @@ async def receive_fullname(message: types.Message, state: FSMContext):
     await state.set_state(SupportStates.waiting_for_support_message)
     await message.answer("✍️ Теперь, пожалуйста, введите ваше сообщение для поддержки:")
 
-# Пользователь отправляет сообщение в поддержку
+# Пользователь отправляет сообщение в поддержку — обращение получает оператор из пула
 @router.message(SupportStates.waiting_for_support_message)
 async def receive_support_message(message: types.Message, state: FSMContext):
     data = await state.get_data()
     full_name = data.get('user_name')
 
     try:
-        await message.bot.send_message(
-            chat_id=ADMIN_ID,
-            text=f"📩 Сообщение в поддержку от {full_name}:\n\n{message.text}",
-            reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[
-                [types.InlineKeyboardButton(
-                    text="Ответить",
-                    callback_data=f"reply_{message.from_user.id}"
-                )]
-            ])
-        )
+        await support_pool.open_ticket(message.from_user.id, full_name, message.text)
         await message.answer("✅ Ваше сообщение отправлено в поддержку. Ожидайте ответа.")
         await state.clear()
     except Exception as e:
-        logging.error(f"Error sending support message to admin: {e}")
+        logging.error(f"Error opening support ticket: {e}")
         await message.answer("⚠️ Произошла ошибка при отправке. Попробуйте позже.")
         await state.clear()
 
-# Админ нажимает "Ответить"
+# Оператор нажимает "Ответить" под обращением
+@router.callback_query(F.data.startswith("ticket_"))
+async def operator_reply_button(callback: types.CallbackQuery, state: FSMContext):
+    if not support_pool.is_operator(callback.from_user.id) and callback.from_user.id != ADMIN_ID:
+        await callback.answer("❌ Нет доступа", show_alert=True)
+        return
+    ticket = await support_pool.get_ticket(int(callback.data.split("_")[1]))
+    if ticket is None:
+        await callback.answer("Обращение не найдено", show_alert=True)
+        return
+    if ticket["status"] != "open":
+        await callback.answer("На это обращение уже ответили", show_alert=True)
+        return
+    await state.update_data(ticket_id=ticket["id"], reply_user_id=ticket["user_id"])
+    await state.set_state(SupportStates.waiting_for_admin_reply)
+    await callback.message.answer("✍️ Введите сообщение для ответа пользователю:")
+    await callback.answer()
+
+# Кнопки старого формата reply_{user_id} в уже отправленных сообщениях
 @router.callback_query(F.data.startswith("reply_"))
 async def admin_reply_button(callback: types.CallbackQuery, state: FSMContext):
     user_id = int(callback.data.split("_")[1])
@@ -76,17 +88,32 @@ async def admin_reply_button(callback: types.CallbackQuery, state: FSMContext):
     await callback.message.answer("✍️ Введите сообщение для ответа пользователю:")
     await callback.answer()
 
-# Админ отправляет ответ пользователю
+# Оператор отправляет ответ пользователю
 @router.message(SupportStates.waiting_for_admin_reply)
 async def send_admin_reply(message: types.Message, state: FSMContext):
     data = await state.get_data()
     user_id = data.get("reply_user_id")
+    ticket_id = data.get("ticket_id")
 
     try:
-        await message.bot.send_message(
+        if ticket_id is not None:
+            ticket = await support_pool.get_ticket(ticket_id)
+            if ticket is None:
+                await message.answer("❌ Обращение не найдено.")
+                return
+            if ticket["status"] != "open":
+                await message.answer("ℹ️ На это обращение уже ответил другой оператор.")
+                return
+
+        await sender.send_message(
             chat_id=user_id,
             text=f"💬 Ответ от поддержки:\n\n{message.text}"
         )
+        # Обращение закрывается только после доставки ответа
+        if ticket_id is not None:
+            await support_pool.close_ticket(ticket_id, message.text)
+        else:
+            metrics.inc("bot_support_tickets_total", event="answered")
         await message.answer("✅ Ответ отправлен пользователю.")
     except Exception as e:
         logging.error(f"Error sending reply to user: {e}")
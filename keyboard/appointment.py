@@ -1,84 +1,118 @@
+from datetime import date
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-import sqlite3
-import logging
-from contextlib import closing
-from config.settings import WORK_HOURS, WORK_MINUTES
+from utils.calendar_engine import calendar
+from utils.occupancy import occupancy
+from utils.clinic_config import clinic
 
-def days_keyboard(week_manager=None):
-    """Клавиатура с днями недели"""
-    days = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница"]
+# Кэш готовых клавиатур: дни — по набору открытых дат,
+# время — по (врач, дата, первый открытый слот) при неизменных занятости и настройках,
+# врачи — до изменения настроек клиники
+_days_cache = {}
+_times_cache = {}
+_times_version = None
+_doctor_cache = {}
+
+def _build_days_keyboard(dates):
     buttons = []
-    
-    for day in days:
-        if week_manager and hasattr(week_manager, 'is_day_available') and not week_manager.is_day_available(day):
-            buttons.append([InlineKeyboardButton(
-                text=f"❌ {day} (недоступен)",
-                callback_data="day_unavailable"
-            )])
-        else:
-            buttons.append([InlineKeyboardButton(
-                text=f"📅 {day}",
-                callback_data=f"day_{day}"
-            )])
-    
+    row = []
+
+    # По две даты в ряд
+    for day in dates:
+        row.append(InlineKeyboardButton(
+            text=f"📅 {calendar.day_label(day)}",
+            callback_data=f"day_{day.isoformat()}"
+        ))
+        if len(row) == 2:
+            buttons.append(row)
+            row = []
+    if row:
+        buttons.append(row)
+
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
-def times_keyboard(day: str):
-    """Клавиатура с 30-минутными интервалами"""
+def days_keyboard():
+    """Клавиатура с датами, открытыми для записи"""
+    # Набор дат меняется только со сменой дня или когда прошёл последний слот сегодня
+    dates = tuple(calendar.dates())
+    markup = _days_cache.get(dates)
+    if markup is None:
+        _days_cache.clear()
+        markup = _days_cache[dates] = _build_days_keyboard(dates)
+    return markup
+
+def _build_doctor_times_keyboard(doctor: str, day: date, open_slots):
+    busy_slots = occupancy.busy_slots(doctor, day.isoformat())
+
+    # Формируем список доступных и занятых слотов (прошедшие не показываем)
     buttons = []
-    try:
-        with closing(sqlite3.connect('clinic.db')) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT time FROM appointments WHERE day=?", (day,))
-            busy_times = {row[0] for row in cursor.fetchall()}
-            
-            for hour in WORK_HOURS:
-                for minute in WORK_MINUTES:
-                    # Пропускаем 13:30 если не нужно
-                    if hour == 13 and minute == '30':
-                        continue
-                        
-                    time_str = f"{hour}:{minute}"
-                    status = "⛔ занято" if time_str in busy_times else "🕒"
-                    buttons.append([
-                        InlineKeyboardButton(
-                            text=f"{status} {time_str}",
-                            callback_data=f"time_{time_str}"
-                        )
-                    ])
-    except sqlite3.Error as e:
-        logging.error(f"Database error: {e}")
-        # Fallback к стандартным слотам
-        for hour in WORK_HOURS:
-            time_str = f"{hour}:00"
-            buttons.append([
-                InlineKeyboardButton(text=time_str, callback_data=f"time_{time_str}")
-            ])
-    
-    buttons.append([InlineKeyboardButton(text="◀️ Назад", callback_data="back_to_days")])
+    for slot in open_slots:
+        status = "⛔ занято" if slot in busy_slots else "🕒"
+        buttons.append([
+            InlineKeyboardButton(
+                text=f"{status} {calendar.slots[slot]}",
+                callback_data=f"time_{slot}_{doctor}"
+            )
+        ])
+
+    # Добавляем кнопки "Назад"
+    buttons.append([
+        InlineKeyboardButton(text="◀️ Назад к врачам", callback_data="back_to_doctors")
+    ])
+    buttons.append([
+        InlineKeyboardButton(text="◀️ Назад к дням", callback_data="back_to_days")
+    ])
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+def doctor_times_keyboard(doctor: str, day: date):
+    """Сетка времени врача на выбранную дату (из кэша, пока не изменилась занятость)"""
+    global _times_version
+    # Запись, архивация или смена расписания меняют версию — старые клавиатуры устаревают
+    version = (occupancy.version, clinic.version)
+    if _times_version != version:
+        _times_cache.clear()
+        _times_version = version
+
+    open_slots = calendar.open_slots(day)
+    key = (doctor, day, open_slots[0] if open_slots else None)
+    markup = _times_cache.get(key)
+    if markup is None:
+        markup = _times_cache[key] = _build_doctor_times_keyboard(doctor, day, open_slots)
+    return markup
+
+def doctors_markup(prefix: str, per_row: int = 2, consultations: bool = False) -> InlineKeyboardMarkup:
+    """
+    Кнопки врачей из настроек клиники: callback_data = prefix + код врача.
+    consultations=True — только врачи с Telegram ID (им можно задать вопрос).
+    """
+    key = (prefix, per_row, consultations, clinic.version)
+    markup = _doctor_cache.get(key)
+    if markup is None:
+        if len(_doctor_cache) > 8:
+            _doctor_cache.clear()
+        buttons = [
+            InlineKeyboardButton(text=doctor["title"], callback_data=f"{prefix}{code}")
+            for code, doctor in clinic.doctors.items()
+            if doctor["chat_id"] or not consultations
+        ]
+        markup = _doctor_cache[key] = InlineKeyboardMarkup(
+            inline_keyboard=[buttons[i:i + per_row] for i in range(0, len(buttons), per_row)]
+        )
+    return markup
+
+# Статичная клавиатура собирается один раз при импорте
+_confirm_markup = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [
+            InlineKeyboardButton(text="✅ Подтвердить", callback_data="confirm"),
+            InlineKeyboardButton(text="❌ Отмена", callback_data="cancel")
+        ]
+    ]
+)
+
 def doctor_keyboard():
     """Клавиатура выбора врача"""
-    return InlineKeyboardMarkup(
-        inline_keyboard=[
-            [
-                InlineKeyboardButton(text="👩‍⚕️ Педиатр", callback_data="doctor_pediatrician"),
-                InlineKeyboardButton(text="👨‍⚕️ Хирург", callback_data="doctor_surgeon")
-            ],
-            [
-                InlineKeyboardButton(text="👩‍⚕️ Гинеколог", callback_data="doctor_gynecologist")
-            ]
-        ]
-    )
+    return doctors_markup("doctor_")
 
 def confirm_keyboard():
     """Клавиатура подтверждения записи"""
-    return InlineKeyboardMarkup(
-        inline_keyboard=[
-            [
-                InlineKeyboardButton(text="✅ Подтвердить", callback_data="confirm"),
-                InlineKeyboardButton(text="❌ Отмена", callback_data="cancel")
-            ]
-        ]
-    )
+    return _confirm_markup
@@ -1,84 +1,217 @@
 import logging
 import asyncio
+from contextlib import suppress
 from aiogram import Bot, Dispatcher
-from config.settings import BOT_TOKEN
-from config.database import init_db
+from aiogram.fsm.storage.base import BaseStorage
+from config.settings import BOT_TOKEN, BOT_MODE, SHUTDOWN_TIMEOUT, ADMIN_ID
+from config.database import init_db, db
 from handlers.start import setup_handlers as setup_start_handlers
 from handlers.appointment import create_appointment_router
 from utils.weekly_reset import week_manager
+from utils.occupancy import occupancy
+from utils.reminders import reminders  # Напоминания пациентам о приёме
+from utils.clinic_config import clinic  # Врачи и расписание из БД
 from handlers.consultation import router as consultation_router
 from handlers.support import router as support_router  # Роутер поддержки (вопрос-ответ с админом)
 from services.admin_commands import router as admin_router  # Админские команды
-from config.settings import LOG_FILE, LOG_LEVEL
+from services.support import support_pool  # Пул операторов поддержки
+from services.broadcast import broadcaster  # Рассылки администратора
+from config.settings import (
+    THROTTLE_MESSAGE_RATE, THROTTLE_MESSAGE_BURST,
+    THROTTLE_CALLBACK_RATE, THROTTLE_CALLBACK_BURST,
+    THROTTLE_MAX_USERS, THROTTLE_WARNING_WINDOW,
+    IDEMPOTENCY_UPDATE_TTL, IDEMPOTENCY_TAP_TTL, IDEMPOTENCY_MAX_KEYS,
+    UPDATE_CONCURRENCY, CHAT_QUEUE_LIMIT
+)
 from middlewares.throttling import ThrottlingMiddleware  # Middleware для защиты от флуда
+from middlewares.idempotency import IdempotencyMiddleware  # Повторные нажатия кнопок
+from middlewares.ordering import OrderedUpdatesMiddleware  # Порядок обновлений внутри чата
+from utils.fsm_storage import SQLiteStorage, create_storage  # Хранилище FSM-состояний (SQLite или Redis)
+from utils.shared_state import shared_state  # Общее состояние нескольких процессов бота
+from utils.webhook import run_webhook  # Режим вебхука (встроенный aiohttp-сервер)
+from utils.sender import sender, PRIORITY_NOTIFY  # Очередь исходящих сообщений с учётом лимитов Telegram
+from utils.logs import setup_logging, stop_logging
+from utils.metrics import metrics, start_metrics_server  # Метрики и эндпоинт Prometheus
+from middlewares.metrics import MetricsMiddleware, ApiMetricsMiddleware
+from utils.lifecycle import lifecycle  # Плавная остановка и перезапуск
+
+def setup_dispatcher(storage: BaseStorage) -> Dispatcher:
+    """
+    Собирает диспетчер со всеми роутерами и middleware, как в работающем боте.
+    Не требует сети и БД — подходит и для прогона синтетических Update через feed_update.
+    Роутеры модулей подключаются к одному диспетчеру, поэтому вызывается один раз за процесс.
+    """
+    dp = Dispatcher(storage=storage)
+    dp.update.outer_middleware(lifecycle.track)  # Учёт обновлений в обработке для плавной остановки
+    # Обновления одного чата — по очереди (FSM не гоняется), разных чатов — параллельно
+    dp.update.outer_middleware(OrderedUpdatesMiddleware(
+        max_concurrency=UPDATE_CONCURRENCY,
+        max_queue=CHAT_QUEUE_LIMIT
+    ))
+
+    # Регистрация всех роутеров
+    dp.include_router(consultation_router)  # Роутер консультаций
+    dp.include_router(support_router)       # Роутер поддержки
+    dp.include_router(admin_router)         # Роутер команд администратора
+
+    # Подключение антифлуд-мидлвари — отдельные лимиты для сообщений и нажатий кнопок
+    dp.message.middleware(ThrottlingMiddleware(
+        rate=THROTTLE_MESSAGE_RATE,
+        burst=THROTTLE_MESSAGE_BURST,
+        max_users=THROTTLE_MAX_USERS,
+        warning_window=THROTTLE_WARNING_WINDOW,
+        name="message"
+    ))
+    dp.callback_query.middleware(ThrottlingMiddleware(
+        rate=THROTTLE_CALLBACK_RATE,
+        burst=THROTTLE_CALLBACK_BURST,
+        max_users=THROTTLE_MAX_USERS,
+        warning_window=THROTTLE_WARNING_WINDOW,
+        name="callback"
+    ))
+    # Повторные нажатия и повторно доставленные callback-запросы отсекаются после антифлуда:
+    # нажатие, отброшенное антифлудом, не считается обработанным и его можно повторить
+    dp.callback_query.middleware(IdempotencyMiddleware(
+        update_ttl=IDEMPOTENCY_UPDATE_TTL,
+        tap_ttl=IDEMPOTENCY_TAP_TTL,
+        max_keys=IDEMPOTENCY_MAX_KEYS
+    ))
+
+    # Замер времени обработчиков (после антифлуда — считаются только выполненные события)
+    dp.message.middleware(MetricsMiddleware())
+    dp.callback_query.middleware(MetricsMiddleware())
+
+    # Регистрация обработчиков и дополнительных роутеров
+    try:
+        setup_start_handlers(dp)  # Обработчики стартовых команд (/start и пр.)
+
+        # Роутер записи на приём (даты и слоты берутся из календаря)
+        appointment_router = create_appointment_router()
+        dp.include_router(appointment_router)
+
+        logging.info("Handlers registered successfully")
+    except Exception as e:
+        logging.error(f"Failed to register handlers: {e}")
+        raise
+
+    return dp
 
-# Настройка логирования: файл + консоль
-logging.basicConfig(
-    level=LOG_LEVEL,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(LOG_FILE),  # Лог в файл
-        logging.StreamHandler()         # Лог в консоль
-    ]
-)
 
 async def main():
-    # Инициализация бота и диспетчера
+    # Инициализация бота
     bot = Bot(token=BOT_TOKEN)
-    dp = Dispatcher()
+    bot.session.middleware(ApiMetricsMiddleware())  # Длительность запросов к Bot API
+    storage = create_storage()  # Состояния диалогов переживают перезапуск бота
 
     # Инициализация базы данных
     try:
-        init_db()
+        duplicates = init_db()
+        db.open()  # Пул соединений для обработчиков
+        await clinic.load()     # Врачи и расписание (до индекса занятости — он зависит от слотов)
+        await occupancy.load()  # Индекс занятых слотов для клавиатур записи
+        await storage.load()    # Восстановление незавершённых диалогов
         logging.info("Database initialized successfully")
     except Exception as e:
         logging.error(f"Failed to initialize database: {e}")
         raise
 
-    # Настройка планировщика сброса расписания (еженедельно)
+    # Запуск очереди исходящих сообщений
+    sender.init(bot)
+    sender.start()
+    if duplicates:
+        # Миграция уникального индекса убрала старые двойные записи — администратор должен их проверить
+        try:
+            await sender.send_message(
+                ADMIN_ID,
+                f"⚠️ Найдено {duplicates} двойных записей на один слот врача.\n"
+                "Оставлены самые ранние, остальные перенесены в таблицу appointments_duplicates (подробности в логе).",
+                priority=PRIORITY_NOTIFY
+            )
+        except Exception as e:
+            logging.error(f"Failed to notify admin about duplicate appointments: {e}")
+
+    # Эндпоинт метрик для Prometheus
+    metrics.gauge("bot_send_queue_size", sender.queue_size)
+    metrics.gauge("bot_reminders_pending", lambda: len(reminders))
+    if isinstance(storage, SQLiteStorage):
+        metrics.gauge("bot_fsm_states", lambda: len(storage))
+    metrics_runner = await start_metrics_server()
+
+    # Нагрузка операторов поддержки и передача просроченных обращений
+    await support_pool.load()
+
+    # Очередь напоминаний о будущих приёмах (после запуска очереди сообщений);
+    # без напоминаний бот всё равно должен принимать записи
+    try:
+        await reminders.load()
+    except Exception as e:
+        logging.error(f"Failed to load reminders: {e}", exc_info=True)
+    await broadcaster.resume()  # Рассылка, прерванная остановкой бота
+
+    # Настройка планировщика архивации прошедших записей (ежедневно)
     try:
         week_manager.init(bot)
-        asyncio.create_task(week_manager.schedule_reset())  # Запускаем фоновую задачу сброса расписания
+        archive_task = asyncio.create_task(week_manager.schedule_archive())  # Запускаем фоновую задачу архивации
         logging.info("Week manager initialized successfully")
     except Exception as e:
         logging.error(f"Failed to initialize week manager: {e}")
         raise
 
-    # Регистрация всех роутеров
-    dp.include_router(consultation_router)  # Роутер консультаций
-    dp.include_router(support_router)       # Роутер поддержки
-    dp.include_router(admin_router)         # Роутер команд администратора
+    dp = setup_dispatcher(storage)
+    dp.startup.register(lifecycle.report_ready)  # Время недоступности после /перезапуск
 
-    # Подключение антифлуд-мидлвари — защита от спама (таймаут 3 секунды)
-    dp.message.middleware(ThrottlingMiddleware(limit_seconds=3))
-
-    # Регистрация обработчиков и дополнительных роутеров
+    # Запуск бота: вебхук или polling (опрос обновлений от Telegram)
+    logging.info(f"Starting bot in {BOT_MODE} mode...")
     try:
-        setup_start_handlers(dp)  # Обработчики стартовых команд (/start и пр.)
-
-        # Роутер записи на приём, с доступом к менеджеру недельного расписания
-        appointment_router = create_appointment_router(week_manager)
-        dp.include_router(appointment_router)
+        if BOT_MODE == "webhook":
+            serving = asyncio.create_task(run_webhook(dp, bot))
+        else:
+            await bot.delete_webhook()  # Polling не работает при установленном вебхуке
+            # Сессию закрываем сами: после остановки polling она нужна для подтверждения обновлений
+            serving = asyncio.create_task(dp.start_polling(bot, close_bot_session=False))
 
-        logging.info("Handlers registered successfully")
-    except Exception as e:
-        logging.error(f"Failed to register handlers: {e}")
-        raise
-
-    # Запуск бота в режиме polling (опрос обновлений от Telegram)
-    logging.info("Starting bot...")
-    try:
-        await dp.start_polling(bot)
+        # Работаем до остановки приёма (сигнал, ошибка) или команды /перезапуск, /остановка
+        await lifecycle.wait(serving)
+        if not serving.done():
+            logging.info("Stopping intake of new updates...")
+            if BOT_MODE == "webhook":
+                serving.cancel()  # Веб-сервер закрывается, Telegram повторит доставку позже
+            else:
+                await dp.stop_polling()
+        with suppress(asyncio.CancelledError):
+            await serving
     except Exception as e:
         logging.error(f"Bot stopped with error: {e}")
         raise
     finally:
+        # Плавная остановка: дообработка полученных обновлений и фоновых задач, затем запись очередей
+        await lifecycle.drain()
+        if BOT_MODE != "webhook":
+            await lifecycle.ack_updates(bot)
+        await week_manager.stop(SHUTDOWN_TIMEOUT)
+        archive_task.cancel()
+        await support_pool.close()
+        await reminders.close()
+        await broadcaster.close()
+        await clinic.close()
+        await sender.close()       # Отправка оставшихся сообщений
+        if metrics_runner:
+            await metrics_runner.cleanup()
         await bot.session.close()  # Корректное закрытие сессии
+        await storage.close()      # Запись несохранённых состояний
+        await shared_state.close()
+        db.close()                 # Закрытие соединений с БД
+        logging.info(f"Shutdown finished ({lifecycle.action or 'signal'})")
+
+    return lifecycle.action
 
 # Точка входа в программу
 if __name__ == "__main__":
+    # Настройка логирования: файл с ротацией + консоль, запись в отдельном потоке
+    setup_logging()
+    action = None
     try:
-        asyncio.run(main())  # Запуск асинхронной функции main()
+        action = asyncio.run(main())  # Запуск асинхронной функции main()
     except KeyboardInterrupt:
         logging.info("Bot stopped by keyboard interrupt")  # Прерывание вручную (Ctrl+C)
     except SystemExit:
@@ -87,3 +220,8 @@ if __name__ == "__main__":
         logging.error(f"Bot crashed with error: {e}")      # Непредвиденная ошибка
     finally:
         logging.info("Bot shutdown complete")              # Завершение работы
+        stop_logging()                                     # Дописываем очередь логов
+
+    # /перезапуск: процесс заменяется новым только после полной остановки
+    if action == "restart":
+        lifecycle.exec_restart()
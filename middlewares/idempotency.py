@@ -0,0 +1,109 @@
+import logging
+import time
+from collections import OrderedDict
+from aiogram import BaseMiddleware
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import CallbackQuery
+from typing import Callable, Dict, Any, Awaitable, List, Tuple
+from utils.metrics import metrics
+from utils.shared_state import RedisError, shared_state
+
+
+class DedupeCache:
+    """
+    Множество ключей со сроком жизни ttl и не больше max_size элементов.
+    claim() возвращает True только для первого появления ключа за ttl.
+    """
+
+    def __init__(self, ttl: float, max_size: int = 10000, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.clock = clock
+        self._expires: "OrderedDict[str, float]" = OrderedDict()  # key -> срок; порядок добавления = порядок сроков
+
+    def claim(self, key: str) -> bool:
+        now = self.clock()
+        # Срок у всех ключей одинаковый, поэтому устаревшие всегда в начале
+        while self._expires and next(iter(self._expires.values())) <= now:
+            self._expires.popitem(last=False)
+        if key in self._expires:
+            return False
+        self._expires[key] = now + self.ttl
+        if len(self._expires) > self.max_size:
+            self._expires.popitem(last=False)
+        return True
+
+    def release(self, key: str):
+        self._expires.pop(key, None)
+
+    def __len__(self):
+        return len(self._expires)
+
+
+class IdempotencyMiddleware(BaseMiddleware):
+    """
+    Повторные нажатия кнопок обрабатываются один раз. Повтором считается:
+    - то же обновление (update_id) — Telegram доставил его ещё раз, например после перезапуска;
+    - то же нажатие (пользователь, сообщение, callback_data) в течение tap_ttl секунд — двойной тап.
+    Повтор сразу получает ответ «уже обработано» без обращений к БД и обработчикам.
+    Если обработчик упал, ключи освобождаются, и нажатие можно повторить.
+    Inner-middleware на dp.callback_query после антифлуда: ключи занимает только
+    нажатие, дошедшее до обработчика (не отброшенное антифлудом и не оставшееся без обработчика).
+    """
+
+    def __init__(self, update_ttl: float = 3600, tap_ttl: float = 3, max_keys: int = 10000):
+        self.updates = DedupeCache(update_ttl, max_keys)
+        self.taps = DedupeCache(tap_ttl, max_keys)
+        self.shared = shared_state.shared
+        super().__init__()
+
+    async def _claim(self, keys: List[Tuple[DedupeCache, str]]) -> List[bool]:
+        if not self.shared:
+            return [cache.claim(key) for cache, key in keys]
+        # Общее состояние: повтор, пришедший в другой процесс бота, тоже отсекается
+        try:
+            replies = await shared_state.redis.pipeline(*(
+                ("SET", f"dedupe:{key}", 1, "PX", int(cache.ttl * 1000), "NX") for cache, key in keys
+            ))
+        except (OSError, RedisError) as e:
+            logging.error(f"Idempotency backend error: {e}")
+            return [True] * len(keys)
+        return [reply == "OK" for reply in replies]
+
+    async def _release(self, keys: List[Tuple[DedupeCache, str]]):
+        if not self.shared:
+            for cache, key in keys:
+                cache.release(key)
+            return
+        try:
+            await shared_state.redis.execute("DEL", *(f"dedupe:{key}" for _, key in keys))
+        except (OSError, RedisError) as e:
+            logging.error(f"Idempotency backend error: {e}")
+
+    async def __call__(
+        self,
+        handler: Callable[[CallbackQuery, Dict[str, Any]], Awaitable[Any]],
+        event: CallbackQuery,
+        data: Dict[str, Any]
+    ) -> Any:
+        message_id = event.message.message_id if event.message else event.inline_message_id
+        keys = [(self.taps, f"tap:{event.from_user.id}:{message_id}:{event.data}")]
+        update = data.get("event_update")
+        if update is not None:
+            keys.insert(0, (self.updates, f"update:{update.update_id}"))
+
+        claimed = await self._claim(keys)
+        if not all(claimed):
+            kind = "update" if update is not None and not claimed[0] else "tap"
+            metrics.inc("bot_duplicate_callbacks_total", kind=kind)
+            try:
+                await event.answer("✅ Уже обработано")
+            except TelegramAPIError:
+                pass  # Повторно доставленный запрос может быть слишком старым для ответа
+            return
+
+        try:
+            return await handler(event, data)
+        except Exception:
+            await self._release(keys)
+            raise
@@ -0,0 +1,48 @@
+import time
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import TelegramMethod
+from aiogram.types import Message, CallbackQuery
+from typing import Callable, Dict, Any, Awaitable, Union
+from utils.metrics import metrics
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """Замеряет время каждого обработчика (метка — «модуль.функция») и считает исключения"""
+
+    async def __call__(
+        self,
+        handler: Callable[[Union[Message, CallbackQuery], Dict[str, Any]], Awaitable[Any]],
+        event: Union[Message, CallbackQuery],
+        data: Dict[str, Any]
+    ) -> Any:
+        callback = data["handler"].callback
+        name = f"{callback.__module__.rsplit('.', 1)[-1]}.{callback.__name__}"
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            metrics.inc("bot_handler_errors_total", handler=name, error=type(e).__name__)
+            raise
+        finally:
+            metrics.observe("bot_handler_seconds", time.perf_counter() - started, handler=name)
+
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """Замеряет длительность запросов к Bot API по методам (SendMessage, EditMessageText, ...)"""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: Bot,
+        method: TelegramMethod
+    ):
+        name = type(method).__name__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            metrics.inc("bot_api_errors_total", method=name, error=type(e).__name__)
+            raise
+        finally:
+            metrics.observe("bot_api_seconds", time.perf_counter() - started, method=name)
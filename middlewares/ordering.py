@@ -0,0 +1,68 @@
+import asyncio
+import logging
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+from typing import Callable, Dict, Any, Awaitable
+from utils.metrics import metrics
+
+
+class _ChatQueue:
+    __slots__ = ("lock", "pending")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()  # Очередь ожидающих у asyncio.Lock — FIFO
+        self.pending = 0            # Обновлений чата в обработке и в ожидании
+
+
+class OrderedUpdatesMiddleware(BaseMiddleware):
+    """
+    Обновления одного чата обрабатываются строго по очереди, разных чатов — параллельно.
+    Так два быстрых нажатия одного пользователя не читают и не пишут FSM-данные
+    одновременно. Всего одновременно выполняется не больше max_concurrency обработчиков;
+    в очереди одного чата не больше max_queue обновлений — лишние отбрасываются.
+    Outer-middleware на dp.update (после UserContextMiddleware, который определяет чат).
+    """
+
+    def __init__(self, max_concurrency: int = 100, max_queue: int = 20):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._chats: Dict[int, _ChatQueue] = {}
+        self._slots = None
+        super().__init__()
+
+    def __len__(self):
+        return len(self._chats)
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+
+        chat = data.get("event_chat") or data.get("event_from_user")
+        if chat is None:
+            # Обновление без чата (например, inline-запрос) упорядочивать не с чем
+            async with self._slots:
+                return await handler(event, data)
+
+        queue = self._chats.get(chat.id)
+        if queue is None:
+            queue = self._chats[chat.id] = _ChatQueue()
+        if queue.pending >= self.max_queue:
+            metrics.inc("bot_updates_dropped_total")
+            logging.warning(f"Update {event.update_id} dropped: chat {chat.id} has {queue.pending} queued")
+            return
+
+        queue.pending += 1
+        try:
+            # Сначала очередь чата, потом общий лимит: ожидающие чаты не занимают общие слоты
+            async with queue.lock:
+                async with self._slots:
+                    return await handler(event, data)
+        finally:
+            queue.pending -= 1
+            if not queue.pending:
+                del self._chats[chat.id]
@@ -1,29 +1,153 @@
+import logging
 import time
+from collections import OrderedDict
 from aiogram import BaseMiddleware
-from aiogram.types import Message
-from typing import Callable, Dict, Any, Awaitable
+from aiogram.types import Message, CallbackQuery
+from typing import Callable, Dict, Any, Awaitable, Union
+from utils.metrics import metrics
+from utils.shared_state import RedisClient, RedisError, shared_state
+
+
+class TokenBucketLimiter:
+    """
+    Token bucket на каждого пользователя: rate токенов в секунду, не больше burst.
+    Хранит не более max_users корзин — давно неактивные вытесняются (LRU).
+    """
+
+    def __init__(self, rate: float, burst: int, max_users: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_users = max_users
+        # user_id -> [токены, время пополнения, время последнего предупреждения]
+        self._buckets: "OrderedDict[int, list]" = OrderedDict()
+
+    def _bucket(self, user_id: int, now: float) -> list:
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = self._buckets[user_id] = [float(self.burst), now, 0.0]
+            if len(self._buckets) > self.max_users:
+                self._buckets.popitem(last=False)  # Вытесняем самого давнего пользователя
+        else:
+            self._buckets.move_to_end(user_id)
+            # Пополняем корзину за прошедшее время
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        return bucket
+
+    def consume(self, user_id: int, now: float = None) -> bool:
+        """Списывает токен; False — лимит исчерпан"""
+        bucket = self._bucket(user_id, time.monotonic() if now is None else now)
+        if bucket[0] < 1:
+            return False
+        bucket[0] -= 1
+        return True
+
+    def should_warn(self, user_id: int, window: float, now: float = None) -> bool:
+        """Разрешает не больше одного предупреждения за window секунд"""
+        now = time.monotonic() if now is None else now
+        bucket = self._bucket(user_id, now)
+        if now - bucket[2] < window:
+            return False
+        bucket[2] = now
+        return True
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+# Тот же token bucket, но атомарно на стороне Redis; время — часы сервера Redis, общие для всех процессов
+_TAKE_TOKEN = """
+local rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], ARGV[3])
+return allowed
+"""
+
+
+class RedisTokenBucketLimiter:
+    """
+    Token bucket в Redis: лимит общий для всех процессов бота.
+    Корзина живёт, пока не наполнится заново — полная корзина равна отсутствующей,
+    поэтому ограничивать число корзин, как в памяти, не нужно.
+    """
+
+    def __init__(self, redis: RedisClient, name: str, rate: float, burst: int):
+        self.redis = redis
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.ttl_ms = int(burst / rate * 1000) + 1000
+
+    async def consume(self, user_id: int) -> bool:
+        """Списывает токен; False — лимит исчерпан"""
+        allowed = await self.redis.execute(
+            "EVAL", _TAKE_TOKEN, 1, f"throttle:{self.name}:{user_id}", self.rate, self.burst, self.ttl_ms
+        )
+        return allowed == 1
+
+    async def should_warn(self, user_id: int, window: float) -> bool:
+        """Разрешает не больше одного предупреждения за window секунд"""
+        reply = await self.redis.execute(
+            "SET", f"throttle:{self.name}:warned:{user_id}", 1, "PX", int(window * 1000), "NX"
+        )
+        return reply == "OK"
 
-# Словарь для хранения времени последнего сообщения от каждого пользователя
-user_message_times: Dict[int, float] = {}
 
 class ThrottlingMiddleware(BaseMiddleware):
-    def __init__(self, limit_seconds: int = 3):
-        self.limit_seconds = limit_seconds
+    """
+    Антифлуд для сообщений и callback-запросов (отдельный экземпляр — отдельный лимит).
+    При общем состоянии (Redis) лимит считается для пользователя по всем процессам бота.
+    """
+
+    def __init__(self, rate: float = 1 / 3, burst: int = 3, max_users: int = 10000,
+                 warning_window: float = 10, name: str = "message"):
+        self.shared = shared_state.shared
+        if self.shared:
+            self.limiter = RedisTokenBucketLimiter(shared_state.redis, name, rate, burst)
+        else:
+            self.limiter = TokenBucketLimiter(rate, burst, max_users)
+        self.warning_window = warning_window
         super().__init__()
 
+    async def _consume(self, user_id: int) -> bool:
+        try:
+            return await self.limiter.consume(user_id)
+        except (OSError, RedisError) as e:
+            # Недоступность Redis не должна останавливать бота: пропускаем событие без лимита
+            logging.error(f"Throttling backend error: {e}")
+            return True
+
     async def __call__(
         self,
-        handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
-        event: Message,
+        handler: Callable[[Union[Message, CallbackQuery], Dict[str, Any]], Awaitable[Any]],
+        event: Union[Message, CallbackQuery],
         data: Dict[str, Any]
     ) -> Any:
-        user_id = event.from_user.id
-        now = time.time()
+        user = event.from_user
+        if user is None:
+            return await handler(event, data)
+        allowed = await self._consume(user.id) if self.shared else self.limiter.consume(user.id)
+        if allowed:
+            return await handler(event, data)
 
-        last_time = user_message_times.get(user_id, 0)
-        if now - last_time < self.limit_seconds:
+        # Лимит исчерпан: событие блокируется, предупреждаем не чаще раза за окно
+        metrics.inc("bot_throttled_total", event=type(event).__name__)
+        if self.shared:
+            warn = await self.limiter.should_warn(user.id, self.warning_window)
+        else:
+            warn = self.limiter.should_warn(user.id, self.warning_window)
+        if warn:
+            # У Message это ответное сообщение, у CallbackQuery — всплывающее уведомление
             await event.answer("🚫 Пожалуйста, не отправляйте сообщения слишком часто.")
-            return  # не передаем управление дальше (сообщение блокируется)
-
-        user_message_times[user_id] = now
-        return await handler(event, data)
\ No newline at end of file
+        return
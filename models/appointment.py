@@ -1,30 +1,35 @@
 import sqlite3
 import logging
-from contextlib import closing  # Для безопасного закрытия соединения с БД
+from datetime import date as Date
+from config.database import db  # Общий пул соединений с БД
+from utils.occupancy import occupancy  # Индекс занятости слотов
+from utils.reminders import reminders  # Напоминания о приёме
+from utils.metrics import metrics
+from utils.calendar_engine import DAY_NAMES, calendar
 
-def save_appointment(user_id: int, day: str, time: str, doctor: str):
+async def save_appointment(user_id: int, date: str, slot: int, doctor: str) -> bool:
     """
-    Сохраняет запись на приём в базу данных clinic.db.
-    Использует защищённый блок try-except и контекстный менеджер closing.
+    Атомарно бронирует слот врача (date — "YYYY-MM-DD", slot — индекс слота).
+    Возвращает False, если слот уже занят другим пациентом.
     """
     try:
-        # Открываем соединение с базой данных clinic.db
-        with closing(sqlite3.connect('clinic.db')) as conn:
-            # Включаем режим журнала WAL (write-ahead logging)
-            # Это увеличивает устойчивость к сбоям и позволяет нескольким процессам работать с БД
-            conn.execute("PRAGMA journal_mode=WAL")
+        # День недели и время сохраняются текстом только для отображения
+        day = DAY_NAMES[Date.fromisoformat(date).weekday()]
 
-            # Создаём курсор для выполнения SQL-запросов
-            cursor = conn.cursor()
+        # Одна вставка с учётом уникального индекса (doctor, date, slot):
+        # при конфликте строка не добавляется, и проверка SELECT не нужна
+        cursor = await db.execute(
+            """INSERT INTO appointments (user_id, day, time, doctor, date, slot) VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT(doctor, date, slot) DO NOTHING""",
+            (user_id, day, calendar.slots[slot], doctor, date, slot)
+        )
+        if cursor.rowcount == 0:
+            logging.info(f"Slot already taken: {date} {calendar.slots[slot]} {doctor}")
+            metrics.inc("bot_bookings_total", result="taken")
+            return False
 
-            # Выполняем SQL-запрос на добавление записи о приёме
-            cursor.execute(
-                "INSERT INTO appointments (user_id, day, time, doctor) VALUES (?, ?, ?, ?)",
-                (user_id, day, time, doctor)
-            )
-
-            # Подтверждаем изменения (коммит)
-            conn.commit()
+        occupancy.mark(doctor, date, slot)
+        metrics.inc("bot_bookings_total", result="booked")
 
     except sqlite3.IntegrityError as e:
         # Обработка ошибок целостности (например, дубликаты, ограничения UNIQUE)
@@ -40,3 +45,10 @@ def save_appointment(user_id: int, day: str, time: str, doctor: str):
         # Непредвиденная ошибка
         logging.error(f"Unexpected error in save_appointment: {e}")
         raise
+
+    # Запись уже сохранена: ошибка планирования напоминания не должна превращать её в отказ
+    try:
+        reminders.add(cursor.lastrowid, user_id, date, slot, doctor)
+    except Exception as e:
+        logging.error(f"Failed to schedule reminders for appointment {cursor.lastrowid}: {e}")
+    return True
@@ -1,10 +1,78 @@
-import sqlite3
-from datetime import datetime
-
-def save_consultation(patient_id: int, doctor_type: str, question: str, answer: str = None):
-    with sqlite3.connect('clinic.db') as conn:
-        conn.execute(
-            "INSERT INTO consultations (patient_id, doctor_type, question, answer, created_at) VALUES (?, ?, ?, ?, ?)",
-            (patient_id, doctor_type, question, answer, datetime.now())
+import logging
+from typing import Optional
+from config.database import db  # Общий пул соединений с БД
+
+
+def _insert_consultation(conn, user_id: int, doctor_type: str, patient_name: str, question: str) -> int:
+    with conn:
+        # Пациент мог не записываться на приём — заводим строку users для внешнего ключа
+        conn.execute("INSERT OR IGNORE INTO users (user_id) VALUES (?)", (user_id,))
+        cursor = conn.execute(
+            """INSERT INTO consultations (user_id, doctor_type, patient_name, message, status)
+               VALUES (?, ?, ?, ?, 'open')""",
+            (user_id, doctor_type, patient_name, question)
         )
-        conn.commit()
\ No newline at end of file
+        return cursor.lastrowid
+
+
+async def save_consultation(user_id: int, doctor_type: str, patient_name: str, question: str) -> int:
+    """Сохраняет вопрос пациента со статусом open и возвращает id консультации"""
+    consultation_id = await db.run(_insert_consultation, user_id, doctor_type, patient_name, question)
+    logging.info(f"Consultation {consultation_id} saved for {doctor_type}")
+    return consultation_id
+
+
+async def get_consultation(consultation_id: int):
+    return await db.fetchone("SELECT * FROM consultations WHERE id = ?", (consultation_id,))
+
+
+async def answer_consultation(consultation_id: int, response: str) -> bool:
+    """Сохраняет ответ врача; False — на вопрос уже ответили"""
+    cursor = await db.execute(
+        """UPDATE consultations SET response = ?, status = 'answered', answered_at = CURRENT_TIMESTAMP
+           WHERE id = ? AND status = 'open'""",
+        (response, consultation_id)
+    )
+    return cursor.rowcount > 0
+
+
+async def reopen_consultation(consultation_id: int):
+    """Возвращает вопрос во входящие, если ответ не удалось доставить пациенту"""
+    await db.execute(
+        """UPDATE consultations SET response = NULL, status = 'open', answered_at = NULL
+           WHERE id = ? AND status = 'answered'""",
+        (consultation_id,)
+    )
+
+
+async def get_open_consultations(doctor_type: str, after_id: Optional[int] = None, limit: int = 5) -> list:
+    """
+    Страница неотвеченных вопросов врача, от старых к новым.
+    Keyset-пагинация по (created_at, id): следующая страница начинается после
+    вопроса after_id, без OFFSET — одинаково быстро на любой странице.
+    """
+    sql = """SELECT id, user_id, patient_name, message, created_at FROM consultations
+             WHERE doctor_type = ? AND status = 'open'"""
+    params = [doctor_type]
+    if after_id is not None:
+        sql += " AND (created_at, id) > (SELECT created_at, id FROM consultations WHERE id = ?)"
+        params.append(after_id)
+    sql += " ORDER BY created_at, id LIMIT ?"
+    params.append(limit)
+    return await db.fetchall(sql, params)
+
+
+async def count_open_consultations(doctor_type: str) -> int:
+    row = await db.fetchone(
+        "SELECT COUNT(*) FROM consultations WHERE doctor_type = ? AND status = 'open'",
+        (doctor_type,)
+    )
+    return row[0]
+
+
+async def count_open_by_doctor() -> dict:
+    """Число неотвеченных вопросов по специализациям (только ненулевые)"""
+    rows = await db.fetchall(
+        "SELECT doctor_type, COUNT(*) FROM consultations WHERE status = 'open' GROUP BY doctor_type"
+    )
+    return dict(rows)
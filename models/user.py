@@ -1,31 +1,20 @@
 import sqlite3
 import logging
-from contextlib import closing
+from config.database import db
 
-def save_user(user_id: int, first_name: str, last_name: str):
+async def save_user(user_id: int, first_name: str, last_name: str):
     """Безопасное сохранение пользователя с проверкой существования"""
     try:
-        with closing(sqlite3.connect('clinic.db')) as conn:
-            conn.execute("PRAGMA journal_mode=WAL")
-            cursor = conn.cursor()
-            
-            # Проверяем существование пользователя
-            cursor.execute("SELECT 1 FROM users WHERE user_id = ?", (user_id,))
-            
-            if cursor.fetchone():
-                # Обновляем данные
-                cursor.execute(
-                    "UPDATE users SET first_name = ?, last_name = ? WHERE user_id = ?",
-                    (first_name, last_name, user_id)
-                )
-            else:
-                # Создаем нового пользователя
-                cursor.execute(
-                    "INSERT INTO users (user_id, first_name, last_name) VALUES (?, ?, ?)",
-                    (user_id, first_name, last_name)
-                )
-            conn.commit()
-            
+        # Создаем нового пользователя или обновляем данные одним запросом
+        await db.execute(
+            """INSERT INTO users (user_id, first_name, last_name) VALUES (?, ?, ?)
+               ON CONFLICT(user_id) DO UPDATE SET
+                   first_name = excluded.first_name,
+                   last_name = excluded.last_name,
+                   blocked_at = NULL""",  # Пользователь снова пишет боту — рассылки ему доступны
+            (user_id, first_name, last_name)
+        )
+
     except sqlite3.IntegrityError as e:
         logging.warning(f"User {user_id} already exists: {e}")
         raise
@@ -34,4 +23,4 @@ def save_user(user_id: int, first_name: str, last_name: str):
         raise
     except Exception as e:
         logging.error(f"Unexpected error in save_user: {e}")
-        raise
\ No newline at end of file
+        raise
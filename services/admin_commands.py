@@ -1,11 +1,20 @@
 import os
+import asyncio
 import logging
 import sqlite3
-import subprocess
-import sys
-from aiogram import Router, types
-from aiogram.filters import Command
-from config.settings import ADMIN_ID, DB_PATH
+from datetime import date, datetime
+from aiogram import F, Router, types
+from aiogram.filters import Command, CommandObject
+from config.settings import ADMIN_ID, APPOINTMENTS_PAGE_SIZE
+from config.database import db
+from utils.occupancy import occupancy
+from services.export import export_to_file, EXPORT_SOURCES, EXPORT_ALIASES
+from services.broadcast import broadcaster, format_stats
+from utils.logs import search_logs, LEVELS
+from utils.lifecycle import lifecycle
+from utils.metrics import metrics
+from utils.clinic_config import clinic, ScheduleConflict
+from utils.calendar_engine import Schedule, calendar
 
 # Создаём экземпляр роутера для регистрации команд
 router = Router()
@@ -14,124 +23,536 @@ router = Router()
 async def is_admin(user_id: int) -> bool:
     return user_id == ADMIN_ID
 
-# Получение всех занятых записей на приём из базы данных
-def get_occupied_appointments():
-    """Возвращает список занятых записей из БД"""
+# Одна страница занятых записей (keyset-пагинация по (date, slot, id))
+async def get_appointments_page(cursor: tuple = None, backward: bool = False,
+                                doctor: str = None, day: str = None,
+                                limit: int = APPOINTMENTS_PAGE_SIZE):
+    """
+    Возвращает (записи, есть_ещё) — не больше limit записей после cursor
+    (или перед ним, если backward). Каждая страница — один индексный запрос.
+    """
+    conditions, params = ["a.date IS NOT NULL", "a.slot IS NOT NULL"], []
+    if doctor:
+        conditions.append("a.doctor = ?")
+        params.append(doctor)
+    if day:
+        conditions.append("a.date = ?")
+        params.append(day)
+    if cursor:
+        conditions.append(f"(a.date, a.slot, a.id) {'<' if backward else '>'} (?, ?, ?)")
+        params.extend(cursor)
+    order = "DESC" if backward else "ASC"
+
     try:
-        with sqlite3.connect(DB_PATH) as conn:
-            conn.row_factory = sqlite3.Row  # Доступ к столбцам по названию
-            cursor = conn.cursor()
-            # Получаем записи с данными пациента, врача и времени
-            cursor.execute("""
-                SELECT 
-                    a.id,
-                    u.first_name || ' ' || u.last_name as patient_name,
-                    a.doctor as doctor_name,
-                    a.day || ' ' || a.time as appointment_time
-                FROM appointments a
-                JOIN users u ON a.user_id = u.user_id
-                ORDER BY a.day, a.time
-            """)
-            return cursor.fetchall()
+        rows = await db.fetchall(f"""
+            SELECT 
+                a.id, a.date, a.slot, a.day, a.time,
+                u.first_name || ' ' || u.last_name as patient_name,
+                a.doctor as doctor_name
+            FROM appointments a
+            JOIN users u ON a.user_id = u.user_id
+            WHERE {' AND '.join(conditions)}
+            ORDER BY a.date {order}, a.slot {order}, a.id {order}
+            LIMIT ?
+        """, (*params, limit + 1))
     except sqlite3.Error as e:
-        logging.error(f"Database error in get_occupied_appointments: {e}")
+        logging.error(f"Database error in get_appointments_page: {e}")
         raise
 
-# Команда: /занятые_записи — показать администратору список всех занятых слотов
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backward:
+        rows.reverse()
+    return rows, has_more
+
+def _parse_filters(args: str):
+    """Разбирает аргументы команды: код врача и/или дата (ГГГГ-ММ-ДД или ДД.ММ)"""
+    doctor, day = None, None
+    for token in (args or "").split():
+        if token in clinic.doctors:
+            doctor = token
+            continue
+        try:
+            if "." in token:
+                parsed = datetime.strptime(token, "%d.%m").date().replace(year=date.today().year)
+            else:
+                parsed = date.fromisoformat(token)
+        except ValueError:
+            raise ValueError(token)
+        day = parsed.isoformat()
+    return doctor, day
+
+def _render_appointments_page(rows, has_prev: bool, has_next: bool, doctor: str, day: str):
+    """Текст страницы и кнопки навигации ◀️/▶️"""
+    filters = ", ".join(f for f in (doctor, day) if f)
+    lines = [f"📋 Занятые записи{f' ({filters})' if filters else ''}:\n"]
+    for app in rows:
+        lines.append(
+            f"🆔 ID: {app['id']}\n"
+            f"👤 Пациент: {app['patient_name']}\n"
+            f"👨‍⚕️ Врач: {app['doctor_name']}\n"
+            f"🕒 Время: {app['date']} ({app['day']}) {app['time']}\n"
+            f"────────────────────"
+        )
+
+    # В callback_data помещаются курсор и фильтры (лимит Telegram — 64 байта)
+    suffix = f"{doctor or ''}:{day or ''}"
+    buttons = []
+    if has_prev:
+        first = rows[0]
+        buttons.append(types.InlineKeyboardButton(
+            text="◀️ Назад",
+            callback_data=f"occ:p:{first['date']}:{first['slot']}:{first['id']}:{suffix}"
+        ))
+    if has_next:
+        last = rows[-1]
+        buttons.append(types.InlineKeyboardButton(
+            text="Вперёд ▶️",
+            callback_data=f"occ:n:{last['date']}:{last['slot']}:{last['id']}:{suffix}"
+        ))
+    markup = types.InlineKeyboardMarkup(inline_keyboard=[buttons]) if buttons else None
+    return "\n".join(lines), markup
+
+# Команда: /занятые_записи [врач] [дата] — постраничный список занятых слотов
 @router.message(Command("занятые_записи"))
-async def show_occupied_appointments(message: types.Message):
+async def show_occupied_appointments(message: types.Message, command: CommandObject):
     if not await is_admin(message.from_user.id):
         await message.answer("❌ У вас нет прав для использования этой команды.")
         return
 
     try:
-        appointments = get_occupied_appointments()
-        if not appointments:
+        try:
+            doctor, day = _parse_filters(command.args)
+        except ValueError as e:
+            await message.answer(
+                f"ℹ️ Непонятный фильтр: {e}\n"
+                f"Пример: /занятые_записи surgeon 2025-05-20\n"
+                f"Врачи: {', '.join(clinic.doctors)}"
+            )
+            return
+
+        rows, has_next = await get_appointments_page(doctor=doctor, day=day)
+        if not rows:
             await message.answer("📅 Нет занятых записей.")
             return
-        
-        # Формируем текстовый ответ
-        response = "📋 Занятые записи:\n\n"
-        for app in appointments:
-            response += (
-                f"🆔 ID: {app['id']}\n"
-                f"👤 Пациент: {app['patient_name']}\n"
-                f"👨‍⚕️ Врач: {app['doctor_name']}\n"
-                f"🕒 Время: {app['appointment_time']}\n"
-                f"────────────────────\n"
-            )
-        
-        # Разбиваем длинное сообщение на части, если больше 4000 символов
-        if len(response) > 4000:
-            parts = [response[i:i+4000] for i in range(0, len(response), 4000)]
-            for part in parts:
-                await message.answer(part)
-        else:
-            await message.answer(response)
-            
+
+        text, markup = _render_appointments_page(rows, False, has_next, doctor, day)
+        await message.answer(text, reply_markup=markup)
+
     except Exception as e:
         logging.error(f"Error in /занятые_записи: {e}", exc_info=True)
         await message.answer("⚠️ Произошла ошибка при получении занятых записей.\nПодробности в логах.")
 
-# Команда: /перезапуск — перезапуск бота администратором
-@router.message(Command("перезапуск"))
-async def restart_bot(message: types.Message):
-    if not await is_admin(message.from_user.id):
-        await message.answer("❌ У вас нет прав для использования этой команды.")
+# Листание страниц /занятые_записи: редактируем то же сообщение
+@router.callback_query(F.data.startswith("occ:"))
+async def page_occupied_appointments(callback: types.CallbackQuery):
+    if not await is_admin(callback.from_user.id):
+        await callback.answer("❌ Нет прав", show_alert=True)
         return
 
     try:
-        await message.answer("🔄 Бот перезагружается...")
+        _, direction, cursor_date, cursor_slot, cursor_id, doctor, day = callback.data.split(":")
+        backward = direction == "p"
+        rows, has_more = await get_appointments_page(
+            cursor=(cursor_date, int(cursor_slot), int(cursor_id)),
+            backward=backward,
+            doctor=doctor or None,
+            day=day or None
+        )
+        if not rows:
+            await callback.answer("Больше записей нет")
+            return
 
-        # Получаем путь к Python-интерпретатору и аргументы запуска
-        python = sys.executable
-        args = sys.argv
+        # Пришли с соседней страницы — значит, в обратную сторону записи есть
+        has_prev, has_next = (has_more, True) if backward else (True, has_more)
+        text, markup = _render_appointments_page(rows, has_prev, has_next, doctor or None, day or None)
+        await callback.message.edit_text(text, reply_markup=markup)
+        await callback.answer()
 
-        # Перезапускаем текущий процесс (замена текущего процесса новым)
-        os.execl(python, python, *args)
-        
     except Exception as e:
-        logging.error(f"Restart error: {e}", exc_info=True)
-        await message.answer(f"⚠️ Ошибка перезагрузки: {e}")
+        logging.error(f"Error paging /занятые_записи: {e}", exc_info=True)
+        await callback.answer("⚠️ Ошибка при загрузке страницы", show_alert=True)
 
-# Команда: /остановка — остановка бота (завершение процесса)
-@router.message(Command("остановка"))
-async def stop_bot(message: types.Message):
+# Команда: /проверка_слотов — сверить индекс занятости с таблицей записей
+@router.message(Command("проверка_слотов"))
+async def check_occupancy(message: types.Message):
     if not await is_admin(message.from_user.id):
         await message.answer("❌ У вас нет прав для использования этой команды.")
         return
 
     try:
-        await message.answer("🛑 Бот останавливается...")
+        if await occupancy.verify():
+            await message.answer("✅ Индекс занятости совпадает с базой.")
+        else:
+            await message.answer("⚠️ Индекс занятости расходился с базой и был перестроен.")
+    except Exception as e:
+        logging.error(f"Error in /проверка_слотов: {e}", exc_info=True)
+        await message.answer("⚠️ Ошибка проверки индекса занятости.\nПодробности в логах.")
 
-        # Показываем, что бот "печатает"
-        from aiogram.enums import ChatAction
-        await message.bot.send_chat_action(message.chat.id, ChatAction.TYPING)
+# Команда: /экспорт <записи|пользователи|консультации> [csv|xlsx] [врач] [с] [по]
+@router.message(Command("экспорт"))
+async def export_data(message: types.Message, command: CommandObject):
+    if not await is_admin(message.from_user.id):
+        await message.answer("❌ У вас нет прав для использования этой команды.")
+        return
+
+    usage = (
+        "ℹ️ Использование: /экспорт <записи|пользователи|консультации> [csv|xlsx] [врач] [с ГГГГ-ММ-ДД] [по ГГГГ-ММ-ДД]\n"
+        "Пример: /экспорт записи xlsx surgeon 2025-05-01 2025-05-31"
+    )
+    tokens = (command.args or "").split()
+    if not tokens or (tokens[0] not in EXPORT_ALIASES and tokens[0] not in EXPORT_SOURCES):
+        await message.answer(usage)
+        return
 
-        # Завершаем процесс (код 0 — нормальное завершение)
-        os._exit(0)
-        
+    source = EXPORT_ALIASES.get(tokens[0], tokens[0])
+    fmt, doctor, dates = "csv", None, []
+    for token in tokens[1:]:
+        if token in ("csv", "xlsx"):
+            fmt = token
+        elif token in clinic.doctors:
+            doctor = token
+        else:
+            try:
+                dates.append(date.fromisoformat(token).isoformat())
+            except ValueError:
+                await message.answer(f"⚠️ Непонятный аргумент: {token}\n\n{usage}")
+                return
+    date_from = dates[0] if dates else None
+    date_to = dates[1] if len(dates) > 1 else None
+
+    path = None
+    try:
+        path, count = await export_to_file(source, fmt, doctor, date_from, date_to)
+        await message.answer_document(
+            types.FSInputFile(path, filename=f"{source}.{fmt}"),
+            caption=f"📦 Выгружено строк: {count}"
+        )
+    except RuntimeError as e:
+        await message.answer(f"⚠️ {e}")
     except Exception as e:
-        logging.error(f"Stop error: {e}", exc_info=True)
-        await message.answer(f"⚠️ Ошибка остановки: {e}")
+        logging.error(f"Export error: {e}", exc_info=True)
+        await message.answer("⚠️ Ошибка при выгрузке данных.\nПодробности в логах.")
+    finally:
+        if path and os.path.exists(path):
+            os.remove(path)
+
+# Команда: /перезапуск — плавный перезапуск бота администратором
+@router.message(Command("перезапуск"))
+async def restart_bot(message: types.Message):
+    if not await is_admin(message.from_user.id):
+        await message.answer("❌ У вас нет прав для использования этой команды.")
+        return
+
+    await message.answer("🔄 Бот перезагружается: дожидаемся завершения текущих операций...")
+    # Приём обновлений останавливается в main(): начатые обработчики и фоновые задачи
+    # завершаются, обработанные обновления подтверждаются, затем процесс заменяется новым
+    lifecycle.request("restart", message.chat.id)
+
+# Команда: /остановка — плавная остановка бота (завершение процесса)
+@router.message(Command("остановка"))
+async def stop_bot(message: types.Message):
+    if not await is_admin(message.from_user.id):
+        await message.answer("❌ У вас нет прав для использования этой команды.")
+        return
+
+    await message.answer("🛑 Бот останавливается: дожидаемся завершения текущих операций...")
+    lifecycle.request("stop", message.chat.id)
 
-# Команда: /логи — отправить файл логов администратору
+# Команда: /логи [уровень] [since=ГГГГ-ММ-ДДTЧЧ:ММ] [N] [grep=шаблон] — выборка из логов
 @router.message(Command("логи"))
-async def get_logs(message: types.Message):
+async def get_logs(message: types.Message, command: CommandObject):
     if not await is_admin(message.from_user.id):
         await message.answer("❌ У вас нет прав для использования этой команды.")
         return
 
+    # Разбираем аргументы; grep= забирает весь остаток строки (шаблон может содержать пробелы)
+    args = command.args or ""
+    pattern = None
+    if "grep=" in args:
+        args, pattern = args.split("grep=", 1)
+        pattern = pattern.strip() or None
+
+    level, since, last = None, None, 50
+    try:
+        for token in args.split():
+            key, _, value = token.partition("=")
+            if key.upper() in LEVELS and not value:
+                level = key.upper()
+            elif key == "level" and value.upper() in LEVELS:
+                level = value.upper()
+            elif key == "since":
+                since = datetime.fromisoformat(value)
+            elif key.isdigit() and not value:
+                last = int(key)
+            elif key == "last":
+                last = int(value)
+            else:
+                raise ValueError(token)
+    except ValueError as e:
+        await message.answer(
+            f"ℹ️ Непонятный аргумент: {e}\n"
+            "Пример: /логи ERROR since=2025-05-16T18:00 100 grep=timeout"
+        )
+        return
+    last = max(1, min(last, 1000))
+
     try:
-        log_file = "bot.log"
-        # Проверяем, существует ли файл логов
-        if not os.path.exists(log_file):
-            await message.answer("📁 Файл логов не найден")
+        records = await asyncio.to_thread(search_logs, level, since, pattern, last)
+        if not records:
+            await message.answer("📁 Подходящих записей в логах нет")
             return
-        
-        # Отправляем лог-файл как документ
-        await message.answer_document(types.FSInputFile(log_file))
-        
+
+        text = "".join(records)
+        if len(text) <= 4000:
+            await message.answer(text)
+        else:
+            # Длинную выборку отправляем файлом — только найденные записи, а не весь лог
+            await message.answer_document(
+                types.BufferedInputFile(text.encode("utf-8"), filename="logs.txt"),
+                caption=f"📁 Записей: {len(records)}"
+            )
+
     except Exception as e:
         logging.error(f"Logs error: {e}", exc_info=True)
         await message.answer(f"⚠️ Ошибка получения логов: {e}")
+
+
+def _label(labels: tuple, name: str) -> str:
+    return dict(labels).get(name, "?")
+
+
+def _counter_line(title: str, name: str, label: str) -> str:
+    values = {_label(labels, label): value for labels, value in metrics.counters(name).items()}
+    parts = ", ".join(f"{key}: {value:g}" for key, value in sorted(values.items()))
+    return f"{title}: {parts or 'нет'}"
+
+
+def _percentiles(h) -> str:
+    # Оценки сверху по границам корзин гистограммы
+    p50, p95, p99 = (h.quantile(q) * 1000 for q in (0.5, 0.95, 0.99))
+    return f"{h.count}, ср. {h.sum / h.count * 1000:.0f} мс, p50/p95/p99 ≤ {p50:.0f}/{p95:.0f}/{p99:.0f} мс"
+
+
+def _histogram_lines(name: str, label: str, top: int = 5) -> list:
+    """Самые медленные по p95 — «метка: N, ср. X мс, p50/p95/p99 ≤ ... мс»"""
+    rows = [(h.quantile(0.95), _label(labels, label), h)
+            for labels, h in metrics.histograms(name).items() if h.count]
+    rows.sort(key=lambda row: row[:2], reverse=True)
+    return [f"• {key}: {_percentiles(h)}" for _, key, h in rows[:top]]
+
+
+# Команда: /метрики — сводка по обработчикам, Bot API, БД и бизнес-счётчикам
+@router.message(Command("метрики"))
+async def show_metrics(message: types.Message):
+    if not await is_admin(message.from_user.id):
+        await message.answer("❌ У вас нет прав для использования этой команды.")
+        return
+
+    uptime = int(datetime.now().timestamp() - metrics.started)
+    db_wait = metrics.histograms("bot_db_wait_seconds").get((), None)
+    errors = sum(metrics.counters("bot_handler_errors_total").values())
+    api_errors = sum(metrics.counters("bot_api_errors_total").values())
+    lines = [
+        f"📊 Метрики за {uptime // 3600} ч {uptime % 3600 // 60} мин",
+        "",
+        _counter_line("📅 Записи", "bot_bookings_total", "result"),
+        _counter_line("💬 Консультации", "bot_consultations_total", "event"),
+        _counter_line("🛟 Поддержка", "bot_support_tickets_total", "event"),
+        f"🚫 Отклонено антифлудом: {sum(metrics.counters('bot_throttled_total').values()):g}",
+        "",
+        f"⏱ Обработчики (ошибок: {errors:g}):",
+        *_histogram_lines("bot_handler_seconds", "handler"),
+        "",
+        f"📡 Bot API (ошибок: {api_errors:g}):",
+        *_histogram_lines("bot_api_seconds", "method"),
+        "",
+        "🗄 База данных:",
+        *_histogram_lines("bot_db_seconds", "query"),
+    ]
+    if db_wait and db_wait.count:
+        lines.append(f"• ожидание соединения: {_percentiles(db_wait)}")
+    await message.answer("\n".join(lines))
+
+
+DAY_CODES = ["пн", "вт", "ср", "чт", "пт", "сб", "вс"]
+
+
+def _parse_range(value: str, parse) -> list:
+    """«10-13» или «10,11,12» (дни — «пн-пт», «пн,ср,пт») -> список чисел"""
+    result = []
+    for part in value.split(","):
+        start, _, end = part.strip().partition("-")
+        first = parse(start)
+        result.extend(range(first, parse(end) + 1) if end else [first])
+    return result
+
+
+def _day_number(value: str) -> int:
+    return DAY_CODES.index(value.strip().lower())
+
+
+def _schedule_text() -> str:
+    schedule = calendar.schedule
+    days = ", ".join(DAY_CODES[day] for day in schedule.days)
+    return f"🗓 Рабочие дни: {days}\n🕒 Слоты: {', '.join(schedule.slots)}"
+
+
+# Команда: /врачи — врачи и расписание клиники
+@router.message(Command("врачи"))
+async def show_clinic_config(message: types.Message):
+    if not await is_admin(message.from_user.id):
+        await message.answer("❌ У вас нет прав для использования этой команды.")
+        return
+
+    lines = ["👨‍⚕️ Врачи:"]
+    for code, doctor in clinic.doctors.items():
+        chat = doctor["chat_id"] or "без консультаций"
+        lines.append(f"• {code} — {doctor['title']} ({chat})")
+    lines += ["", _schedule_text(), "",
+              "Изменить: /врач <код> <telegram_id> <название>, /врач_убрать <код>,",
+              "/расписание часы=10-13 минуты=0,30 дни=пн-пт"]
+    await message.answer("\n".join(lines))
+
+
+# Команда: /врач <код> <telegram_id|-> <название> — добавить или изменить врача
+@router.message(Command("врач"))
+async def save_doctor(message: types.Message, command: CommandObject):
+    if not await is_admin(message.from_user.id):
+        await message.answer("❌ У вас нет прав для использования этой команды.")
+        return
+
+    parts = (command.args or "").split(maxsplit=2)
+    if len(parts) < 3 or not (parts[1] == "-" or parts[1].lstrip("-").isdigit()):
+        await message.answer(
+            "ℹ️ Формат: /врач <код> <telegram_id> <название>\n"
+            "Пример: /врач cardiologist 123456789 ❤️ Кардиолог\n"
+            "Вместо telegram_id «-» — врач без консультаций"
+        )
+        return
+
+    code, chat_id, title = parts[0].lower(), parts[1], parts[2]
+    try:
+        await clinic.save_doctor(code, None if chat_id == "-" else int(chat_id), title)
+    except ValueError as e:
+        await message.answer(f"⚠️ {e}")
+        return
+    logging.info(f"Admin {message.from_user.id} saved doctor {code}")
+    await message.answer(f"✅ Врач {code} — {title} сохранён. Клавиатуры уже обновлены.")
+
+
+# Команда: /врач_убрать <код> — скрыть врача из записи и консультаций
+@router.message(Command("врач_убрать"))
+async def disable_doctor(message: types.Message, command: CommandObject):
+    if not await is_admin(message.from_user.id):
+        await message.answer("❌ У вас нет прав для использования этой команды.")
+        return
+
+    code = (command.args or "").strip().lower()
+    if not code:
+        await message.answer("ℹ️ Формат: /врач_убрать <код>")
+        return
+    if not await clinic.disable_doctor(code):
+        await message.answer(f"⚠️ Активного врача {code} нет")
+        return
+    logging.info(f"Admin {message.from_user.id} disabled doctor {code}")
+    await message.answer(f"✅ Врач {code} скрыт. Уже сделанные записи сохранены.")
+
+
+# Команда: /расписание [часы=10-13] [минуты=0,30] [дни=пн-пт] — показать или изменить расписание
+@router.message(Command("расписание"))
+async def edit_schedule(message: types.Message, command: CommandObject):
+    if not await is_admin(message.from_user.id):
+        await message.answer("❌ У вас нет прав для использования этой команды.")
+        return
+
+    if not command.args:
+        await message.answer(_schedule_text())
+        return
+
+    current = calendar.schedule
+    hours, minutes, days = current.hours, current.minutes, current.days
+    try:
+        for token in command.args.split():
+            key, _, value = token.partition("=")
+            if key == "часы":
+                hours = _parse_range(value, int)
+            elif key == "минуты":
+                minutes = _parse_range(value, int)
+            elif key == "дни":
+                days = _parse_range(value, _day_number)
+            else:
+                raise ValueError(token)
+        schedule = Schedule(hours, minutes, days)
+    except ValueError as e:
+        await message.answer(
+            f"ℹ️ Непонятный аргумент: {e}\n"
+            "Пример: /расписание часы=9-17 минуты=0,30 дни=пн-пт"
+        )
+        return
+
+    try:
+        await clinic.save_schedule(schedule)
+    except ScheduleConflict as e:
+        sample = "\n".join(f"• {row['date']} {row['time']} {row['doctor']}" for row in e.appointments[:10])
+        await message.answer(
+            f"⛔ Расписание не изменено — записи вне нового расписания: {len(e.appointments)}\n{sample}"
+        )
+        return
+    except ValueError as e:
+        await message.answer(f"⚠️ {e}")
+        return
+
+    logging.info(f"Admin {message.from_user.id} changed schedule: {schedule.slots} / {schedule.days}")
+    await message.answer(f"✅ Расписание обновлено\n\n{_schedule_text()}")
+
+
+# Команда: /рассылка <текст> — сообщение всем пользователям бота
+@router.message(Command("рассылка"))
+async def start_broadcast(message: types.Message, command: CommandObject):
+    if not await is_admin(message.from_user.id):
+        await message.answer("❌ У вас нет прав для использования этой команды.")
+        return
+
+    text = (command.args or "").strip()
+    if not text:
+        await message.answer("ℹ️ Использование: /рассылка <текст сообщения>")
+        return
+
+    broadcast_id, total = await broadcaster.start(text, message.chat.id)
+    if broadcast_id is None:
+        await message.answer(f"⏳ Ещё идёт рассылка #{total}. Ход — /рассылка_статус, остановить — /рассылка_стоп")
+        return
+    await message.answer(
+        f"📣 Рассылка #{broadcast_id} запущена: {total} получателей.\n"
+        "Ход — /рассылка_статус, остановить — /рассылка_стоп"
+    )
+
+
+# Команда: /рассылка_статус — ход последней рассылки
+@router.message(Command("рассылка_статус"))
+async def broadcast_status(message: types.Message):
+    if not await is_admin(message.from_user.id):
+        await message.answer("❌ У вас нет прав для использования этой команды.")
+        return
+
+    row = await broadcaster.get()
+    if row is None:
+        await message.answer("ℹ️ Рассылок ещё не было.")
+        return
+    status = {"running": "идёт", "done": "завершена", "cancelled": "остановлена"}.get(row["status"], row["status"])
+    await message.answer(f"📣 Рассылка #{row['id']} ({status})\n\n{format_stats(row)}")
+
+
+# Команда: /рассылка_стоп — остановить идущую рассылку
+@router.message(Command("рассылка_стоп"))
+async def stop_broadcast(message: types.Message):
+    if not await is_admin(message.from_user.id):
+        await message.answer("❌ У вас нет прав для использования этой команды.")
+        return
+
+    broadcast_id = await broadcaster.cancel()
+    if broadcast_id is None:
+        await message.answer("ℹ️ Сейчас рассылка не идёт.")
+        return
+    await message.answer(f"🛑 Рассылка #{broadcast_id} остановлена.")
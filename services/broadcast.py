@@ -0,0 +1,165 @@
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+from aiogram.exceptions import TelegramForbiddenError
+from config.database import db
+from config.settings import BROADCAST_BATCH_SIZE
+from utils.metrics import metrics
+from utils.sender import sender, PRIORITY_BULK, PRIORITY_NOTIFY
+from utils.shared_state import Lease
+
+
+class Broadcaster:
+    """
+    Рассылка сообщения всем пользователям из users.
+    Получатели выбираются пачками по возрастанию user_id; пачка ставится в очередь
+    отправки с низким приоритетом — лимиты Telegram соблюдает sender, а ответы
+    пациентам обгоняют рассылку. После каждой пачки прогресс и статистика
+    записываются в broadcasts, поэтому после перезапуска рассылка продолжается
+    со следующей пачки. Заблокировавшие бота помечаются в users.blocked_at и пропускаются.
+    """
+
+    def __init__(self, batch_size: int = BROADCAST_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.lease = Lease("broadcast")
+        self._task = None
+
+    async def start(self, text: str, created_by: int) -> Tuple[Optional[int], int]:
+        """Создаёт рассылку и запускает её; (None, id идущей) — другая рассылка ещё не закончена"""
+        def _create(conn, text, created_by):
+            with conn:
+                running = conn.execute("SELECT id FROM broadcasts WHERE status = 'running'").fetchone()
+                if running:
+                    return None, running[0]
+                total = conn.execute("SELECT COUNT(*) FROM users WHERE blocked_at IS NULL").fetchone()[0]
+                cursor = conn.execute(
+                    "INSERT INTO broadcasts (text, created_by, total) VALUES (?, ?, ?)",
+                    (text, created_by, total)
+                )
+                return cursor.lastrowid, total
+
+        broadcast_id, total = await db.run(_create, text, created_by)
+        if broadcast_id is not None:
+            logging.info(f"Broadcast {broadcast_id} started by {created_by}: {total} recipients")
+            self._task = asyncio.create_task(self._run(broadcast_id))
+        return broadcast_id, total
+
+    async def resume(self):
+        """Продолжает рассылку, прерванную остановкой бота"""
+        row = await db.fetchone("SELECT id, last_user_id FROM broadcasts WHERE status = 'running' ORDER BY id LIMIT 1")
+        if row is not None and self._task is None:
+            logging.info(f"Resuming broadcast {row['id']} after user {row['last_user_id']}")
+            self._task = asyncio.create_task(self._run(row["id"]))
+
+    async def cancel(self) -> Optional[int]:
+        """Останавливает идущую рассылку; возвращает её id"""
+        row = await db.fetchone("SELECT id FROM broadcasts WHERE status = 'running'")
+        if row is None:
+            return None
+        await db.execute(
+            "UPDATE broadcasts SET status = 'cancelled', finished_at = CURRENT_TIMESTAMP WHERE id = ?", (row["id"],)
+        )
+        # Процесс, который её отправляет, остановится после текущей пачки
+        return row["id"]
+
+    async def get(self, broadcast_id: Optional[int] = None):
+        """Рассылка по id или последняя"""
+        if broadcast_id is None:
+            return await db.fetchone("SELECT * FROM broadcasts ORDER BY id DESC LIMIT 1")
+        return await db.fetchone("SELECT * FROM broadcasts WHERE id = ?", (broadcast_id,))
+
+    @staticmethod
+    def _checkpoint(conn, broadcast_id: int, last_user_id: int, sent: int, failed: int, blocked: List[int]) -> bool:
+        with conn:
+            cursor = conn.execute(
+                """UPDATE broadcasts SET last_user_id = ?, sent = sent + ?, blocked = blocked + ?, failed = failed + ?
+                   WHERE id = ? AND status = 'running'""",
+                (last_user_id, sent, len(blocked), failed, broadcast_id)
+            )
+            conn.executemany(
+                "UPDATE users SET blocked_at = CURRENT_TIMESTAMP WHERE user_id = ?", [(user_id,) for user_id in blocked]
+            )
+            return cursor.rowcount > 0
+
+    async def _send_batch(self, broadcast_id: int, text: str, user_ids: List[int]) -> bool:
+        """Отправляет пачку и записывает прогресс; False — рассылку отменили"""
+        results = await asyncio.gather(
+            *(sender.enqueue(user_id, text, priority=PRIORITY_BULK) for user_id in user_ids),
+            return_exceptions=True
+        )
+        sent, failed, blocked = 0, 0, []
+        for user_id, result in zip(user_ids, results):
+            if not isinstance(result, Exception):
+                sent += 1
+            elif isinstance(result, TelegramForbiddenError):
+                blocked.append(user_id)  # Бот заблокирован или аккаунт удалён
+            else:
+                failed += 1
+        metrics.inc("bot_broadcast_messages_total", sent, result="sent")
+        metrics.inc("bot_broadcast_messages_total", len(blocked), result="blocked")
+        metrics.inc("bot_broadcast_messages_total", failed, result="failed")
+        return await db.run(self._checkpoint, broadcast_id, user_ids[-1], sent, failed, blocked)
+
+    async def _run(self, broadcast_id: int):
+        try:
+            # При нескольких процессах бота рассылку отправляет один
+            if not await self.lease.acquire():
+                return
+            async with self.lease.keep():
+                row = await self.get(broadcast_id)
+                text, last_user_id = row["text"], row["last_user_id"]
+                while True:
+                    rows = await db.fetchall(
+                        """SELECT user_id FROM users WHERE user_id > ? AND blocked_at IS NULL
+                           ORDER BY user_id LIMIT ?""",
+                        (last_user_id, self.batch_size)
+                    )
+                    if not rows:
+                        break
+                    user_ids = [row[0] for row in rows]
+                    if not await self._send_batch(broadcast_id, text, user_ids):
+                        logging.info(f"Broadcast {broadcast_id} cancelled")
+                        return
+                    last_user_id = user_ids[-1]
+
+            await db.execute(
+                "UPDATE broadcasts SET status = 'done', finished_at = CURRENT_TIMESTAMP WHERE id = ? AND status = 'running'",
+                (broadcast_id,)
+            )
+            row = await self.get(broadcast_id)
+            logging.info(f"Broadcast {broadcast_id} finished: sent {row['sent']}, "
+                         f"blocked {row['blocked']}, failed {row['failed']}")
+            if row["created_by"]:
+                await sender.send_message(
+                    row["created_by"],
+                    f"📣 Рассылка #{broadcast_id} завершена\n\n{format_stats(row)}",
+                    priority=PRIORITY_NOTIFY
+                )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Рассылка остаётся running и продолжится после перезапуска
+            logging.error(f"Broadcast {broadcast_id} error: {e}", exc_info=True)
+        finally:
+            self._task = None
+            await self.lease.release()
+
+    async def close(self):
+        """Прерывает отправку; незаписанная пачка будет отправлена повторно после перезапуска"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+def format_stats(row) -> str:
+    done = row["sent"] + row["blocked"] + row["failed"]
+    return (
+        f"Обработано: {done} из {row['total']}\n"
+        f"✅ Доставлено: {row['sent']}\n"
+        f"🚫 Заблокировали бота: {row['blocked']}\n"
+        f"⚠️ Ошибки: {row['failed']}"
+    )
+
+
+# Глобальный экземпляр рассылки
+broadcaster = Broadcaster()
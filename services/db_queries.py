@@ -1,21 +1,12 @@
 # db_queries.py
-import sqlite3
-from config.settings import DB_PATH
+from config.database import db
 
-def get_all_appointments():
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM appointments")
-        return cursor.fetchall()
+async def get_all_appointments():
+    return await db.fetchall("SELECT * FROM appointments")
 
-def get_occupied_appointments():
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT a.*, u.first_name, u.last_name 
-            FROM appointments a
-            JOIN users u ON a.user_id = u.user_id
-        """)
-        return cursor.fetchall()
\ No newline at end of file
+async def get_occupied_appointments():
+    return await db.fetchall("""
+        SELECT a.*, u.first_name, u.last_name 
+        FROM appointments a
+        JOIN users u ON a.user_id = u.user_id
+    """)
@@ -0,0 +1,128 @@
+import csv
+import os
+import tempfile
+from typing import Iterator
+from config.database import db
+
+try:
+    from openpyxl import Workbook  # Необязательная зависимость: только для XLSX
+except ImportError:
+    Workbook = None
+
+EXPORT_FETCH_SIZE = 1000  # Строк за одно чтение из курсора
+
+# Что можно выгрузить: запрос, столбец даты для фильтра «с/по», есть ли фильтр по врачу
+EXPORT_SOURCES = {
+    "appointments": {
+        "sql": """SELECT * FROM (
+                      SELECT id, user_id, date, day, time, doctor, created_at, 'active' AS status
+                      FROM appointments
+                      UNION ALL
+                      SELECT id, user_id, date, day, time, doctor, created_at, 'archived' AS status
+                      FROM appointments_archive
+                  )""",
+        "date_column": "date",
+        "doctor_column": "doctor",
+    },
+    "users": {
+        "sql": "SELECT user_id, first_name, last_name, created_at FROM users",
+        "date_column": "date(created_at)",
+        "doctor_column": None,
+    },
+    "consultations": {
+        "sql": "SELECT * FROM consultations",
+        "date_column": "date(created_at)",
+        "doctor_column": "doctor_type",
+    },
+}
+
+# Русские названия таблиц в аргументах команды
+EXPORT_ALIASES = {
+    "записи": "appointments",
+    "пользователи": "users",
+    "консультации": "consultations",
+}
+
+
+def _iter_rows(cursor) -> Iterator[tuple]:
+    """Генератор строк курсора порциями — в памяти не больше EXPORT_FETCH_SIZE строк"""
+    while True:
+        rows = cursor.fetchmany(EXPORT_FETCH_SIZE)
+        if not rows:
+            return
+        for row in rows:
+            yield tuple(row)
+
+
+def _build_query(source: str, doctor: str = None, date_from: str = None, date_to: str = None):
+    spec = EXPORT_SOURCES[source]
+    conditions, params = [], []
+    if doctor and spec["doctor_column"]:
+        conditions.append(f"{spec['doctor_column']} = ?")
+        params.append(doctor)
+    if date_from:
+        conditions.append(f"{spec['date_column']} >= ?")
+        params.append(date_from)
+    if date_to:
+        conditions.append(f"{spec['date_column']} <= ?")
+        params.append(date_to)
+    sql = spec["sql"]
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    return sql, params
+
+
+def _write_csv(path: str, header, rows):
+    # utf-8-sig — чтобы Excel корректно открыл кириллицу
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def _write_xlsx(path: str, header, rows):
+    # write_only-режим openpyxl пишет строки потоком, не держа лист в памяти
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(list(header))
+    for row in rows:
+        sheet.append(list(row))
+    workbook.save(path)
+
+
+def _export(conn, path: str, fmt: str, sql: str, params) -> int:
+    cursor = conn.execute(sql, params)
+    header = [column[0] for column in cursor.description]
+    count = 0
+
+    def counted(rows):
+        nonlocal count
+        for row in rows:
+            count += 1
+            yield row
+
+    if fmt == "xlsx":
+        _write_xlsx(path, header, counted(_iter_rows(cursor)))
+    else:
+        _write_csv(path, header, counted(_iter_rows(cursor)))
+    return count
+
+
+async def export_to_file(source: str, fmt: str = "csv", doctor: str = None,
+                         date_from: str = None, date_to: str = None):
+    """
+    Выгружает таблицу во временный файл CSV/XLSX в потоке пула БД.
+    Возвращает (путь к файлу, число строк); файл удаляет вызывающий.
+    """
+    if fmt == "xlsx" and Workbook is None:
+        raise RuntimeError("Для выгрузки в XLSX установите пакет openpyxl")
+
+    sql, params = _build_query(source, doctor, date_from, date_to)
+    fd, path = tempfile.mkstemp(prefix=f"{source}_", suffix=f".{fmt}")
+    os.close(fd)
+    try:
+        count = await db.run(_export, path, fmt, sql, params)
+    except Exception:
+        os.remove(path)
+        raise
+    return path, count
@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import time
+from typing import Callable, List, Optional
+from aiogram import types
+from config.database import db
+from config.settings import (
+    SUPPORT_OPERATORS, SUPPORT_ASSIGNMENT,
+    SUPPORT_REASSIGN_TIMEOUT, SUPPORT_CHECK_INTERVAL, LEADER_LEASE_TTL
+)
+from utils.sender import sender
+from utils.metrics import metrics
+from utils.shared_state import Lease
+
+
+class SupportPool:
+    """
+    Распределяет обращения в поддержку между операторами.
+    Стратегии: round_robin — по кругу, least_open — тому, у кого меньше открытых
+    обращений (при равенстве — по кругу). Нагрузка операторов хранится в памяти
+    и меняется синхронно при назначении, поэтому одновременные обращения не
+    достаются одному оператору. Обращение без ответа дольше timeout передаётся другому
+    (при нескольких процессах бота проверку выполняет только держатель аренды).
+    """
+
+    def __init__(
+        self,
+        operators: List[int] = SUPPORT_OPERATORS,
+        strategy: str = SUPPORT_ASSIGNMENT,
+        timeout: float = SUPPORT_REASSIGN_TIMEOUT,
+        check_interval: float = SUPPORT_CHECK_INTERVAL,
+        clock: Callable[[], float] = time.time
+    ):
+        if strategy not in ("round_robin", "least_open"):
+            raise ValueError(f"Unknown support assignment strategy: {strategy}")
+        self.operators = list(operators)
+        self.strategy = strategy
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self.clock = clock
+        self._open = {operator: 0 for operator in self.operators}  # operator_id -> открытых обращений
+        self._turn = 0  # Указатель очереди для round robin и разрешения ничьих
+        # Аренда переживает паузу между проверками, иначе роль ведущего переходила бы по кругу
+        self.lease = Lease("support_reassign", ttl=max(LEADER_LEASE_TTL, check_interval * 3))
+        self._task = None
+
+    def is_operator(self, user_id: int) -> bool:
+        return user_id in self._open
+
+    def pick(self, exclude: Optional[int] = None) -> int:
+        """Выбирает оператора (по возможности не exclude) и учитывает ему новое обращение"""
+        candidates = [op for op in self.operators if op != exclude] or self.operators
+        start = self._turn % len(candidates)
+        self._turn += 1
+        ordered = candidates[start:] + candidates[:start]
+        if self.strategy == "round_robin":
+            operator = ordered[0]
+        else:
+            operator = min(ordered, key=lambda op: self._open.get(op, 0))
+        self._open[operator] = self._open.get(operator, 0) + 1
+        return operator
+
+    def _release(self, operator: int):
+        if self._open.get(operator, 0) > 0:
+            self._open[operator] -= 1
+
+    async def load(self):
+        """Восстанавливает нагрузку операторов из БД и запускает проверку просроченных обращений"""
+        rows = await db.fetchall(
+            "SELECT operator_id, COUNT(*) FROM support_tickets WHERE status = 'open' GROUP BY operator_id"
+        )
+        for operator, count in rows:
+            if operator in self._open:
+                self._open[operator] = count
+        logging.info(f"Support pool loaded: {len(self.operators)} operators, "
+                     f"{sum(count for _, count in rows)} open tickets")
+
+        if self._task is None:
+            self._task = asyncio.create_task(self._reassign_loop())
+
+    async def open_ticket(self, user_id: int, user_name: str, text: str) -> int:
+        """Сохраняет обращение, назначает оператора и уведомляет его; возвращает id обращения"""
+        operator = self.pick()
+        try:
+            cursor = await db.execute(
+                """INSERT INTO support_tickets (user_id, user_name, message, operator_id, assigned_at)
+                   VALUES (?, ?, ?, ?, ?)""",
+                (user_id, user_name, text, operator, self.clock())
+            )
+        except Exception:
+            self._release(operator)
+            raise
+        ticket_id = cursor.lastrowid
+        metrics.inc("bot_support_tickets_total", event="opened")
+        await self._notify(operator, ticket_id, f"📩 Сообщение в поддержку от {user_name}:\n\n{text}")
+        return ticket_id
+
+    async def get_ticket(self, ticket_id: int):
+        return await db.fetchone("SELECT * FROM support_tickets WHERE id = ?", (ticket_id,))
+
+    async def close_ticket(self, ticket_id: int, response: str) -> bool:
+        """Отмечает обращение отвеченным; False — его уже закрыли"""
+        def _close(conn, ticket_id, response):
+            with conn:
+                row = conn.execute(
+                    "SELECT operator_id FROM support_tickets WHERE id = ? AND status = 'open'", (ticket_id,)
+                ).fetchone()
+                if row is None:
+                    return None
+                conn.execute(
+                    """UPDATE support_tickets SET status = 'answered', response = ?, answered_at = CURRENT_TIMESTAMP
+                       WHERE id = ?""",
+                    (response, ticket_id)
+                )
+                return row[0]
+
+        operator = await db.run(_close, ticket_id, response)
+        if operator is None:
+            return False
+        self._release(operator)
+        metrics.inc("bot_support_tickets_total", event="answered")
+        return True
+
+    async def reassign_overdue(self) -> int:
+        """Передаёт другим операторам обращения, оставшиеся без ответа дольше timeout"""
+        now = self.clock()
+        rows = await db.fetchall(
+            """SELECT id, user_name, message, operator_id FROM support_tickets
+               WHERE status = 'open' AND assigned_at < ? ORDER BY assigned_at""",
+            (now - self.timeout,)
+        )
+        reassigned = 0
+        for row in rows:
+            if not any(op != row["operator_id"] for op in self.operators):
+                continue  # Передать некому (единственный оператор) — не уведомляем его повторно
+            operator = self.pick(exclude=row["operator_id"])
+            cursor = await db.execute(
+                """UPDATE support_tickets SET operator_id = ?, assigned_at = ?, reassign_count = reassign_count + 1
+                   WHERE id = ? AND status = 'open'""",
+                (operator, now, row["id"])
+            )
+            if cursor.rowcount == 0:
+                self._release(operator)  # Пока искали — на обращение ответили
+                continue
+            self._release(row["operator_id"])
+            reassigned += 1
+            metrics.inc("bot_support_tickets_total", event="reassigned")
+            await self._notify(
+                operator, row["id"],
+                f"⏰ Обращение #{row['id']} без ответа, передано вам.\n"
+                f"📩 От {row['user_name']}:\n\n{row['message']}"
+            )
+        if reassigned:
+            logging.info(f"Support: reassigned {reassigned} overdue tickets")
+        return reassigned
+
+    async def _notify(self, operator: int, ticket_id: int, text: str):
+        try:
+            await sender.send_message(
+                chat_id=operator,
+                text=text,
+                reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[
+                    [types.InlineKeyboardButton(text="Ответить", callback_data=f"ticket_{ticket_id}")]
+                ])
+            )
+        except Exception as e:
+            # Обращение сохранено и будет передано другому оператору по таймауту
+            logging.error(f"Error notifying operator {operator} about ticket {ticket_id}: {e}")
+
+    async def _reassign_loop(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                if await self.lease.acquire():
+                    await self.reassign_overdue()
+            except Exception as e:
+                logging.error(f"Error reassigning support tickets: {e}")
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.lease.release()
+
+
+# Глобальный пул операторов поддержки
+support_pool = SupportPool()
@@ -0,0 +1,43 @@
+import asyncio
+import os
+
+# Тесты не ходят в сеть: без Redis, эндпоинта метрик и фоновой сверки настроек клиники.
+# Сценарии нажимают кнопки без пауз, поэтому запас антифлуда больше обычного
+os.environ["REDIS_URL"] = ""
+os.environ["METRICS_PORT"] = "0"
+os.environ["CONFIG_REFRESH_INTERVAL"] = "0"
+os.environ["THROTTLE_MESSAGE_BURST"] = "100"
+os.environ["THROTTLE_CALLBACK_BURST"] = "100"
+
+import pytest
+import config.database as database
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Пул соединений к чистой БД во временном каталоге"""
+    path = str(tmp_path / "clinic.db")
+    monkeypatch.setattr(database, "DB_PATH", path)
+    monkeypatch.setattr(database.db, "path", path)
+    database.init_db()
+    database.db.open()
+    yield database.db
+    database.db.close()
+
+
+@pytest.fixture
+def clinic_db(db):
+    """Чистая БД с загруженными врачами, расписанием и индексом занятости"""
+    from utils.clinic_config import clinic
+    from utils.occupancy import occupancy
+    asyncio.run(clinic.load())
+    asyncio.run(occupancy.load())
+    return db
+
+
+@pytest.fixture(scope="session")
+def dispatcher():
+    """Диспетчер работающего бота; роутеры модулей подключаются один раз за процесс"""
+    from aiogram.fsm.storage.memory import MemoryStorage
+    from main import setup_dispatcher
+    return setup_dispatcher(MemoryStorage())
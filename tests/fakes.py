@@ -0,0 +1,85 @@
+import asyncio
+import itertools
+from datetime import datetime
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.exceptions import TelegramForbiddenError
+from aiogram.methods import EditMessageText, SendMessage
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+
+_ids = itertools.count(1)
+
+
+class FakeSession(BaseSession):
+    """
+    Сессия Bot API без сети: запоминает вызванные методы и отвечает успехом через latency секунд.
+    Общая для тестов и нагрузочных прогонов (bench/); record=False — только счётчик запросов.
+    """
+
+    def __init__(self, latency: float = 0.0, record: bool = True):
+        super().__init__()
+        self.latency = latency
+        self.record = record
+        self.calls = []
+        self.requests = 0
+        self._message_ids = itertools.count(1000)
+
+    async def make_request(self, bot, method, timeout=None):
+        self.requests += 1
+        if self.record:
+            self.calls.append(method)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if isinstance(method, (SendMessage, EditMessageText)):
+            return Message(
+                message_id=next(self._message_ids), date=datetime.now(),
+                chat=Chat(id=method.chat_id or 1, type="private"), text=method.text
+            )
+        return True
+
+    async def stream_content(self, *args, **kwargs):
+        yield b""
+
+    async def close(self):
+        pass
+
+    def texts(self) -> list:
+        return [getattr(call, "text", None) for call in self.calls]
+
+
+class BlockingSession(FakeSession):
+    """Отвечает 403 пользователям, заблокировавшим бота"""
+
+    def __init__(self, blocked=(), **kwargs):
+        super().__init__(**kwargs)
+        self.blocked = set(blocked)
+
+    async def make_request(self, bot, method, timeout=None):
+        if isinstance(method, SendMessage) and method.chat_id in self.blocked:
+            raise TelegramForbiddenError(method=method, message="Forbidden: bot was blocked by the user")
+        return await super().make_request(bot, method, timeout)
+
+
+def start_ids(first: int):
+    """Нумерация update_id с first: у процессов нагрузочного прогона непересекающиеся диапазоны"""
+    global _ids
+    _ids = itertools.count(first)
+
+
+def fake_bot() -> Bot:
+    return Bot("42:TEST", session=FakeSession())
+
+
+def message_update(user_id: int, text: str) -> Update:
+    return Update(update_id=next(_ids), message=Message(
+        message_id=next(_ids), date=datetime.now(), text=text,
+        chat=Chat(id=user_id, type="private"), from_user=User(id=user_id, is_bot=False, first_name="Test")
+    ))
+
+
+def callback_update(user_id: int, data: str, message_id: int = 1) -> Update:
+    return Update(update_id=next(_ids), callback_query=CallbackQuery(
+        id=str(next(_ids)), chat_instance="test", data=data,
+        from_user=User(id=user_id, is_bot=False, first_name="Test"),
+        message=Message(message_id=message_id, date=datetime.now(), chat=Chat(id=user_id, type="private"), text="…")
+    ))
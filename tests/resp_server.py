@@ -0,0 +1,139 @@
+"""Сервер протокола Redis в памяти процесса — только команды и скрипты, которые использует бот"""
+import asyncio
+import time
+from middlewares.throttling import _TAKE_TOKEN
+from utils.shared_state import _ACQUIRE_LEASE, _RELEASE_LEASE
+
+
+def _encode(value) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, Exception):
+        return b"-ERR %s\r\n" % str(value).encode()
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, list):
+        return b"*%d\r\n" % len(value) + b"".join(_encode(item) for item in value)
+    if value == "OK":
+        return b"+OK\r\n"
+    data = value.encode()
+    return b"$%d\r\n%s\r\n" % (len(data), data)
+
+
+class RespServer:
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.data = {}
+        self.expires = {}
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"redis://{host}:{port}/0"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    def _get(self, key):
+        expires = self.expires.get(key)
+        if expires is not None and expires <= self.clock():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return self.data.get(key)
+
+    def _pexpire(self, key, ms) -> int:
+        if self._get(key) is None:
+            return 0
+        self.expires[key] = self.clock() + int(ms) / 1000
+        return 1
+
+    def _delete(self, key) -> int:
+        existed = self._get(key) is not None
+        self.data.pop(key, None)
+        self.expires.pop(key, None)
+        return int(existed)
+
+    def execute(self, name: str, *args):
+        name = name.upper()
+        if name in ("AUTH", "SELECT", "PING"):
+            return "OK"
+        if name == "GET":
+            return self._get(args[0])
+        if name == "SET":
+            key, value, options = args[0], args[1], [arg.upper() for arg in args[2:]]
+            if "NX" in options and self._get(key) is not None:
+                return None
+            self.data[key] = value
+            self.expires.pop(key, None)
+            if "PX" in options:
+                self._pexpire(key, args[2 + options.index("PX") + 1])
+            return "OK"
+        if name == "DEL":
+            return sum(self._delete(key) for key in args)
+        if name == "PEXPIRE":
+            return self._pexpire(*args)
+        if name == "HSET":
+            fields = self._get(args[0])
+            if fields is None:
+                fields = self.data[args[0]] = {}
+            fields.update(zip(args[1::2], args[2::2]))
+            return len(args) // 2
+        if name == "HGET":
+            return (self._get(args[0]) or {}).get(args[1])
+        if name == "HMGET":
+            fields = self._get(args[0]) or {}
+            return [fields.get(field) for field in args[1:]]
+        if name == "HDEL":
+            fields = self._get(args[0]) or {}
+            removed = sum(fields.pop(field, None) is not None for field in args[1:])
+            if args[0] in self.data and not fields:
+                self._delete(args[0])
+            return removed
+        if name == "EVAL":
+            return self._eval(args[0], args[2:2 + int(args[1])], args[2 + int(args[1]):])
+        return ValueError(f"unknown command '{name}'")
+
+    def _eval(self, script: str, keys, args):
+        # Вместо Lua — те же действия на Python; скрипт узнаём по тексту
+        if script == _ACQUIRE_LEASE:
+            owner = self._get(keys[0])
+            if owner is None:
+                self.execute("SET", keys[0], args[0], "PX", args[1])
+                return 1
+            if owner == args[0]:
+                return self._pexpire(keys[0], args[1])
+            return 0
+        if script == _RELEASE_LEASE:
+            return self._delete(keys[0]) if self._get(keys[0]) == args[0] else 0
+        if script == _TAKE_TOKEN:
+            rate, burst, now = float(args[0]), float(args[1]), self.clock()
+            bucket = self._get(keys[0]) or {}
+            tokens, ts = float(bucket.get("tokens", burst)), float(bucket.get("ts", now))
+            tokens = min(burst, tokens + max(0.0, now - ts) * rate)
+            allowed = int(tokens >= 1)
+            self.execute("HSET", keys[0], "tokens", repr(tokens - allowed), "ts", repr(now))
+            self._pexpire(keys[0], args[2])
+            return allowed
+        return ValueError("unknown script")
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = []
+                for _ in range(int(line[1:-2])):
+                    length = int((await reader.readline())[1:-2])
+                    command.append((await reader.readexactly(length + 2))[:-2].decode())
+                writer.write(_encode(self.execute(*command)))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        writer.close()
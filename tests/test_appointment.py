@@ -0,0 +1,40 @@
+import asyncio
+from models.appointment import save_appointment
+from utils.calendar_engine import calendar
+from utils.occupancy import occupancy
+
+
+def test_concurrent_bookings_of_one_slot_have_one_winner(clinic_db):
+    patients = range(1, 301)
+    day = calendar.dates()[1].isoformat()
+
+    def _add_patients(conn):
+        with conn:
+            conn.executemany(
+                "INSERT INTO users (user_id, first_name, last_name) VALUES (?, 'Test', 'Patient')",
+                [(user_id,) for user_id in patients]
+            )
+
+    async def scenario():
+        await clinic_db.run(_add_patients)
+        return await asyncio.gather(*(save_appointment(user_id, day, 2, "surgeon") for user_id in patients))
+
+    results = asyncio.run(scenario())
+    assert results.count(True) == 1
+    assert results.count(False) == 299
+    rows = asyncio.run(clinic_db.fetchall(
+        "SELECT user_id FROM appointments WHERE doctor = 'surgeon' AND date = ? AND slot = 2", (day,)
+    ))
+    assert [row[0] for row in rows] == [results.index(True) + 1]
+    assert occupancy.is_busy("surgeon", day, 2)
+
+
+def test_other_slots_stay_free(clinic_db):
+    day = calendar.dates()[1].isoformat()
+
+    async def scenario():
+        await clinic_db.execute("INSERT INTO users (user_id, first_name, last_name) VALUES (1, 'Test', 'Patient')")
+        return [await save_appointment(1, day, slot, "pediatrician") for slot in (0, 1, 0)]
+
+    assert asyncio.run(scenario()) == [True, True, False]
+
@@ -0,0 +1,123 @@
+import asyncio
+import pytest
+import services.broadcast as broadcast
+from aiogram import Bot
+from aiogram.methods import SendMessage
+from services.broadcast import Broadcaster
+from utils.sender import OutboundSender
+from fakes import BlockingSession
+
+
+@pytest.fixture
+def outbox(monkeypatch):
+    """Очередь отправки без лимитов Telegram поверх фальшивой сессии"""
+    def make(blocked=()):
+        session = BlockingSession(blocked)
+        sender = OutboundSender(global_rate=1_000_000, chat_interval=0, workers=50)
+        sender.init(Bot("42:TEST", session=session))
+        monkeypatch.setattr(broadcast, "sender", sender)
+        return session, sender
+    return make
+
+
+def _add_users(db, count: int):
+    def _insert(conn):
+        with conn:
+            conn.executemany("INSERT INTO users (user_id, first_name, last_name) VALUES (?, 'Test', 'User')",
+                             [(user_id,) for user_id in range(1, count + 1)])
+    asyncio.run(db.run(_insert))
+
+
+def _recipients(session, text: str) -> list:
+    return [call.chat_id for call in session.calls if isinstance(call, SendMessage) and call.text == text]
+
+
+async def _finish(broadcaster: Broadcaster):
+    while broadcaster._task is not None:
+        await asyncio.sleep(0.01)
+
+
+def test_delivery_stats_and_blocked_users_are_skipped(db, outbox):
+    _add_users(db, 1000)
+    session, sender = outbox(blocked=range(1, 1001, 10))
+
+    async def scenario():
+        broadcaster = Broadcaster(batch_size=100)
+        first, total = await broadcaster.start("Клиника закрыта 4 ноября", created_by=None)
+        await _finish(broadcaster)
+        second, _ = await broadcaster.start("Клиника снова работает", created_by=None)
+        await _finish(broadcaster)
+        await sender.close()
+        return total, await broadcaster.get(first), await broadcaster.get(second)
+
+    total, first, second = asyncio.run(scenario())
+    assert total == 1000
+    assert (first["status"], first["sent"], first["blocked"], first["failed"]) == ("done", 900, 100, 0)
+    # Заблокировавшие бота больше не получают рассылки
+    assert (second["total"], second["sent"], second["blocked"]) == (900, 900, 0)
+    assert not set(_recipients(session, "Клиника снова работает")) & set(range(1, 1001, 10))
+
+
+def test_resume_continues_after_checkpoint(db, outbox):
+    _add_users(db, 1000)
+    session, sender = outbox()
+
+    async def scenario():
+        # Рассылку прервал перезапуск: записан прогресс до пользователя 600
+        await db.execute(
+            """INSERT INTO broadcasts (text, total, last_user_id, sent) VALUES ('Новость', 1000, 600, 600)"""
+        )
+        broadcaster = Broadcaster(batch_size=100)
+        await broadcaster.resume()
+        await _finish(broadcaster)
+        await sender.close()
+        return await broadcaster.get()
+
+    row = asyncio.run(scenario())
+    assert _recipients(session, "Новость") == list(range(601, 1001))
+    assert (row["status"], row["sent"], row["last_user_id"]) == ("done", 1000, 1000)
+
+
+def test_interrupted_broadcast_reaches_everyone_once_resumed(db, outbox):
+    _add_users(db, 5000)
+    session, sender = outbox()
+
+    async def scenario():
+        broadcaster = Broadcaster(batch_size=100)
+        broadcast_id, _ = await broadcaster.start("Объявление", created_by=None)
+        while (await broadcaster.get(broadcast_id))["last_user_id"] < 1000:
+            await asyncio.sleep(0.01)
+        await broadcaster.close()  # Остановка бота посреди рассылки
+        interrupted = await broadcaster.get(broadcast_id)
+        assert interrupted["status"] == "running" and interrupted["last_user_id"] < 5000
+
+        restarted = Broadcaster(batch_size=100)
+        await restarted.resume()
+        await _finish(restarted)
+        await sender.close()
+        return await restarted.get(broadcast_id)
+
+    row = asyncio.run(scenario())
+    recipients = _recipients(session, "Объявление")
+    assert set(recipients) == set(range(1, 5001))
+    assert len(recipients) - 5000 <= 100  # Повторно уходит не больше одной незаписанной пачки
+    assert row["status"] == "done"
+
+
+def test_cancel_stops_after_current_batch(db, outbox):
+    _add_users(db, 3000)
+    session, sender = outbox()
+
+    async def scenario():
+        broadcaster = Broadcaster(batch_size=100)
+        broadcast_id, _ = await broadcaster.start("Отмена", created_by=None)
+        while (await broadcaster.get(broadcast_id))["last_user_id"] < 500:
+            await asyncio.sleep(0.01)
+        assert await broadcaster.cancel() == broadcast_id
+        await _finish(broadcaster)
+        await sender.close()
+        return await broadcaster.get(broadcast_id)
+
+    row = asyncio.run(scenario())
+    assert row["status"] == "cancelled"
+    assert len(_recipients(session, "Отмена")) < 3000
@@ -0,0 +1,48 @@
+import asyncio
+from models.consultation import get_consultation, save_consultation
+from utils.sender import sender
+from fakes import callback_update, fake_bot, message_update
+
+
+def _answers(bot, patient: int) -> list:
+    return [call.text for call in bot.session.calls if getattr(call, "chat_id", None) == patient
+            and "ответил(а)" in (getattr(call, "text", None) or "")]
+
+
+def test_two_doctors_answering_reach_the_patient_once(dispatcher, clinic_db):
+    bot = fake_bot()
+    sender.init(bot)
+
+    async def scenario():
+        sender.start()
+        consultation_id = await save_consultation(700, "surgeon", "Иван Иванов", "Болит колено")
+        for doctor in (701, 702):
+            await dispatcher.feed_update(bot, callback_update(doctor, f"answer_{consultation_id}"))
+        await asyncio.gather(
+            dispatcher.feed_update(bot, message_update(701, "Приходите на приём")),
+            dispatcher.feed_update(bot, message_update(702, "Приложите лёд")),
+        )
+        await sender.close()
+        return await get_consultation(consultation_id)
+
+    consultation = asyncio.run(scenario())
+    answers = _answers(bot, 700)
+    assert len(answers) == 1
+    assert consultation["status"] == "answered"
+    assert consultation["response"] in answers[0]
+    assert "ℹ️ На этот вопрос уже ответили." in bot.session.texts()
+
+
+def test_answer_to_a_missing_question_is_reported(dispatcher, clinic_db):
+    bot = fake_bot()
+    sender.init(bot)
+
+    async def scenario():
+        consultation_id = await save_consultation(710, "surgeon", "Иван Иванов", "Вопрос")
+        await dispatcher.feed_update(bot, callback_update(711, f"answer_{consultation_id}"))
+        await clinic_db.execute("DELETE FROM consultations WHERE id = ?", (consultation_id,))
+        await dispatcher.feed_update(bot, message_update(711, "Ответ"))
+
+    asyncio.run(scenario())
+    assert bot.session.texts()[-1] == "❌ Вопрос не найден."
+    assert not _answers(bot, 710)
@@ -0,0 +1,76 @@
+import asyncio
+import csv
+import os
+import tracemalloc
+import zipfile
+import pytest
+import services.export as export
+from services.export import export_to_file
+
+
+def _read_csv(path: str) -> list:
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return list(csv.reader(f, delimiter=";"))
+
+
+def _add_appointments(db, rows):
+    def _insert(conn):
+        with conn:
+            conn.execute("PRAGMA foreign_keys=OFF")
+            conn.executemany("INSERT INTO appointments (user_id, day, time, doctor, date, slot) VALUES (?, ?, ?, ?, ?, ?)",
+                             rows)
+    asyncio.run(db.run(_insert))
+
+
+def test_filters_by_doctor_and_dates(db):
+    _add_appointments(db, [
+        (1, "Понедельник", "10:00", "surgeon", "2026-10-19", 0),
+        (2, "Вторник", "10:00", "surgeon", "2026-10-20", 0),
+        (3, "Вторник", "10:00", "pediatrician", "2026-10-20", 0),
+        (4, "Пятница", "10:00", "surgeon", "2026-10-23", 0),
+    ])
+    path, count = asyncio.run(export_to_file("appointments", doctor="surgeon",
+                                             date_from="2026-10-20", date_to="2026-10-23"))
+    try:
+        rows = _read_csv(path)
+    finally:
+        os.remove(path)
+    assert count == 2
+    assert rows[0][:3] == ["id", "user_id", "date"]
+    assert [row[1] for row in rows[1:]] == ["2", "4"]
+
+
+def test_large_export_runs_in_constant_memory(db):
+    rows = 100_000
+    _add_appointments(db, [(i, "Понедельник", "10:00", "surgeon", f"2026-{i % 12 + 1:02d}-01", i) for i in range(rows)])
+
+    tracemalloc.start()
+    path, count = asyncio.run(export_to_file("appointments"))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    try:
+        size = os.path.getsize(path)
+    finally:
+        os.remove(path)
+    assert count == rows
+    # Файл — десятки мегабайт, а в памяти одновременно не больше EXPORT_FETCH_SIZE строк
+    assert size > 3_000_000
+    assert peak < 5_000_000
+
+
+def test_xlsx_export(db):
+    if export.Workbook is None:
+        pytest.skip("openpyxl is not installed")
+    _add_appointments(db, [(1, "Понедельник", "10:00", "surgeon", "2026-10-19", 0)])
+    path, count = asyncio.run(export_to_file("appointments", fmt="xlsx"))
+    try:
+        assert zipfile.is_zipfile(path)
+    finally:
+        os.remove(path)
+    assert count == 1
+
+
+def test_xlsx_without_openpyxl_is_reported(db, monkeypatch):
+    monkeypatch.setattr(export, "Workbook", None)
+    with pytest.raises(RuntimeError):
+        asyncio.run(export_to_file("users", fmt="xlsx"))
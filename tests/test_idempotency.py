@@ -0,0 +1,82 @@
+import asyncio
+from middlewares.idempotency import DedupeCache
+from middlewares.throttling import ThrottlingMiddleware
+from utils.calendar_engine import calendar
+from fakes import callback_update, fake_bot, message_update
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_dedupe_cache_claims_once_per_ttl():
+    clock = Clock()
+    cache = DedupeCache(ttl=3, clock=clock)
+    assert cache.claim("tap")
+    assert not cache.claim("tap")
+    clock.now = 3
+    assert cache.claim("tap")
+    cache.release("tap")
+    assert cache.claim("tap")
+
+
+def test_dedupe_cache_is_bounded():
+    cache = DedupeCache(ttl=60, max_size=2, clock=Clock())
+    for key in ("a", "b", "c"):
+        assert cache.claim(key)
+    assert len(cache) == 2
+    assert cache.claim("a")  # Самый старый ключ вытеснен
+
+
+async def _choose_slot(dispatcher, bot, user_id: int, slot: int):
+    day = calendar.dates()[1].isoformat()
+    for update in (
+        callback_update(user_id, "sign_up"),
+        message_update(user_id, "Иван Иванов"),
+        callback_update(user_id, f"day_{day}"),
+        callback_update(user_id, "doctor_surgeon"),
+        callback_update(user_id, f"time_{slot}_surgeon"),
+    ):
+        await dispatcher.feed_update(bot, update)
+
+
+async def _bookings(db, user_id: int) -> int:
+    return (await db.fetchone("SELECT COUNT(*) FROM appointments WHERE user_id = ?", (user_id,)))[0]
+
+
+def test_double_tap_books_once(dispatcher, clinic_db):
+    bot = fake_bot()
+
+    async def scenario():
+        await _choose_slot(dispatcher, bot, 9001, 0)
+        await asyncio.gather(
+            dispatcher.feed_update(bot, callback_update(9001, "confirm")),
+            dispatcher.feed_update(bot, callback_update(9001, "confirm")),
+        )
+        return await _bookings(clinic_db, 9001)
+
+    assert asyncio.run(scenario()) == 1
+    assert bot.session.texts().count("✅ Уже обработано") == 1
+
+
+def test_throttled_tap_can_be_retried(dispatcher, clinic_db, monkeypatch):
+    bot = fake_bot()
+    throttling = next(m for m in dispatcher.callback_query.middleware if isinstance(m, ThrottlingMiddleware))
+
+    async def scenario():
+        await _choose_slot(dispatcher, bot, 9002, 1)
+        # Лимит исчерпан: подтверждение отбрасывается антифлудом
+        with monkeypatch.context() as patch:
+            patch.setattr(throttling.limiter, "consume", lambda user_id, now=None: False)
+            await dispatcher.feed_update(bot, callback_update(9002, "confirm"))
+        assert await _bookings(clinic_db, 9002) == 0
+        # Повтор того же нажатия сразу после — не дубль, запись создаётся
+        await dispatcher.feed_update(bot, callback_update(9002, "confirm"))
+        return await _bookings(clinic_db, 9002)
+
+    assert asyncio.run(scenario()) == 1
+    assert "✅ Уже обработано" not in bot.session.texts()
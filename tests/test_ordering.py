@@ -0,0 +1,55 @@
+import asyncio
+import random
+import time
+from aiogram import Dispatcher
+from middlewares.ordering import OrderedUpdatesMiddleware
+from fakes import fake_bot, message_update
+
+
+def _run(middleware=None, groups: int = 50, chats: int = 10, per_chat: int = 20):
+    """
+    10k обновлений: чаты идут группами по chats, сообщения чатов группы перемешаны,
+    обработчик спит случайное время — без упорядочивания соседние сообщения чата обгоняют друг друга
+    """
+    rng = random.Random(3)
+    seen, active = {}, [0, 0]
+    dp = Dispatcher()
+    if middleware is not None:
+        dp.update.outer_middleware(middleware)
+
+    @dp.message()
+    async def handler(message):
+        active[0] += 1
+        active[1] = max(active[1], active[0])
+        await asyncio.sleep(rng.random() * 0.05)
+        seen.setdefault(message.chat.id, []).append(int(message.text))
+        active[0] -= 1
+
+    updates = [message_update(group * chats + chat, str(i))
+               for group in range(groups) for i in range(per_chat) for chat in range(1, chats + 1)]
+
+    async def scenario():
+        bot = fake_bot()
+        started = time.perf_counter()
+        await asyncio.gather(*(dp.feed_update(bot, update) for update in updates))
+        return len(updates) / (time.perf_counter() - started)
+
+    return seen, active[1], asyncio.run(scenario())
+
+
+def test_order_holds_per_chat_under_10k_interleaved_updates():
+    seen, max_active, ordered_rate = _run(OrderedUpdatesMiddleware(max_concurrency=100, max_queue=20))
+    assert len(seen) == 500
+    assert all(numbers == list(range(20)) for numbers in seen.values())
+    assert max_active <= 100
+
+    # Без упорядочивания порядок внутри чатов нарушается, а выигрыша в скорости нет
+    unordered, _, unordered_rate = _run()
+    assert any(numbers != list(range(20)) for numbers in unordered.values())
+    assert ordered_rate > unordered_rate * 0.5
+
+
+def test_chat_queue_limit_drops_excess_updates():
+    seen, _, _ = _run(OrderedUpdatesMiddleware(max_concurrency=100, max_queue=5), groups=1, chats=2)
+    # В обработке одно обновление и четыре в очереди; остальные отброшены, порядок сохранён
+    assert all(len(numbers) == 5 and numbers == sorted(numbers) for numbers in seen.values())
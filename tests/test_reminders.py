@@ -0,0 +1,191 @@
+import asyncio
+import itertools
+import time
+import pytest
+import models.appointment
+import utils.reminders
+from aiogram import Bot
+from aiogram.methods import SendMessage
+from models.appointment import save_appointment
+from utils.calendar_engine import calendar
+from utils.reminders import ReminderService
+from utils.sender import OutboundSender
+from fakes import FakeSession
+
+DAY, HOUR = 86400, 3600
+
+
+class Clock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def outbox(monkeypatch):
+    """Сессия, в которую уходят напоминания: очередь отправки без лимитов Telegram"""
+    session = FakeSession()
+    sender = OutboundSender(global_rate=1_000_000, chat_interval=0, workers=20)
+    sender.init(Bot("42:TEST", session=session))
+    monkeypatch.setattr(utils.reminders, "sender", sender)
+    return session
+
+
+def _sent(session) -> list:
+    return [(call.chat_id, call.text) for call in session.calls if isinstance(call, SendMessage)]
+
+
+def _start(day: int, slot: int) -> float:
+    return calendar.slot_datetime(calendar.dates()[day], slot).timestamp()
+
+
+async def _book(db, rows, created: float = None) -> list:
+    """Записи (user_id, день, слот, врач) в обход бота; created — время записи, по умолчанию сейчас"""
+    def _insert(conn):
+        ids = []
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO users (user_id) VALUES (?)", [(row[0],) for row in rows])
+            for user_id, day, slot, doctor in rows:
+                cursor = conn.execute(
+                    """INSERT INTO appointments (user_id, day, time, doctor, date, slot, created_at)
+                       VALUES (?, '', ?, ?, ?, ?, COALESCE(datetime(?, 'unixepoch'), CURRENT_TIMESTAMP))""",
+                    (user_id, calendar.slots[slot], doctor, calendar.dates()[day].isoformat(), slot, created)
+                )
+                ids.append(cursor.lastrowid)
+        return ids
+    return await db.run(_insert)
+
+
+async def _wait_for(predicate, timeout: float = 10):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def test_new_booking_is_reminded_before_its_slot(clinic_db, outbox, monkeypatch):
+    clock = Clock(time.time())
+    service = ReminderService(offsets=[DAY, HOUR], clock=clock)
+    monkeypatch.setattr(models.appointment, "reminders", service)
+    day = calendar.dates()[-1]
+    start = calendar.slot_datetime(day, 0).timestamp()
+
+    async def scenario():
+        await clinic_db.execute("INSERT INTO users (user_id) VALUES (1)")
+        assert await save_appointment(1, day.isoformat(), 0, "surgeon")
+        fired = []
+        for now in (start - DAY - 1, start - DAY, start - HOUR, start - 60):
+            clock.now = now
+            fired.append(await service.fire_due())
+        await utils.reminders.sender.close()
+        return fired
+
+    assert asyncio.run(scenario()) == [0, 1, 1, 0]
+    texts = [text for _, text in _sent(outbox)]
+    assert "через 24 ч" in texts[0] and "через 60 мин" in texts[1]
+    assert all(calendar.slots[0] in text for text in texts)
+    row = asyncio.run(clinic_db.fetchone("SELECT reminders_sent FROM appointments"))
+    assert row[0] == 0b11
+
+
+def test_due_reminders_go_out_in_batches(clinic_db, outbox):
+    clock = Clock(time.time())
+    service = ReminderService(offsets=[HOUR], batch_size=50, clock=clock)
+    rows = [(100 + i, 2, 0, f"doctor{i}") for i in range(120)]
+    for appointment_id, (user_id, day, slot, doctor) in zip(asyncio.run(_book(clinic_db, rows)), rows):
+        service.add(appointment_id, user_id, calendar.dates()[day].isoformat(), slot, doctor)
+    assert len(service) == 120
+
+    async def scenario():
+        clock.now = _start(2, 0) - HOUR
+        fired = [await service.fire_due() for _ in range(4)]
+        await utils.reminders.sender.close()
+        return fired
+
+    assert asyncio.run(scenario()) == [50, 50, 20, 0]
+    assert sorted(chat for chat, _ in _sent(outbox)) == [row[0] for row in rows]
+
+
+def test_missed_reminders_are_caught_up_once_after_downtime(clinic_db, outbox):
+    start = _start(2, 3)
+    clock = Clock(start - 30 * 60)  # Бот не работал, когда подошли оба срока: за сутки и за час
+    asyncio.run(_book(clinic_db, [(200 + i, 2, 3, f"doctor{i}") for i in range(3)]))
+
+    async def scenario():
+        service = ReminderService(offsets=[DAY, HOUR], clock=clock)
+        await service.load()  # Досылает фоновая задача сервиса
+        await _wait_for(lambda: len(_sent(outbox)) == 3)
+        await service.close()
+
+        # Повторный перезапуск: пропущенное напоминание за сутки уже закрыто отправленным за час
+        clock.now += 60
+        restarted = ReminderService(offsets=[DAY, HOUR], clock=clock)
+        await restarted.load()
+        pending = len(restarted)
+        await asyncio.sleep(0.1)
+        await restarted.close()
+        await utils.reminders.sender.close()
+        return pending
+
+    assert asyncio.run(scenario()) == 0
+    sent = _sent(outbox)
+    assert len(sent) == 3
+    assert all("через 30 мин" in text for _, text in sent)
+    rows = asyncio.run(clinic_db.fetchall("SELECT reminders_sent FROM appointments"))
+    assert [row[0] for row in rows] == [0b11] * 3
+
+
+def test_restart_keeps_sent_and_skipped_reminders_off(clinic_db, outbox):
+    start = _start(2, 5)
+    clock = Clock(start - 2 * DAY)
+    reminded, = asyncio.run(_book(clinic_db, [(300, 2, 5, "surgeon")]))
+    service = ReminderService(offsets=[DAY, HOUR], clock=clock)
+    service.add(reminded, 300, calendar.dates()[2].isoformat(), 5, "surgeon")
+
+    async def scenario():
+        clock.now = start - DAY
+        assert await service.fire_due() == 1
+        # Запись за полчаса до приёма: оба срока уже прошли, напоминать нечего
+        clock.now = start - 30 * 60
+        await _book(clinic_db, [(301, 2, 5, "pediatrician")], created=clock.now)
+
+        restarted = ReminderService(offsets=[DAY, HOUR], clock=Clock(start - 2 * HOUR))
+        await restarted.load()
+        pending = len(restarted)
+        await asyncio.sleep(0.1)
+        await restarted.close()
+        await utils.reminders.sender.close()
+        return pending
+
+    assert asyncio.run(scenario()) == 1  # Осталось только напоминание за час первой записи
+    assert [chat for chat, _ in _sent(outbox)] == [300]
+
+
+def test_tens_of_thousands_pending_with_one_task(clinic_db, outbox):
+    doctors = [f"doctor{i}" for i in range(300)]
+    days = range(1, len(calendar.dates()))
+    rows = [(1000 + i, day, slot, doctor) for i, (day, slot, doctor)
+            in enumerate(itertools.product(days, range(len(calendar.slots)), doctors))]
+    asyncio.run(_book(clinic_db, rows))
+    assert len(rows) > 20_000
+    # Напоминания за час для первого слота первого дня уже должны были уйти
+    clock = Clock(_start(1, 0) - 45 * 60)
+
+    async def scenario():
+        service = ReminderService(offsets=[HOUR], batch_size=64, clock=clock)
+        tasks = len(asyncio.all_tasks())
+        started = time.perf_counter()
+        await service.load()
+        loaded = time.perf_counter() - started
+        assert len(asyncio.all_tasks()) == tasks + 1  # Одна фоновая задача на все напоминания
+        await _wait_for(lambda: len(_sent(outbox)) == len(doctors))
+        pending = len(service)
+        await service.close()
+        await utils.reminders.sender.close()
+        return loaded, pending
+
+    loaded, pending = asyncio.run(scenario())
+    assert loaded < 5
+    assert pending == len(rows) - len(doctors)
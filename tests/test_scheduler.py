@@ -0,0 +1,183 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from utils.scheduler import DBMarkerStore, PeriodicJob, next_daily, next_weekly
+from utils.shared_state import Lease
+
+
+class Clock:
+    def __init__(self, now: datetime):
+        self.now = now
+
+    def __call__(self) -> datetime:
+        return self.now
+
+
+class MemoryStore:
+    """Отметки запусков в памяти, общие для нескольких задач"""
+
+    def __init__(self, last_run: datetime = None):
+        self.runs = {}
+        self.last_run = last_run
+
+    async def load(self, name):
+        return self.runs.get(name, self.last_run)
+
+    async def save(self, name, last_run):
+        self.runs[name] = last_run
+
+
+class FakeSharedState:
+    """Аренды в памяти со сроком по часам теста — как SharedState с Redis"""
+
+    def __init__(self, clock: Clock):
+        self.clock = clock
+        self.leases = {}  # name -> (владелец, истекает)
+
+    async def acquire_lease(self, name, owner, ttl):
+        holder = self.leases.get(name)
+        if holder is not None and holder[0] != owner and holder[1] > self.clock():
+            return False
+        self.leases[name] = (owner, self.clock() + timedelta(seconds=ttl))
+        return True
+
+    async def release_lease(self, name, owner):
+        if self.leases.get(name, (None,))[0] == owner:
+            del self.leases[name]
+
+
+class Stop(BaseException):
+    """Прерывает run_forever в тесте (не перехватывается как ошибка задачи)"""
+
+
+def test_next_weekly_and_daily():
+    monday = datetime(2026, 10, 19, 12, 0)
+    assert next_weekly(monday, 0) == datetime(2026, 10, 26)
+    assert next_weekly(monday, 0, 13) == datetime(2026, 10, 19, 13)
+    assert next_daily(monday) == datetime(2026, 10, 20)
+
+
+def test_missed_runs_are_caught_up_once():
+    clock = Clock(datetime(2026, 10, 19, 12, 0))
+    calls = []
+
+    async def callback():
+        calls.append(clock())
+
+    store = MemoryStore(last_run=datetime(2026, 10, 15))  # Бот был выключен четыре дня
+    job = PeriodicJob("archive", next_daily, callback, clock=clock, store=store)
+
+    assert asyncio.run(job.run_pending()) is True
+    assert len(calls) == 1
+    assert store.runs["archive"] == datetime(2026, 10, 19)
+    assert asyncio.run(job.run_pending()) is False
+
+
+def test_first_start_does_not_run_and_sleeps_until_deadline():
+    clock = Clock(datetime(2026, 10, 17, 9, 30))  # Суббота
+    calls, sleeps = [], []
+
+    async def callback():
+        calls.append(clock())
+
+    async def sleep(delay):
+        sleeps.append(delay)
+        clock.now += timedelta(seconds=delay)
+        if len(sleeps) == 2:
+            raise Stop
+
+    job = PeriodicJob("weekly", lambda after: next_weekly(after, 5), callback,
+                      clock=clock, sleep=sleep, store=MemoryStore())
+    try:
+        asyncio.run(job.run_forever())
+    except Stop:
+        pass
+    # Без отметки задача не догоняет прошлое, а спит ровно до следующей субботы 00:00
+    assert sleeps == [(datetime(2026, 10, 24) - datetime(2026, 10, 17, 9, 30)).total_seconds(), 7 * 24 * 3600]
+    assert calls == [datetime(2026, 10, 24)]
+
+
+def test_marker_survives_restart(db):
+    clock = Clock(datetime(2026, 10, 19, 12, 0))
+    calls = []
+
+    async def callback():
+        calls.append(clock())
+
+    async def scenario():
+        await DBMarkerStore().save("archive", datetime(2026, 10, 18))
+        assert await PeriodicJob("archive", next_daily, callback, clock=clock).run_pending()
+        # Новый процесс читает отметку из БД и не выполняет задачу повторно
+        assert not await PeriodicJob("archive", next_daily, callback, clock=clock).run_pending()
+        return await DBMarkerStore().load("archive")
+
+    assert asyncio.run(scenario()) == datetime(2026, 10, 19)
+    assert len(calls) == 1
+
+
+def test_stop_lets_running_callback_finish():
+    clock = Clock(datetime(2026, 10, 19, 12, 0))
+    finished = []
+
+    async def callback():
+        await asyncio.sleep(0.2)
+        finished.append(True)
+
+    async def scenario():
+        job = PeriodicJob("archive", next_daily, callback, clock=clock,
+                          store=MemoryStore(last_run=datetime(2026, 10, 18)))
+        task = asyncio.create_task(job.run_forever())
+        await asyncio.sleep(0.05)
+        await job.stop(timeout=5)
+        return task
+
+    task = asyncio.run(scenario())
+    assert finished == [True]
+    assert task.cancelled()
+
+
+def test_two_processes_share_one_lease(caplog):
+    clock = Clock(datetime(2026, 10, 19, 12, 0))
+    state = FakeSharedState(clock)
+    store = MemoryStore(last_run=datetime(2026, 10, 18))
+    calls = []
+
+    def make_job(name):
+        async def callback():
+            calls.append(name)
+
+        sleeps = []
+
+        async def sleep(delay):
+            sleeps.append(delay)
+            clock.now += timedelta(seconds=delay)
+            if len(sleeps) >= 3:
+                raise Stop
+
+        job = PeriodicJob("archive", next_daily, callback, clock=clock, store=store, sleep=sleep,
+                          lease=Lease("archive", ttl=30, state=state))
+        return job, sleeps
+
+    leader, leader_sleeps = make_job("leader")
+    follower, follower_sleeps = make_job("follower")
+
+    async def scenario():
+        assert await leader.run_pending() is True
+        # В тот же срок ведомый не выполняет задачу повторно и не считает это ошибкой
+        assert await follower.run_pending() is False
+
+        # Ведущий спит до следующего срока; ведомый проверяет аренду каждые ttl,
+        # забирает её после истечения и выполняет задачу в следующий срок
+        with caplog.at_level(logging.ERROR):
+            try:
+                await follower.run_forever()
+            except Stop:
+                pass
+        assert not caplog.records
+        assert follower_sleeps == [30, 43170, 86400]
+        assert follower.lease.held
+
+    asyncio.run(scenario())
+    assert calls == ["leader", "follower"]
+    assert store.runs["archive"] == datetime(2026, 10, 20)
+    assert leader_sleeps == []
@@ -0,0 +1,98 @@
+import asyncio
+import time
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from aiogram.methods import SendMessage
+from utils.sender import OutboundSender, PRIORITY_BULK, PRIORITY_REPLY
+from fakes import FakeSession
+
+
+class FloodSession(FakeSession):
+    """Отвечает 429 на первые flood сообщений и 403 в заблокированные чаты"""
+
+    def __init__(self, flood: int = 0, retry_after: int = 1, blocked=()):
+        super().__init__()
+        self.flood = flood
+        self.retry_after = retry_after
+        self.blocked = set(blocked)
+        self.sent_at = []  # (время, chat_id, текст)
+
+    async def make_request(self, bot, method, timeout=None):
+        if isinstance(method, SendMessage):
+            if self.flood:
+                self.flood -= 1
+                raise TelegramRetryAfter(method=method, message="Too Many Requests", retry_after=self.retry_after)
+            if method.chat_id in self.blocked:
+                raise TelegramForbiddenError(method=method, message="Forbidden: bot was blocked by the user")
+            self.sent_at.append((time.monotonic(), method.chat_id, method.text))
+        return await super().make_request(bot, method, timeout)
+
+
+def _sender(session, **kwargs) -> OutboundSender:
+    sender = OutboundSender(**kwargs)
+    sender.init(Bot("42:TEST", session=session))
+    return sender
+
+
+def test_retry_after_is_honoured():
+    session = FloodSession(flood=1, retry_after=1)
+    sender = _sender(session, global_rate=30, chat_interval=0)
+
+    async def scenario():
+        started = time.monotonic()
+        message = await sender.send_message(1, "hello")
+        await sender.close()
+        return message, time.monotonic() - started
+
+    message, elapsed = asyncio.run(scenario())
+    assert message.text == "hello"
+    assert elapsed >= 1
+    assert sender.stats == {"sent": 1, "failed": 0, "retried": 1}
+
+
+def test_delivery_failure_is_reported_to_caller():
+    session = FloodSession(blocked={2})
+    sender = _sender(session, chat_interval=0)
+
+    async def scenario():
+        results = await asyncio.gather(sender.enqueue(1, "a"), sender.enqueue(2, "b"), return_exceptions=True)
+        await sender.close()
+        return results
+
+    delivered, blocked = asyncio.run(scenario())
+    assert delivered.text == "a"
+    assert isinstance(blocked, TelegramForbiddenError)
+    assert sender.stats["failed"] == 1
+
+
+def test_replies_overtake_bulk_messages():
+    session = FloodSession()
+    sender = _sender(session, workers=1, chat_interval=0)
+
+    async def scenario():
+        futures = [sender.enqueue(chat_id, "bulk", priority=PRIORITY_BULK) for chat_id in range(10)]
+        futures.append(sender.enqueue(100, "reply", priority=PRIORITY_REPLY))
+        await asyncio.gather(*futures)
+        await sender.close()
+
+    asyncio.run(scenario())
+    assert session.sent_at[0][2] == "reply"
+
+
+def test_global_and_per_chat_limits():
+    session = FloodSession()
+    sender = _sender(session, global_rate=50, chat_interval=0.3, workers=8)
+
+    async def scenario():
+        futures = [sender.enqueue(chat_id, "x") for chat_id in range(100)]
+        futures += [sender.enqueue(0, "second"), sender.enqueue(0, "third")]
+        await asyncio.gather(*futures)
+        await sender.close()
+
+    asyncio.run(scenario())
+    times = [sent for sent, _, _ in session.sent_at]
+    # Первые 50 — запасом корзины, остальные 52 — не быстрее 50 в секунду
+    assert times[-1] - times[0] >= 52 / 50 - 0.1
+    chat_times = [sent for sent, chat_id, _ in session.sent_at if chat_id == 0]
+    assert all(later - earlier >= 0.3 - 0.01 for earlier, later in zip(chat_times, chat_times[1:]))
+    assert [text for _, chat_id, text in session.sent_at if chat_id == 0] == ["x", "second", "third"]
@@ -0,0 +1,99 @@
+import asyncio
+import pytest
+from aiogram.fsm.storage.base import StorageKey
+from middlewares.throttling import RedisTokenBucketLimiter
+from utils.fsm_storage import RedisStorage
+from utils.shared_state import Lease, RedisClient, RedisError, SharedState
+from resp_server import RespServer
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _run(scenario, clock=None):
+    """Запускает scenario(server, state) против сервера Redis в памяти процесса"""
+    async def main():
+        server = await RespServer(clock or Clock()).start()
+        state = SharedState(server.url)
+        try:
+            return await scenario(server, state)
+        finally:
+            await state.close()
+            await server.close()
+    return asyncio.run(main())
+
+
+def test_client_pipeline_and_errors():
+    async def scenario(server, state):
+        replies = await state.redis.pipeline(("SET", "a", "1"), ("SET", "a", "2", "NX"), ("GET", "a"))
+        with pytest.raises(RedisError):
+            await state.redis.execute("FLUSHALL")
+        # После ошибки сервера соединение остаётся рабочим
+        return replies, await state.redis.execute("GET", "a")
+
+    assert _run(scenario) == (["OK", None, "1"], "1")
+
+
+def test_lease_is_exclusive_and_expires():
+    clock = Clock()
+
+    async def scenario(server, state):
+        first = Lease("archive", ttl=30, state=state)
+        second = Lease("archive", ttl=30, state=state)
+        assert await first.acquire()
+        assert not await second.acquire()
+        assert await first.acquire()  # Владелец продлевает аренду
+        clock.now += 31
+        assert await second.acquire()  # Ведущий не продлил — аренда перешла
+        assert not await first.acquire()
+        await second.release()
+        assert await first.acquire()
+
+    _run(scenario, clock)
+
+
+def test_without_redis_every_process_leads():
+    state = SharedState("")
+    assert not state.shared
+    assert asyncio.run(Lease("archive", state=state).acquire())
+
+
+def test_fsm_storage_roundtrip():
+    key = StorageKey(bot_id=42, chat_id=7, user_id=7)
+
+    async def scenario(server, state):
+        storage = RedisStorage(state.redis, ttl=60)
+        await storage.set_state(key, "Booking:waiting_for_time")
+        await storage.set_data(key, {"doctor": "surgeon", "date": "2026-10-20"})
+        # Другой процесс бота видит те же данные
+        other = RedisStorage(RedisClient(server.url), ttl=60)
+        seen = await other.get_state(key), await other.get_data(key)
+        await other.redis.close()
+        await storage.set_state(key, None)
+        await storage.set_data(key, {})
+        return seen, await storage.get_state(key), await storage.get_data(key), server.data
+
+    seen, state_after, data_after, keys = _run(scenario)
+    assert seen == ("Booking:waiting_for_time", {"doctor": "surgeon", "date": "2026-10-20"})
+    assert (state_after, data_after, keys) == (None, {}, {})
+
+
+def test_rate_limit_is_shared_between_processes():
+    clock = Clock()
+
+    async def scenario(server, state):
+        limiters = [RedisTokenBucketLimiter(RedisClient(server.url), "callback", rate=1, burst=2) for _ in range(2)]
+        taken = [await limiters[0].consume(1), await limiters[1].consume(1), await limiters[0].consume(1)]
+        clock.now += 1
+        taken.append(await limiters[1].consume(1))
+        warned = [await limiter.should_warn(1, window=10) for limiter in limiters]
+        for limiter in limiters:
+            await limiter.redis.close()
+        return taken, warned
+
+    assert _run(scenario, clock) == ([True, True, False, True], [True, False])
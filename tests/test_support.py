@@ -0,0 +1,109 @@
+import asyncio
+import heapq
+from services.support import SupportPool
+from utils.sender import sender
+from config.settings import ADMIN_ID
+from services.support import support_pool
+from fakes import callback_update, fake_bot, message_update
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_round_robin_and_least_open():
+    pool = SupportPool(operators=[1, 2, 3], strategy="round_robin")
+    assert [pool.pick() for _ in range(6)] == [1, 2, 3, 1, 2, 3]
+
+    pool = SupportPool(operators=[1, 2, 3], strategy="least_open")
+    assert sorted(pool.pick() for _ in range(3)) == [1, 2, 3]
+    pool._release(2)
+    assert pool.pick() == 2  # У второго оператора теперь меньше всех открытых
+
+
+def _simulate(operators: int, tickets: int = 200, arrival: float = 1.0, handling: float = 3.5) -> float:
+    """Средняя задержка до начала работы над обращением: оператор разбирает свои обращения по очереди"""
+    pool = SupportPool(operators=list(range(operators)), strategy="least_open")
+    free_at = {operator: 0.0 for operator in pool.operators}
+    finishing = []  # (время завершения, оператор)
+    waits = []
+    for i in range(tickets):
+        now = i * arrival
+        while finishing and finishing[0][0] <= now:
+            pool._release(heapq.heappop(finishing)[1])
+        operator = pool.pick()
+        start = max(now, free_at[operator])
+        free_at[operator] = start + handling
+        heapq.heappush(finishing, (free_at[operator], operator))
+        waits.append(start - now)
+    return sum(waits) / len(waits)
+
+
+def test_queue_latency_drops_as_operators_are_added():
+    waits = [_simulate(operators) for operators in (1, 2, 3, 4)]
+    assert all(more > fewer for more, fewer in zip(waits, waits[1:]))
+    assert waits[-1] < 1  # Три оператора не успевают за потоком обращений, четверо — почти без очереди
+
+
+def test_overdue_ticket_moves_to_another_operator(db):
+    clock = Clock()
+    bot = fake_bot()
+    sender.init(bot)
+
+    async def scenario():
+        pool = SupportPool(operators=[1, 2], strategy="round_robin", timeout=60, clock=clock)
+        ticket_id = await pool.open_ticket(5, "Пациент", "Не могу записаться")
+        clock.now += 30
+        assert await pool.reassign_overdue() == 0
+        clock.now += 60
+        assert await pool.reassign_overdue() == 1
+        ticket = await pool.get_ticket(ticket_id)
+        assert await pool.close_ticket(ticket_id, "Готово")
+        assert not await pool.close_ticket(ticket_id, "Повтор")
+        await sender.close()
+        return ticket
+
+    ticket = asyncio.run(scenario())
+    assert (ticket["operator_id"], ticket["reassign_count"]) == (2, 1)
+    assert [call.chat_id for call in bot.session.calls] == [1, 2]
+
+
+def test_single_operator_is_not_notified_again(db):
+    clock = Clock()
+    bot = fake_bot()
+    sender.init(bot)
+
+    async def scenario():
+        pool = SupportPool(operators=[1], timeout=60, clock=clock)
+        await pool.open_ticket(5, "Пациент", "Вопрос")
+        for _ in range(3):
+            clock.now += 120
+            assert await pool.reassign_overdue() == 0
+        await sender.close()
+
+    asyncio.run(scenario())
+    assert len(bot.session.calls) == 1
+
+
+def test_reply_to_a_missing_ticket_is_reported(dispatcher, db):
+    bot = fake_bot()
+    sender.init(bot)
+
+    async def scenario():
+        ticket_id = await support_pool.open_ticket(720, "Пациент", "Вопрос")
+        await dispatcher.feed_update(bot, callback_update(ADMIN_ID, f"ticket_{ticket_id}"))
+        await db.execute("DELETE FROM support_tickets WHERE id = ?", (ticket_id,))
+        await dispatcher.feed_update(bot, message_update(ADMIN_ID, "Ответ"))
+        # Кнопка под другим сообщением — не двойное нажатие
+        await dispatcher.feed_update(bot, callback_update(ADMIN_ID, f"ticket_{ticket_id}", message_id=2))
+        await sender.close()
+
+    asyncio.run(scenario())
+    texts = bot.session.texts()
+    assert "❌ Обращение не найдено." in texts
+    assert not any("Ответ от поддержки" in (text or "") for text in texts)
+    assert bot.session.calls[-1].text == "Обращение не найдено"  # Ответ на нажатие кнопки
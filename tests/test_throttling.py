@@ -0,0 +1,77 @@
+import asyncio
+import tracemalloc
+from types import SimpleNamespace
+from middlewares.throttling import ThrottlingMiddleware, TokenBucketLimiter
+
+
+def test_bucket_allows_burst_then_refills():
+    limiter = TokenBucketLimiter(rate=1, burst=3)
+    assert [limiter.consume(1, now=0) for _ in range(4)] == [True, True, True, False]
+    assert limiter.consume(1, now=0.5) is False
+    assert limiter.consume(1, now=1) is True
+    assert limiter.consume(2, now=1) is True  # У каждого пользователя своя корзина
+
+
+def test_warnings_are_coalesced_per_window():
+    limiter = TokenBucketLimiter(rate=1, burst=1)
+    assert limiter.should_warn(1, window=10, now=100)
+    assert not limiter.should_warn(1, window=10, now=105)
+    assert limiter.should_warn(1, window=10, now=110)
+
+
+def test_memory_stays_flat_with_a_million_users():
+    limiter = TokenBucketLimiter(rate=1, burst=3, max_users=1000)
+
+    def consume(first, count):
+        for user_id in range(first, first + count):
+            limiter.consume(user_id, now=0)
+
+    tracemalloc.start()
+    consume(0, 10_000)
+    before = tracemalloc.get_traced_memory()[0]
+    consume(10_000, 990_000)  # Всего 1M разных user_id
+    growth = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    assert len(limiter) == 1000
+    assert growth < 50_000  # Вытесненные корзины освобождаются: память не растёт с числом пользователей
+
+
+class FakeEvent(SimpleNamespace):
+    async def answer(self, text, **kwargs):
+        self.answers.append(text)
+
+
+def test_middleware_drops_flood_and_warns_once():
+    middleware = ThrottlingMiddleware(rate=0.001, burst=2, warning_window=60, name="callback")
+    handled = []
+
+    async def handler(event, data):
+        handled.append(event)
+
+    async def flood():
+        event = FakeEvent(from_user=SimpleNamespace(id=1), answers=[])
+        for _ in range(5):
+            await middleware(handler, event, {})
+        return event
+
+    event = asyncio.run(flood())
+    assert len(handled) == 2
+    assert len(event.answers) == 1
+
+
+def test_messages_and_callbacks_have_separate_budgets():
+    messages = ThrottlingMiddleware(rate=0.001, burst=1, name="message")
+    callbacks = ThrottlingMiddleware(rate=0.001, burst=1, name="callback")
+    handled = []
+
+    async def handler(event, data):
+        handled.append(event)
+
+    async def scenario():
+        event = FakeEvent(from_user=SimpleNamespace(id=1), answers=[])
+        await messages(handler, event, {})
+        await callbacks(handler, event, {})
+        await messages(handler, event, {})
+
+    asyncio.run(scenario())
+    assert len(handled) == 2
@@ -0,0 +1,113 @@
+import asyncio
+import time
+from aiogram import Bot, Dispatcher
+from aiogram.methods import GetMe, GetUpdates
+from aiogram.types import User
+from aiohttp.test_utils import TestClient, TestServer
+from config.settings import WEBHOOK_PATH
+from utils.webhook import create_webhook_app
+from fakes import FakeSession, fake_bot, message_update
+
+SECRET = "test-secret"
+UPDATES = 200
+
+
+class PollingSession(FakeSession):
+    """getUpdates как у Telegram: запрос ждёт первого обновления до timeout секунд"""
+
+    def __init__(self):
+        super().__init__()
+        self.updates = asyncio.Queue()
+
+    async def make_request(self, bot, method, timeout=None):
+        if isinstance(method, GetMe):
+            return User(id=42, is_bot=True, first_name="Test", username="test_bot")
+        if not isinstance(method, GetUpdates):
+            return await super().make_request(bot, method, timeout)
+        try:
+            batch = [await asyncio.wait_for(self.updates.get(), method.timeout)]
+        except asyncio.TimeoutError:
+            return []
+        while not self.updates.empty():
+            batch.append(self.updates.get_nowait())
+        return batch
+
+
+def _echo_dispatcher(handled: asyncio.Queue) -> Dispatcher:
+    dp = Dispatcher()
+
+    @dp.message()
+    async def echo(message):
+        handled.put_nowait(message.text)
+
+    return dp
+
+
+async def _serve(handled: asyncio.Queue) -> TestClient:
+    client = TestClient(TestServer(create_webhook_app(_echo_dispatcher(handled), fake_bot(), SECRET)))
+    await client.start_server()
+    return client
+
+
+def test_webhook_rejects_wrong_secret():
+    async def scenario():
+        handled = asyncio.Queue()
+        client = await _serve(handled)
+        try:
+            update = message_update(1, "hi").model_dump(mode="json", exclude_none=True)
+            response = await client.post(WEBHOOK_PATH, json=update,
+                                         headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"})
+            return response.status, handled.qsize()
+        finally:
+            await client.close()
+
+    assert asyncio.run(scenario()) == (401, 0)
+
+
+async def _webhook_latencies() -> list:
+    """От POST на вебхук до вызова обработчика, по одному обновлению"""
+    handled = asyncio.Queue()
+    client = await _serve(handled)
+    latencies = []
+    try:
+        for i in range(UPDATES):
+            update = message_update(1, f"update {i}").model_dump(mode="json", exclude_none=True)
+            started = time.perf_counter()
+            response = await client.post(WEBHOOK_PATH, json=update,
+                                         headers={"X-Telegram-Bot-Api-Secret-Token": SECRET})
+            assert response.status == 200
+            assert await asyncio.wait_for(handled.get(), 5) == f"update {i}"
+            latencies.append(time.perf_counter() - started)
+    finally:
+        await client.close()
+    return sorted(latencies)
+
+
+async def _polling_latencies() -> list:
+    """От появления обновления в getUpdates до вызова обработчика в цикле long polling"""
+    handled = asyncio.Queue()
+    session = PollingSession()
+    bot = Bot("42:TEST", session=session)
+    dp = _echo_dispatcher(handled)
+    polling = asyncio.create_task(dp.start_polling(bot, polling_timeout=1, handle_signals=False))
+    latencies = []
+    try:
+        for i in range(UPDATES):
+            started = time.perf_counter()
+            session.updates.put_nowait(message_update(1, f"update {i}"))
+            assert await asyncio.wait_for(handled.get(), 5) == f"update {i}"
+            latencies.append(time.perf_counter() - started)
+    finally:
+        await dp.stop_polling()
+        await polling
+    return sorted(latencies)
+
+
+def test_webhook_and_polling_latency():
+    webhook = asyncio.run(_webhook_latencies())
+    polling = asyncio.run(_polling_latencies())
+    # В процессе обе схемы доставляют обновление за миллисекунды; сеть до Telegram здесь не моделируется,
+    # поэтому проверяется только накладной расход бота на каждом пути
+    for latencies in (webhook, polling):
+        assert latencies[UPDATES // 2] < 0.05
+        assert latencies[int(UPDATES * 0.99)] < 0.5
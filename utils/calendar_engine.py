@@ -0,0 +1,76 @@
+from datetime import date, datetime, time, timedelta
+from typing import Callable, Iterable, List
+from config.settings import WORK_HOURS, WORK_MINUTES, WORK_DAYS, CALENDAR_WEEKS
+
+DAY_NAMES = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота", "Воскресенье"]
+
+
+class Schedule:
+    """Рабочее расписание: дни недели и слоты дня (индекс слота -> время "10:00", "10:30", ...)"""
+
+    def __init__(self, hours: Iterable[int], minutes: Iterable, days: Iterable[int]):
+        self.hours = sorted({int(hour) for hour in hours})
+        self.minutes = sorted({int(minute) for minute in minutes})
+        self.days = sorted({int(day) for day in days})
+        self.slot_times = [time(hour, minute) for hour in self.hours for minute in self.minutes]
+        self.slots = [f"{t.hour}:{t.minute:02d}" for t in self.slot_times]
+        self.slot_index = {slot: i for i, slot in enumerate(self.slots)}
+
+
+# Расписание из настроек — до загрузки из БД и для переноса старых записей
+DEFAULT_SCHEDULE = Schedule(WORK_HOURS, WORK_MINUTES, WORK_DAYS)
+
+
+class CalendarEngine:
+    """
+    Календарь записи: реальные даты и целые индексы слотов на N недель вперёд.
+    Расписание (schedule) заменяется целиком при изменении настроек клиники.
+    """
+
+    def __init__(self, weeks: int = CALENDAR_WEEKS, clock: Callable[[], datetime] = datetime.now,
+                 schedule: Schedule = DEFAULT_SCHEDULE):
+        self.weeks = weeks
+        self.clock = clock
+        self.schedule = schedule
+
+    @property
+    def slots(self) -> List[str]:
+        return self.schedule.slots
+
+    def today(self) -> date:
+        return self.clock().date()
+
+    def dates(self) -> List[date]:
+        """Рабочие дни, на которые сейчас открыта запись (с сегодняшнего дня)"""
+        today = self.today()
+        days = (today + timedelta(days=i) for i in range(self.weeks * 7))
+        return [day for day in days if day.weekday() in self.schedule.days and self.open_slots(day)]
+
+    def open_slots(self, day: date) -> List[int]:
+        """Слоты дня, которые ещё не начались"""
+        now = self.clock()
+        if day > now.date():
+            return list(range(len(self.schedule.slots)))
+        if day < now.date():
+            return []
+        return [i for i, slot_time in enumerate(self.schedule.slot_times) if slot_time > now.time()]
+
+    def is_bookable(self, day: date, slot: int = None) -> bool:
+        """Проверяет, что день (и слот) попадает в горизонт записи и ещё не прошёл"""
+        today = self.today()
+        if day.weekday() not in self.schedule.days or not today <= day < today + timedelta(weeks=self.weeks):
+            return False
+        open_slots = self.open_slots(day)
+        return bool(open_slots) if slot is None else slot in open_slots
+
+    def slot_datetime(self, day: date, slot: int) -> datetime:
+        return datetime.combine(day, self.schedule.slot_times[slot])
+
+    @staticmethod
+    def day_label(day: date) -> str:
+        """Подпись дня для пользователя: «Понедельник, 21.10»"""
+        return f"{DAY_NAMES[day.weekday()]}, {day:%d.%m}"
+
+
+# Глобальный календарь записи
+calendar = CalendarEngine()
@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import re
+from datetime import date
+from typing import Dict, List, Optional
+from config.database import db
+from config.settings import CONFIG_REFRESH_INTERVAL
+from utils.calendar_engine import Schedule, calendar
+from utils.occupancy import occupancy
+
+# Код врача попадает в callback-данные ("doctor_{code}", "time_{slot}_{code}")
+DOCTOR_CODE_RE = re.compile(r"^[a-z0-9]{1,20}$")
+
+
+class ScheduleConflict(Exception):
+    """Новое расписание не покрывает уже сделанные записи"""
+
+    def __init__(self, appointments: list):
+        self.appointments = appointments
+        super().__init__(f"{len(appointments)} appointments outside the new schedule")
+
+
+class ClinicConfig:
+    """
+    Врачи и расписание клиники из БД с кэшем в памяти.
+    Любое изменение увеличивает version в clinic_settings: кэши клавиатур
+    сбрасываются по self.version, а другие процессы бота подхватывают
+    изменения при периодической сверке версии.
+    """
+
+    def __init__(self, refresh_interval: float = CONFIG_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self.doctors: Dict[str, dict] = {}  # code -> {"title", "chat_id"}, в порядке отображения
+        self.version = 0     # Локальный счётчик перезагрузок — ключ кэшей
+        self._db_version = None
+        self._task = None
+
+    async def load(self):
+        """Загружает врачей и расписание; расписание сразу применяется к календарю"""
+        def _read(conn):
+            doctors = conn.execute(
+                "SELECT code, title, chat_id FROM doctors WHERE active = 1 ORDER BY position, code"
+            ).fetchall()
+            settings = dict(conn.execute("SELECT key, value FROM clinic_settings").fetchall())
+            return doctors, settings
+
+        doctors, settings = await db.run(_read)
+        self.doctors = {row["code"]: {"title": row["title"], "chat_id": row["chat_id"]} for row in doctors}
+        calendar.schedule = Schedule(
+            _ints(settings["work_hours"]), _ints(settings["work_minutes"]), _ints(settings["work_days"])
+        )
+        self._db_version = settings.get("version")
+        self.version += 1
+        logging.info(f"Clinic config loaded: {len(self.doctors)} doctors, "
+                     f"{len(calendar.slots)} slots, version {self._db_version}")
+
+        if self._task is None and self.refresh_interval:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def refresh(self) -> bool:
+        """Перечитывает настройки, если их изменил другой процесс"""
+        row = await db.fetchone("SELECT value FROM clinic_settings WHERE key = 'version'")
+        if row is None or row[0] == self._db_version:
+            return False
+        await self.load()
+        await occupancy.load()  # Индексы слотов могли сместиться
+        return True
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logging.error(f"Error refreshing clinic config: {e}")
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    # --- Чтение ---
+
+    def title(self, code: str) -> str:
+        doctor = self.doctors.get(code)
+        return doctor["title"] if doctor else code
+
+    def chat_id(self, code: str) -> Optional[int]:
+        doctor = self.doctors.get(code)
+        return doctor["chat_id"] if doctor else None
+
+    def codes_for(self, user_id: int) -> List[str]:
+        """Специализации, консультации по которым приходят пользователю user_id"""
+        return [code for code, doctor in self.doctors.items() if doctor["chat_id"] == user_id]
+
+    # --- Изменение (админские команды) ---
+
+    @staticmethod
+    def _bump_version(conn):
+        conn.execute("UPDATE clinic_settings SET value = CAST(value AS INTEGER) + 1 WHERE key = 'version'")
+
+    async def save_doctor(self, code: str, chat_id: int, title: str):
+        """Добавляет врача или изменяет существующего (в том числе возвращает отключённого)"""
+        if not DOCTOR_CODE_RE.match(code):
+            raise ValueError("Код врача — латинские буквы и цифры, до 20 символов")
+
+        def _save(conn):
+            with conn:
+                conn.execute(
+                    """INSERT INTO doctors (code, title, chat_id, position)
+                       VALUES (?, ?, ?, (SELECT COALESCE(MAX(position), -1) + 1 FROM doctors))
+                       ON CONFLICT(code) DO UPDATE SET title = excluded.title,
+                           chat_id = excluded.chat_id, active = 1""",
+                    (code, title, chat_id)
+                )
+                self._bump_version(conn)
+
+        await db.run(_save)
+        await self.load()
+
+    async def disable_doctor(self, code: str) -> bool:
+        """Скрывает врача из клавиатур; записи и история консультаций сохраняются"""
+        def _disable(conn):
+            with conn:
+                cursor = conn.execute("UPDATE doctors SET active = 0 WHERE code = ? AND active = 1", (code,))
+                if cursor.rowcount:
+                    self._bump_version(conn)
+                return cursor.rowcount > 0
+
+        disabled = await db.run(_disable)
+        if disabled:
+            await self.load()
+        return disabled
+
+    async def save_schedule(self, schedule: Schedule):
+        """
+        Сохраняет расписание и переводит будущие записи на новые индексы слотов.
+        Если какие-то записи не попадают в новое расписание — ScheduleConflict, ничего не меняется.
+        """
+        if not schedule.slots or not schedule.days:
+            raise ValueError("В расписании должны быть рабочие дни и слоты")
+
+        def _save(conn):
+            with conn:
+                rows = conn.execute(
+                    "SELECT id, date, time, doctor FROM appointments WHERE date >= ? AND slot IS NOT NULL",
+                    (date.today().isoformat(),)
+                ).fetchall()
+                conflicts = [
+                    row for row in rows
+                    if row["time"] not in schedule.slot_index
+                    or date.fromisoformat(row["date"]).weekday() not in schedule.days
+                ]
+                if conflicts:
+                    raise ScheduleConflict(conflicts)
+
+                # Два прохода, чтобы промежуточные значения не нарушали уникальный индекс (doctor, date, slot)
+                remap = [(-1 - schedule.slot_index[row["time"]], row["id"]) for row in rows]
+                conn.executemany("UPDATE appointments SET slot = ? WHERE id = ?", remap)
+                conn.execute("UPDATE appointments SET slot = -1 - slot WHERE slot < 0")
+
+                conn.executemany(
+                    "UPDATE clinic_settings SET value = ? WHERE key = ?",
+                    [
+                        (",".join(map(str, schedule.hours)), "work_hours"),
+                        (",".join(map(str, schedule.minutes)), "work_minutes"),
+                        (",".join(map(str, schedule.days)), "work_days"),
+                    ]
+                )
+                self._bump_version(conn)
+
+        await db.run(_save)
+        await self.load()
+        await occupancy.load()
+
+
+def _ints(value: str) -> List[int]:
+    return [int(part) for part in value.split(",") if part.strip()]
+
+
+# Глобальные настройки клиники
+clinic = ClinicConfig()
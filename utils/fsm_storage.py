@@ -0,0 +1,197 @@
+import asyncio
+import copy
+import json
+import logging
+import time
+from typing import Any, Dict, Optional
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from config.database import db
+from config.settings import FSM_TTL_SECONDS, FSM_FLUSH_INTERVAL
+from utils.shared_state import RedisClient, shared_state
+
+
+def _storage_key(key: StorageKey) -> str:
+    return ":".join(str(part) for part in (
+        key.bot_id,
+        key.chat_id,
+        key.user_id,
+        key.thread_id or "",
+        getattr(key, "business_connection_id", None) or "",
+        key.destiny,
+    ))
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    FSM-хранилище в SQLite: чтение из кэша в памяти, запись пачками в фоне.
+    Диалоги, неактивные дольше ttl секунд, удаляются из памяти и из БД.
+    """
+
+    def __init__(self, ttl: int = FSM_TTL_SECONDS, flush_interval: float = FSM_FLUSH_INTERVAL):
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.evict_interval = 60  # Как часто искать устаревшие диалоги (сек)
+        self._cache: Dict[str, dict] = {}  # key -> {"state", "data", "touched"}
+        self._dirty = set()  # Ключи, изменённые с последней записи в БД
+        self._last_evict = time.time()
+        self._task = None
+
+    _key = staticmethod(_storage_key)
+
+    def __len__(self):
+        return len(self._cache)
+
+    def _entry(self, key: StorageKey) -> dict:
+        k = self._key(key)
+        entry = self._cache.get(k)
+        if entry is None:
+            entry = self._cache[k] = {"state": None, "data": {}, "touched": 0.0}
+        entry["touched"] = time.time()
+        self._dirty.add(k)
+        return entry
+
+    def _lookup(self, key: StorageKey) -> Optional[dict]:
+        entry = self._cache.get(self._key(key))
+        if entry is not None:
+            entry["touched"] = time.time()
+        return entry
+
+    async def load(self):
+        """Восстанавливает незавершённые диалоги из БД и запускает фоновую запись"""
+        await db.execute("DELETE FROM fsm_states WHERE updated_at < ?", (time.time() - self.ttl,))
+        rows = await db.fetchall("SELECT key, state, data, updated_at FROM fsm_states")
+        for row in rows:
+            self._cache[row["key"]] = {
+                "state": row["state"],
+                "data": json.loads(row["data"]) if row["data"] else {},
+                "touched": row["updated_at"],
+            }
+        logging.info(f"FSM storage loaded: {len(rows)} active conversations")
+
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        entry = self._entry(key)
+        entry["state"] = state.state if isinstance(state, State) else state
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        entry = self._lookup(key)
+        return entry["state"] if entry else None
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        entry = self._entry(key)
+        entry["data"] = copy.deepcopy(dict(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        entry = self._lookup(key)
+        return copy.deepcopy(entry["data"]) if entry else {}
+
+    def _evict_expired(self):
+        """Удаляет из памяти диалоги, неактивные дольше ttl"""
+        now = time.time()
+        self._last_evict = now
+        cutoff = now - self.ttl
+        expired = [k for k, entry in self._cache.items() if entry["touched"] < cutoff]
+        for k in expired:
+            del self._cache[k]
+            self._dirty.add(k)  # Строка будет удалена из БД при записи
+        if expired:
+            logging.info(f"FSM storage evicted {len(expired)} idle conversations")
+
+    @staticmethod
+    def _write(conn, upserts, deletes):
+        with conn:
+            conn.executemany(
+                """INSERT INTO fsm_states (key, state, data, updated_at) VALUES (?, ?, ?, ?)
+                   ON CONFLICT(key) DO UPDATE SET
+                       state = excluded.state,
+                       data = excluded.data,
+                       updated_at = excluded.updated_at""",
+                upserts
+            )
+            conn.executemany("DELETE FROM fsm_states WHERE key = ?", deletes)
+
+    async def flush(self):
+        """Записывает все накопленные изменения одной транзакцией"""
+        if time.time() - self._last_evict >= self.evict_interval:
+            self._evict_expired()
+        if not self._dirty:
+            return
+
+        keys, self._dirty = self._dirty, set()
+        upserts, deletes = [], []
+        for k in keys:
+            entry = self._cache.get(k)
+            if entry is None or (entry["state"] is None and not entry["data"]):
+                # Диалог завершён (state.clear()) или устарел — в памяти и в БД он не нужен
+                self._cache.pop(k, None)
+                deletes.append((k,))
+            else:
+                upserts.append((k, entry["state"], json.dumps(entry["data"], ensure_ascii=False), entry["touched"]))
+
+        try:
+            await db.run(self._write, upserts, deletes)
+        except Exception as e:
+            logging.error(f"FSM storage flush error: {e}")
+            self._dirty |= keys  # Повторим при следующей записи
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+
+class RedisStorage(BaseStorage):
+    """
+    FSM-хранилище в Redis, общее для всех процессов бота.
+    Диалог — хеш {state, data}; каждая запись продлевает его жизнь на ttl секунд.
+    """
+
+    def __init__(self, redis: RedisClient, ttl: int = FSM_TTL_SECONDS):
+        self.redis = redis
+        self.ttl_ms = ttl * 1000
+
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        return f"fsm:{_storage_key(key)}"
+
+    async def load(self):
+        """Восстанавливать нечего: состояния живут в Redis"""
+
+    async def _set_field(self, key: StorageKey, field: str, value: Optional[str]):
+        k = self._key(key)
+        if value is None:
+            await self.redis.execute("HDEL", k, field)  # Пустой хеш Redis удаляет сам
+        else:
+            await self.redis.pipeline(("HSET", k, field, value), ("PEXPIRE", k, self.ttl_ms))
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self._set_field(key, "state", state.state if isinstance(state, State) else state)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return await self.redis.execute("HGET", self._key(key), "state")
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        await self._set_field(key, "data", json.dumps(dict(data), ensure_ascii=False) if data else None)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        data = await self.redis.execute("HGET", self._key(key), "data")
+        return json.loads(data) if data else {}
+
+    async def close(self) -> None:
+        pass  # Соединения закрывает shared_state.close()
+
+
+def create_storage() -> BaseStorage:
+    """FSM-хранилище процесса: Redis, если состояние общее для нескольких процессов, иначе SQLite"""
+    if shared_state.shared:
+        return RedisStorage(shared_state.redis)
+    return SQLiteStorage()
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import os
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+from aiogram import Bot
+from aiogram.types import Update
+from config.settings import SHUTDOWN_TIMEOUT
+from utils.sender import sender, PRIORITY_NOTIFY
+
+# Переменные окружения, через которые перезапущенный процесс узнаёт о перезапуске
+RESTART_AT_ENV = "BOT_RESTART_AT"          # Когда администратор запросил перезапуск (unix time)
+RESTART_CHAT_ENV = "BOT_RESTART_CHAT"      # Куда сообщить о готовности
+RESTART_STOP_ENV = "BOT_RESTART_STOPPED"   # Сколько секунд заняла остановка
+
+
+class Lifecycle:
+    """
+    Плавная остановка и перезапуск бота.
+    Считает обновления в обработке (outer-middleware на dp.update); после запроса
+    остановки приём обновлений прекращается, обработка дожидается завершения
+    (не дольше timeout), а Telegram получает подтверждение обработанных обновлений,
+    чтобы они не пришли повторно после перезапуска.
+    """
+
+    def __init__(self, timeout: float = SHUTDOWN_TIMEOUT, clock: Callable[[], float] = time.time):
+        self.timeout = timeout
+        self.clock = clock
+        self.started = clock()  # Время запуска процесса (модуль импортируется при старте)
+        self.action: Optional[str] = None  # "restart" или "stop"
+        self.chat_id: Optional[int] = None  # Кто запросил — ему сообщим о готовности после перезапуска
+        self.requested_at: Optional[float] = None
+        self.last_update_id: Optional[int] = None  # Наибольший id полностью обработанного обновления
+        self._inflight = set()  # id обновлений в обработке
+        self._idle = None
+        self._requested = None
+
+    def _events(self):
+        # События создаются в работающем цикле событий
+        if self._idle is None:
+            self._idle = asyncio.Event()
+            self._idle.set()
+            self._requested = asyncio.Event()
+
+    async def track(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        """Outer-middleware: учёт обновлений в обработке"""
+        self._events()
+        self._inflight.add(event.update_id)
+        self._idle.clear()
+        try:
+            return await handler(event, data)
+        finally:
+            self._inflight.discard(event.update_id)
+            if self.last_update_id is None or event.update_id > self.last_update_id:
+                self.last_update_id = event.update_id
+            if not self._inflight:
+                self._idle.set()
+
+    @property
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    def request(self, action: str, chat_id: int = None):
+        """Запрашивает остановку ("stop") или перезапуск ("restart"); сама остановка — в main()"""
+        self._events()
+        if self.action is None:
+            self.action, self.chat_id, self.requested_at = action, chat_id, self.clock()
+            logging.info(f"Shutdown requested: {action}")
+        self._requested.set()
+
+    async def wait(self, serving: asyncio.Task):
+        """Ждёт, пока приём обновлений завершится сам (ошибка, сигнал) или будет запрошена остановка"""
+        self._events()
+        requested = asyncio.create_task(self._requested.wait())
+        try:
+            await asyncio.wait({serving, requested}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            requested.cancel()
+
+    async def drain(self) -> bool:
+        """Ждёт завершения обработки уже полученных обновлений; False — не успели за timeout"""
+        self._events()
+        try:
+            await asyncio.wait_for(self._idle.wait(), self.timeout)
+            return True
+        except asyncio.TimeoutError:
+            logging.warning(f"Shutdown: {self.inflight} updates still in progress after {self.timeout}s")
+            return False
+
+    def ack_offset(self) -> Optional[int]:
+        """Offset для getUpdates: всё до самого раннего незавершённого обновления считается обработанным"""
+        if self._inflight:
+            return min(self._inflight)
+        return self.last_update_id + 1 if self.last_update_id is not None else None
+
+    async def ack_updates(self, bot: Bot):
+        """Подтверждает Telegram обработанные обновления (в режиме polling)"""
+        offset = self.ack_offset()
+        if offset is None:
+            return
+        try:
+            await bot.get_updates(offset=offset, limit=1, timeout=0)
+        except Exception as e:
+            logging.error(f"Failed to acknowledge updates up to {offset}: {e}")
+
+    def exec_restart(self):
+        """Заменяет процесс новым; вызывается после выхода из event loop"""
+        if self.requested_at is not None:
+            os.environ[RESTART_AT_ENV] = str(self.requested_at)
+            os.environ[RESTART_STOP_ENV] = f"{self.clock() - self.requested_at:.3f}"
+            if self.chat_id is not None:
+                os.environ[RESTART_CHAT_ENV] = str(self.chat_id)
+        os.execv(sys.executable, [sys.executable, *sys.argv])
+
+    async def report_ready(self):
+        """
+        Startup-хук диспетчера: если процесс запущен командой /перезапуск,
+        сообщает администратору, сколько времени бот был недоступен.
+        """
+        requested_at = os.environ.pop(RESTART_AT_ENV, None)
+        chat_id = os.environ.pop(RESTART_CHAT_ENV, None)
+        stopped = float(os.environ.pop(RESTART_STOP_ENV, "0") or 0)
+        if requested_at is None:
+            return
+
+        now = self.clock()
+        total, startup = now - float(requested_at), now - self.started
+        logging.info(f"Restart complete: ready in {total:.1f}s (shutdown {stopped:.1f}s, startup {startup:.1f}s)")
+        if chat_id:
+            try:
+                await sender.send_message(
+                    int(chat_id),
+                    f"✅ Бот снова в работе: {total:.1f} с\n"
+                    f"Остановка: {stopped:.1f} с, запуск: {startup:.1f} с",
+                    priority=PRIORITY_NOTIFY
+                )
+            except Exception as e:
+                logging.error(f"Failed to report restart: {e}")
+
+
+# Глобальный менеджер жизненного цикла
+lifecycle = Lifecycle()
@@ -0,0 +1,139 @@
+import glob
+import gzip
+import logging
+import os
+import queue
+import shutil
+from collections import deque
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+from config.settings import LOG_FILE, LOG_LEVEL, LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_ROTATE_WHEN
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40, "CRITICAL": 50}
+
+_listener = None
+
+
+def _gzip_rotator(source: str, dest: str):
+    """Сжимает закрытый сегмент лога"""
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+def setup_logging():
+    """
+    Логирование через очередь: обработчики пишут в файл и консоль в отдельном потоке,
+    поэтому вызовы logging не блокируют event loop. Файл ротируется по размеру
+    (или по времени, если задан LOG_ROTATE_WHEN), старые сегменты сжимаются в .gz.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    if LOG_ROTATE_WHEN:
+        file_handler = TimedRotatingFileHandler(LOG_FILE, when=LOG_ROTATE_WHEN,
+                                                backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+    else:
+        file_handler = RotatingFileHandler(LOG_FILE, maxBytes=LOG_MAX_BYTES,
+                                           backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+    file_handler.namer = lambda name: name + ".gz"
+    file_handler.rotator = _gzip_rotator
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    file_handler.setFormatter(formatter)
+    stream_handler = logging.StreamHandler()  # Лог в консоль
+    stream_handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(-1)
+    _listener = QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+    _listener.start()
+    queue_handler = QueueHandler(log_queue)
+    # Сообщение (с traceback) форматируется один раз при постановке в очередь,
+    # а дату и уровень добавляют обработчики в потоке записи
+    queue_handler.setFormatter(logging.Formatter("%(message)s"))
+    logging.basicConfig(level=LOG_LEVEL, handlers=[queue_handler])
+
+
+def stop_logging():
+    """Дописывает очередь логов и останавливает поток записи"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _open_log(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, "r", encoding="utf-8", errors="replace")
+
+
+def _records(path: str):
+    """Генератор записей лога: строка с датой плюс строки продолжения (traceback)"""
+    record = None
+    with _open_log(path) as f:
+        for line in f:
+            if _timestamp(line) is not None:
+                if record is not None:
+                    yield record
+                record = line
+            elif record is not None:
+                record += line
+    if record is not None:
+        yield record
+
+
+def _timestamp(line: str):
+    # Быстрая проверка формата «2025-05-16 18:42:44,791» до разбора даты
+    if len(line) < 20 or line[4] != "-" or line[19] != ",":
+        return None
+    try:
+        return datetime.strptime(line[:19], "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return None
+
+
+def _level(record: str) -> int:
+    parts = record.split(" - ", 3)
+    return LEVELS.get(parts[2], 0) if len(parts) > 2 else 0
+
+
+def search_logs(level: str = None, since: datetime = None, pattern: str = None, last: int = 50) -> list:
+    """
+    Возвращает последние last записей (старые — первыми), подходящие под фильтры.
+    Файлы читаются от нового к старому потоково; более старые сегменты
+    не открываются, если найдено достаточно записей или они целиком раньше since.
+    """
+    min_level = LEVELS.get(level.upper(), 0) if level else 0
+    pattern = pattern.lower() if pattern else None
+
+    # Текущий файл и сжатые сегменты, от нового к старому
+    paths = [p for p in [LOG_FILE] + glob.glob(f"{LOG_FILE}.*") if os.path.exists(p)]
+    paths.sort(key=os.path.getmtime, reverse=True)
+
+    result = deque()
+    for path in paths:
+        matches = deque(maxlen=last)  # Память ограничена last записями на файл
+        reached_since = False
+        for record in _records(path):
+            if since is not None:
+                ts = _timestamp(record)
+                if ts is not None and ts < since:
+                    reached_since = True
+                    continue
+            if _level(record) < min_level:
+                continue
+            if pattern and pattern not in record.lower():
+                continue
+            matches.append(record)
+
+        # Записи из более старого файла идут перед уже найденными
+        for record in reversed(matches):
+            if len(result) >= last:
+                break
+            result.appendleft(record)
+        if len(result) >= last or reached_since:
+            break
+    return list(result)
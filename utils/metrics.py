@@ -0,0 +1,166 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict
+from aiohttp import web
+from config.settings import METRICS_HOST, METRICS_PORT
+
+# Границы корзин гистограмм задержек (секунды)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Описания метрик для формата Prometheus
+HELP = {
+    "bot_handler_seconds": "Время выполнения обработчика",
+    "bot_handler_errors_total": "Необработанные исключения в обработчиках",
+    "bot_throttled_total": "События, отклонённые антифлудом",
+    "bot_api_seconds": "Длительность запросов к Telegram Bot API",
+    "bot_api_errors_total": "Ошибки запросов к Telegram Bot API",
+    "bot_db_seconds": "Длительность операций с БД",
+    "bot_db_wait_seconds": "Ожидание свободного соединения пула БД",
+    "bot_bookings_total": "Попытки записи на приём",
+    "bot_consultations_total": "Вопросы и ответы консультаций",
+    "bot_support_tickets_total": "Обращения в поддержку и ответы на них",
+}
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами: счётчики, сумма и количество наблюдений"""
+
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # Последняя корзина — больше максимальной границы
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Оценка квантиля сверху: граница корзины, в которую он попадает"""
+        rank, seen = q * self.count, 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return BUCKETS[i] if i < len(BUCKETS) else float("inf")
+        return 0.0
+
+
+class Metrics:
+    """
+    Реестр счётчиков и гистограмм в памяти процесса.
+    Запись — словарь и несколько сложений под блокировкой (метрики БД пишутся из потоков пула).
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self._counters = {}    # (имя, метки) -> значение
+        self._histograms = {}  # (имя, метки) -> Histogram
+        self._gauges: Dict[str, Callable[[], float]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(labels.items()))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(labels.items()))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def gauge(self, name: str, func: Callable[[], float]):
+        """Регистрирует показатель, который вычисляется в момент чтения метрик"""
+        self._gauges[name] = func
+
+    def counters(self, name: str) -> dict:
+        """Значения счётчика по наборам меток: {(("метка", "значение"), ...): число}"""
+        with self._lock:
+            return {labels: value for (key, labels), value in self._counters.items() if key == name}
+
+    def histograms(self, name: str) -> dict:
+        with self._lock:
+            return {labels: h for (key, labels), h in self._histograms.items() if key == name}
+
+    def render(self) -> str:
+        """Текстовый формат Prometheus (exposition format 0.0.4)"""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+            # Снимок гистограмм, чтобы не держать блокировку во время форматирования
+            histograms = [(key, list(h.counts), h.sum, h.count) for key, h in histograms]
+
+        lines, described = [], set()
+
+        def describe(name: str, kind: str):
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        lines.append("# TYPE bot_uptime_seconds gauge")
+        lines.append(f"bot_uptime_seconds {time.time() - self.started:.0f}")
+        for name, func in sorted(self._gauges.items()):
+            try:
+                value = func()
+            except Exception as e:
+                logging.warning(f"Gauge {name} failed: {e}")
+                continue
+            describe(name, "gauge")
+            lines.append(f"{name} {value}")
+
+        for (name, labels), value in counters:
+            describe(name, "counter")
+            lines.append(f"{name}{_labels(labels)} {value}")
+
+        for (name, labels), counts, total, count in histograms:
+            describe(name, "histogram")
+            cumulative = 0
+            for bound, bucket in zip(BUCKETS, counts):
+                cumulative += bucket
+                lines.append(f"{name}_bucket{_labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_labels(labels)} {total:.6f}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+async def start_metrics_server(host: str = METRICS_HOST, port: int = METRICS_PORT):
+    """
+    Поднимает HTTP-эндпоинт /metrics для Prometheus.
+    По умолчанию слушает только localhost; METRICS_PORT=0 отключает сервер.
+    Возвращает AppRunner (для cleanup при остановке) или None.
+    """
+    if not port:
+        return None
+
+    async def handle(request: web.Request) -> web.Response:
+        return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logging.info(f"Metrics endpoint listening on {host}:{port}/metrics")
+    return runner
+
+
+# Глобальный реестр метрик
+metrics = Metrics()
@@ -0,0 +1,60 @@
+import logging
+from utils.calendar_engine import calendar
+from config.database import db
+
+
+class OccupancyIndex:
+    """Индекс занятости слотов в памяти: битовая маска на пару (врач, дата)"""
+
+    def __init__(self):
+        self._busy = {}  # (doctor, "YYYY-MM-DD") -> int, бит i = слот i занят
+        self.version = 0  # Увеличивается при каждом изменении занятости
+
+    @staticmethod
+    async def _fetch() -> dict:
+        rows = await db.fetchall(
+            "SELECT doctor, date, slot FROM appointments WHERE date >= ? AND slot IS NOT NULL",
+            (calendar.today().isoformat(),)
+        )
+        busy = {}
+        for doctor, day, slot in rows:
+            busy[(doctor, day)] = busy.get((doctor, day), 0) | (1 << slot)
+        return busy
+
+    async def load(self):
+        """Загружает занятость будущих дней из таблицы appointments"""
+        self._busy = await self._fetch()
+        self.version += 1
+        logging.info(f"Occupancy index loaded: {len(self._busy)} doctor-days")
+
+    def is_busy(self, doctor: str, day: str, slot: int) -> bool:
+        return bool(self._busy.get((doctor, day), 0) >> slot & 1)
+
+    def busy_slots(self, doctor: str, day: str) -> set:
+        """Занятые слоты врача на указанную дату"""
+        mask = self._busy.get((doctor, day), 0)
+        return {i for i in range(len(calendar.slots)) if mask >> i & 1}
+
+    def mark(self, doctor: str, day: str, slot: int):
+        """Отмечает слот занятым (после успешной записи)"""
+        self._busy[(doctor, day)] = self._busy.get((doctor, day), 0) | (1 << slot)
+        self.version += 1
+
+    def prune(self, before: str):
+        """Забывает прошедшие даты (раньше before)"""
+        self._busy = {key: mask for key, mask in self._busy.items() if key[1] >= before}
+
+    async def verify(self) -> bool:
+        """Сверяет индекс с таблицей; при расхождении перестраивает его"""
+        actual = await self._fetch()
+        today = calendar.today().isoformat()
+        if actual == {key: mask for key, mask in self._busy.items() if key[1] >= today}:
+            return True
+        logging.warning("Occupancy index is out of sync with appointments table, rebuilding")
+        self._busy = actual
+        self.version += 1
+        return False
+
+
+# Глобальный индекс занятости
+occupancy = OccupancyIndex()
@@ -0,0 +1,199 @@
+import asyncio
+import heapq
+import logging
+import time
+from datetime import date
+from typing import Callable, Dict, List, Optional
+from config.database import db
+from config.settings import REMINDER_OFFSETS, REMINDER_BATCH_SIZE, REMINDER_RELOAD_INTERVAL
+from utils.calendar_engine import calendar
+from utils.clinic_config import clinic
+from utils.metrics import metrics
+from utils.sender import sender, PRIORITY_BULK
+from utils.shared_state import Lease, shared_state
+
+
+def _format_left(seconds: float) -> str:
+    minutes = max(1, round(seconds / 60))
+    if minutes < 120:
+        return f"{minutes} мин"
+    return f"{round(minutes / 60)} ч"
+
+
+class ReminderService:
+    """
+    Напоминания пациентам за offsets секунд до приёма.
+    Все ожидающие напоминания лежат в одной куче (срок, id записи, номер напоминания),
+    её обслуживает одна фоновая задача: спит до ближайшего срока и отправляет
+    всё наступившее пачкой. Удалённые записи отсеиваются при отправке — одной
+    проверкой пачки в БД. Отправленные напоминания отмечаются в appointments.reminders_sent,
+    поэтому после перезапуска они не повторяются, а пропущенные за время простоя — досылаются
+    (только самое позднее из них).
+    """
+
+    def __init__(
+        self,
+        offsets: List[float] = REMINDER_OFFSETS,
+        batch_size: int = REMINDER_BATCH_SIZE,
+        reload_interval: float = REMINDER_RELOAD_INTERVAL,
+        clock: Callable[[], float] = time.time
+    ):
+        self.offsets = sorted(offsets, reverse=True)  # Бит i — напоминание за offsets[i] секунд
+        self.batch_size = batch_size
+        self.reload_interval = reload_interval
+        self.clock = clock
+        self.lease = Lease("reminders")
+        self._heap = []  # (срок, id записи, бит)
+        self._appointments: Dict[int, list] = {}  # id -> [user_id, дата, время, врач, начало, ожидающих напоминаний]
+        self._loaded_at = 0.0
+        self._wake = None
+        self._task = None
+
+    def __len__(self):
+        return len(self._heap)
+
+    def _entries(self, appointment_id: int, user_id: int, day: str, slot: int, doctor: str,
+                 sent: int, created: float, now: float) -> list:
+        """Напоминания записи, которые ещё нужно отправить (created — время записи)"""
+        start = calendar.slot_datetime(date.fromisoformat(day), slot).timestamp()
+        if start <= now:
+            return []
+        entries = []
+        for bit, offset in enumerate(self.offsets):
+            fire_at = start - offset
+            if sent >> bit & 1 or fire_at <= created:
+                continue  # Уже отправлено или записались позже этого напоминания
+            if fire_at <= now:
+                # Бот был выключен: из просроченных досылаем только самое позднее
+                entries = [(now, appointment_id, bit)]
+                continue
+            entries.append((fire_at, appointment_id, bit))
+        if entries:
+            self._appointments[appointment_id] = [user_id, day, calendar.slots[slot], doctor, start, len(entries)]
+        return entries
+
+    async def load(self):
+        """Строит кучу по будущим записям из БД и запускает фоновую задачу"""
+        rows = await db.fetchall(
+            """SELECT id, user_id, date, slot, doctor, reminders_sent, CAST(strftime('%s', created_at) AS REAL)
+               FROM appointments WHERE date >= ? AND slot IS NOT NULL""",
+            (calendar.today().isoformat(),)
+        )
+        now = self.clock()
+        self._appointments = {}
+        heap = []
+        for row in rows:
+            heap.extend(self._entries(*row[:6], row[6] or 0.0, now))
+        heapq.heapify(heap)  # O(n) вместо n вставок
+        self._heap = heap
+        self._loaded_at = now
+        logging.info(f"Reminders loaded: {len(heap)} pending for {len(self._appointments)} appointments")
+
+        if self._task is None and self.offsets:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        elif self._wake is not None:
+            self._wake.set()
+
+    def add(self, appointment_id: int, user_id: int, day: str, slot: int, doctor: str):
+        """Планирует напоминания новой записи"""
+        was_first = self._heap[0][0] if self._heap else None
+        now = self.clock()
+        for entry in self._entries(appointment_id, user_id, day, slot, doctor, 0, now, now):
+            heapq.heappush(self._heap, entry)
+        # Новый ближайший срок — будим задачу, чтобы она пересчитала сон
+        if self._wake is not None and self._heap and (was_first is None or self._heap[0][0] < was_first):
+            self._wake.set()
+
+    def _pop_due(self, now: float) -> list:
+        batch = []
+        while self._heap and self._heap[0][0] <= now and len(batch) < self.batch_size:
+            _, appointment_id, bit = heapq.heappop(self._heap)
+            appointment = self._appointments[appointment_id]
+            appointment[5] -= 1
+            if not appointment[5]:
+                del self._appointments[appointment_id]
+            batch.append((bit, appointment_id, appointment))
+        return batch
+
+    async def fire_due(self) -> int:
+        """Отправляет наступившие напоминания (не больше batch_size), возвращает число отправленных"""
+        now = self.clock()
+        batch = self._pop_due(now)
+        if not batch:
+            return 0
+
+        # Записи могли удалить или напоминание мог отправить другой процесс — одна проверка на пачку
+        ids = list({appointment_id for _, appointment_id, _ in batch})
+        rows = await db.fetchall(
+            f"SELECT id, reminders_sent FROM appointments WHERE id IN ({','.join('?' * len(ids))})", ids
+        )
+        current = dict(rows)
+
+        jobs = []
+        for bit, appointment_id, (user_id, day, time_str, doctor, start, _) in batch:
+            if appointment_id not in current or current[appointment_id] >> bit & 1 or start <= now:
+                continue
+            text = (
+                f"⏰ Напоминаем о приёме через {_format_left(start - now)}\n\n"
+                f"📅 {calendar.day_label(date.fromisoformat(day))}\n"
+                f"🕒 {time_str}\n"
+                f"👨‍⚕️ {clinic.title(doctor)}"
+            )
+            jobs.append((bit, appointment_id, sender.enqueue(user_id, text, priority=PRIORITY_BULK)))
+
+        results = await asyncio.gather(*(future for _, _, future in jobs), return_exceptions=True)
+        # Отправленное напоминание закрывает и более ранние (после простоя они уже не нужны)
+        sent = [((1 << (bit + 1)) - 1, appointment_id) for (bit, appointment_id, _), result in zip(jobs, results)
+                if not isinstance(result, Exception)]
+
+        def _mark(conn, sent):
+            with conn:
+                conn.executemany("UPDATE appointments SET reminders_sent = reminders_sent | ? WHERE id = ?", sent)
+
+        if sent:
+            await db.run(_mark, sent)
+        failed = len(jobs) - len(sent)
+        metrics.inc("bot_reminders_total", len(sent), result="sent")
+        if failed:
+            metrics.inc("bot_reminders_total", failed, result="failed")  # Например, пациент заблокировал бота
+        logging.info(f"Reminders: sent {len(sent)}, failed {failed}, skipped {len(batch) - len(jobs)}")
+        return len(sent)
+
+    async def _run(self):
+        while True:
+            try:
+                now = self.clock()
+                if shared_state.shared and now - self._loaded_at >= self.reload_interval:
+                    await self.load()  # Записи, сделанные в других процессах бота
+
+                delay: Optional[float] = self._heap[0][0] - now if self._heap else None
+                if delay is not None and delay <= 0:
+                    # При нескольких процессах отправляет только держатель аренды
+                    if await self.lease.acquire():
+                        await self.fire_due()
+                        continue
+                    delay = self.reload_interval
+                if shared_state.shared:
+                    delay = min(delay, self.reload_interval) if delay is not None else self.reload_interval
+
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Error sending reminders: {e}")
+                await asyncio.sleep(60)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.lease.release()
+
+
+# Глобальная очередь напоминаний
+reminders = ReminderService()
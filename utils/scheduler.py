@@ -0,0 +1,152 @@
+import asyncio
+import logging
+from contextlib import nullcontext, suppress
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+from config.database import db
+
+
+def next_weekly(after: datetime, weekday: int, hour: int = 0, minute: int = 0) -> datetime:
+    """Ближайший момент строго после after: день недели weekday, время hour:minute"""
+    candidate = after.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    candidate += timedelta(days=(weekday - after.weekday()) % 7)
+    if candidate <= after:
+        candidate += timedelta(days=7)
+    return candidate
+
+
+def next_daily(after: datetime, hour: int = 0, minute: int = 0) -> datetime:
+    """Ближайший момент строго после after в hour:minute"""
+    candidate = after.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if candidate <= after:
+        candidate += timedelta(days=1)
+    return candidate
+
+
+class DBMarkerStore:
+    """Хранит отметки последнего запуска задач в таблице scheduler_runs"""
+
+    async def load(self, name: str) -> Optional[datetime]:
+        row = await db.fetchone("SELECT last_run FROM scheduler_runs WHERE job = ?", (name,))
+        return datetime.fromisoformat(row[0]) if row else None
+
+    async def save(self, name: str, last_run: datetime):
+        await db.execute(
+            """INSERT INTO scheduler_runs (job, last_run) VALUES (?, ?)
+               ON CONFLICT(job) DO UPDATE SET last_run = excluded.last_run""",
+            (name, last_run.isoformat())
+        )
+
+
+class PeriodicJob:
+    """
+    Периодическая задача по расписанию: спит ровно до следующего срока,
+    а сроки, пропущенные пока бот был выключен, выполняет сразу после старта.
+    Часы (clock), функция ожидания (sleep) и хранилище отметок подменяемы — для тестов.
+    С арендой (lease) задачу выполняет только ведущий из нескольких процессов бота.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        next_run: Callable[[datetime], datetime],
+        callback: Callable[[], Awaitable[None]],
+        clock: Callable[[], datetime] = datetime.now,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+        store=None,
+        retry_delay: float = 3600,
+        lease=None
+    ):
+        self.name = name
+        self.next_run = next_run
+        self.callback = callback
+        self.clock = clock
+        self.sleep = sleep
+        self.store = store or DBMarkerStore()
+        self.retry_delay = retry_delay
+        self.lease = lease
+        self.last_run = None  # Срок, за который задача выполнялась последний раз
+        self._loaded = False
+        self._running = False  # Выполняется callback — остановка дождётся его завершения
+        self._task = None
+
+    async def _load(self):
+        if self._loaded:
+            return
+        self.last_run = await self.store.load(self.name)
+        if self.last_run is None:
+            # Первый запуск: отсчитываем сроки от текущего момента, без догоняющего выполнения
+            self.last_run = self.clock()
+            await self.store.save(self.name, self.last_run)
+        self._loaded = True
+
+    def next_due(self) -> datetime:
+        return self.next_run(self.last_run)
+
+    async def run_pending(self) -> bool:
+        """Выполняет задачу, если срок наступил; несколько пропущенных сроков — одним запуском"""
+        if self.lease is not None:
+            if not await self.lease.acquire():
+                return False
+            self._loaded = False  # Задачу мог выполнить прежний ведущий — перечитываем отметку
+        await self._load()
+        now = self.clock()
+        due = self.next_due()
+        if due > now:
+            return False
+
+        # Отметкой становится последний наступивший срок, а не каждый пропущенный
+        while self.next_run(due) <= now:
+            due = self.next_run(due)
+        if due != self.next_due():
+            logging.warning(f"Job {self.name}: catching up missed run(s) up to {due}")
+
+        self._running = True
+        try:
+            async with (self.lease.keep() if self.lease is not None else nullcontext()):
+                await self.callback()
+        finally:
+            self._running = False
+        self.last_run = due
+        await self.store.save(self.name, due)
+        logging.info(f"Job {self.name} completed for {due}")
+        return True
+
+    async def run_forever(self):
+        """Основной цикл: сон до срока и запуск задачи"""
+        self._task = asyncio.current_task()
+        while True:
+            try:
+                await self.run_pending()
+                if self.lease is not None and not self.lease.held:
+                    # Задачу выполняет другой процесс; аренду проверяем каждые ttl — столько же ждать,
+                    # пока она освободится после остановки ведущего
+                    await self.sleep(self.lease.ttl)
+                    continue
+                delay = (self.next_due() - self.clock()).total_seconds()
+                if delay <= 0 and self.lease is not None:
+                    delay = self.lease.ttl  # Срок наступил, но задачу выполняет другой процесс
+                if delay > 0:
+                    await self.sleep(delay)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Error in job {self.name}: {e}")
+                await self.sleep(self.retry_delay)  # Ждем перед повторной попыткой
+
+    async def stop(self, timeout: float):
+        """Останавливает цикл; начатый запуск задачи получает до timeout секунд на завершение"""
+        task, self._task = self._task, None
+        if task is None or task.done():
+            return
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while self._running and loop.time() < deadline:
+            await asyncio.sleep(0.05)
+        if self._running:
+            logging.warning(f"Job {self.name} did not finish in {timeout}s, cancelling")
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+        if self.lease is not None:
+            await self.lease.release()  # Другой процесс станет ведущим, не дожидаясь истечения аренды
@@ -0,0 +1,190 @@
+import asyncio
+import itertools
+import logging
+import time
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter, TelegramNetworkError
+from config.settings import SEND_GLOBAL_RATE, SEND_CHAT_INTERVAL, SEND_WORKERS, SEND_MAX_RETRIES
+
+# Приоритеты очереди: меньше — раньше
+PRIORITY_REPLY = 0   # Переписка врач/пациент, поддержка
+PRIORITY_NOTIFY = 1  # Служебные уведомления администратору
+PRIORITY_BULK = 2    # Напоминания пациентам и массовые сообщения
+
+_SENDING = float("inf")  # Отметка чата, чьё сообщение ждёт общий токен
+
+
+class OutboundJob:
+    """Исходящее сообщение в очереди"""
+    __slots__ = ("chat_id", "text", "kwargs", "future", "attempts")
+
+    def __init__(self, chat_id: int, text: str, kwargs: dict, future: asyncio.Future):
+        self.chat_id = chat_id
+        self.text = text
+        self.kwargs = kwargs
+        self.future = future
+        self.attempts = 0
+
+
+class OutboundSender:
+    """
+    Единая очередь исходящих сообщений с учётом лимитов Telegram:
+    общий token bucket (~30 сообщений/с), не чаще одного сообщения в чат за интервал,
+    приоритетные полосы и автоматический повтор после RetryAfter.
+    """
+
+    def __init__(self, global_rate: float = SEND_GLOBAL_RATE, chat_interval: float = SEND_CHAT_INTERVAL,
+                 workers: int = SEND_WORKERS, max_retries: int = SEND_MAX_RETRIES):
+        self.bot = None
+        self.global_rate = global_rate
+        self.chat_interval = chat_interval
+        self.workers = workers
+        self.max_retries = max_retries
+        self._queue = None
+        self._seq = itertools.count()
+        self._tasks = []
+        self._delayed = set()     # Отложенные возвраты сообщений в очередь
+        self._tokens = float(global_rate)
+        self._refilled = time.monotonic()
+        self._paused_until = 0.0  # Глобальная пауза после 429
+        self._chat_ready = {}     # chat_id -> время, когда в чат можно писать снова
+        self.stats = {"sent": 0, "failed": 0, "retried": 0}
+
+    def init(self, bot: Bot):
+        """Инициализация с экземпляром бота"""
+        self.bot = bot
+
+    def start(self):
+        """Запускает воркеры отправки"""
+        if self._tasks:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def close(self):
+        """Дожидается отправки очереди и останавливает воркеры"""
+        if not self._tasks:
+            return
+        while True:
+            await self._queue.join()
+            if not self._delayed:
+                break
+            await asyncio.wait(set(self._delayed))
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    def queue_size(self) -> int:
+        """Сообщений в очереди и ожидающих повтора"""
+        return (self._queue.qsize() if self._queue else 0) + len(self._delayed)
+
+    def enqueue(self, chat_id: int, text: str, priority: int = PRIORITY_REPLY, **kwargs) -> asyncio.Future:
+        """
+        Ставит сообщение в очередь и сразу возвращает Future со статусом доставки:
+        результат — отправленное Message, исключение — причина отказа.
+        """
+        if not self._tasks:
+            self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._put(priority, next(self._seq), OutboundJob(chat_id, text, kwargs, future))
+        return future
+
+    async def send_message(self, chat_id: int, text: str, priority: int = PRIORITY_REPLY, **kwargs):
+        """Отправляет сообщение через очередь и ждёт результата доставки"""
+        return await self.enqueue(chat_id, text, priority, **kwargs)
+
+    def _put(self, priority: int, seq: int, job: OutboundJob):
+        self._queue.put_nowait((priority, seq, job))
+
+    async def _put_after(self, delay: float, priority: int, seq: int, job: OutboundJob):
+        await asyncio.sleep(delay)
+        self._put(priority, seq, job)
+
+    def _requeue_later(self, delay: float, priority: int, seq: int, job: OutboundJob):
+        # Исходный порядковый номер сохраняется, чтобы сообщения чата не перемешались
+        task = asyncio.create_task(self._put_after(delay, priority, seq, job))
+        self._delayed.add(task)
+        task.add_done_callback(self._delayed.discard)
+
+    async def _acquire_global(self):
+        """Ждёт свободный токен общего лимита"""
+        while True:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            self._tokens = min(self.global_rate, self._tokens + (now - self._refilled) * self.global_rate)
+            self._refilled = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.global_rate)
+
+    def _prune_chats(self, now: float):
+        if len(self._chat_ready) > 10000:
+            self._chat_ready = {chat: ready for chat, ready in self._chat_ready.items() if ready > now}
+
+    async def _worker(self):
+        while True:
+            priority, seq, job = await self._queue.get()
+            try:
+                await self._process(priority, seq, job)
+            except Exception as e:
+                logging.error(f"Outbound sender error: {e}")
+                if not job.future.done():
+                    job.future.set_exception(e)
+            finally:
+                self._queue.task_done()
+
+    async def _process(self, priority: int, seq: int, job: OutboundJob):
+        if job.future.cancelled():
+            return
+
+        # Чат ещё «остывает» или его сообщение ждёт общий токен — откладываем,
+        # не блокируя остальные чаты
+        now = time.monotonic()
+        ready = self._chat_ready.get(job.chat_id, 0.0)
+        if ready > now:
+            # Пока предыдущее сообщение чата ждёт токен, проверяем снова через время одного токена
+            delay = ready - now if ready != _SENDING else 1 / self.global_rate
+            self._requeue_later(delay, priority, seq, job)
+            return
+        self._chat_ready[job.chat_id] = _SENDING
+        self._prune_chats(now)
+
+        try:
+            await self._acquire_global()
+        finally:
+            # Интервал чата отсчитывается от отправки, а не от извлечения из очереди
+            self._chat_ready[job.chat_id] = time.monotonic() + self.chat_interval
+        job.attempts += 1
+        try:
+            message = await self.bot.send_message(chat_id=job.chat_id, text=job.text, **job.kwargs)
+        except TelegramRetryAfter as e:
+            # 429: ставим общую паузу и повторяем то же сообщение после неё
+            logging.warning(f"Flood control for chat {job.chat_id}, retry after {e.retry_after}s")
+            self.stats["retried"] += 1
+            self._paused_until = time.monotonic() + e.retry_after
+            self._chat_ready[job.chat_id] = self._paused_until
+            self._requeue_later(e.retry_after, priority, seq, job)
+            return
+        except TelegramNetworkError as e:
+            if job.attempts <= self.max_retries:
+                self.stats["retried"] += 1
+                self._requeue_later(2 ** job.attempts, priority, seq, job)
+                return
+            self.stats["failed"] += 1
+            job.future.set_exception(e)
+            return
+        except Exception as e:
+            self.stats["failed"] += 1
+            job.future.set_exception(e)
+            return
+
+        self.stats["sent"] += 1
+        if not job.future.done():
+            job.future.set_result(message)
+
+
+# Глобальный экземпляр очереди отправки
+sender = OutboundSender()
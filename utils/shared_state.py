@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import os
+import socket
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from urllib.parse import urlparse
+from config.settings import REDIS_URL, REDIS_POOL_SIZE, LEADER_LEASE_TTL
+
+
+class RedisError(Exception):
+    """Ошибка, которую вернул сервер Redis"""
+
+
+def _encode(args) -> bytes:
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+async def _read_reply(reader: asyncio.StreamReader):
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Redis connection closed")
+    kind, payload = line[:1], line[1:-2]
+    if kind == b"+":
+        return payload.decode()
+    if kind == b"-":
+        return RedisError(payload.decode())  # Не бросаем сразу: остальные ответы конвейера нужно дочитать
+    if kind == b":":
+        return int(payload)
+    if kind == b"$":
+        length = int(payload)
+        if length < 0:
+            return None
+        return (await reader.readexactly(length + 2))[:-2].decode()
+    if kind == b"*":
+        length = int(payload)
+        if length < 0:
+            return None
+        return [await _read_reply(reader) for _ in range(length)]
+    raise ConnectionError(f"Unexpected Redis reply: {line!r}")
+
+
+class RedisClient:
+    """
+    Минимальный асинхронный клиент протокола Redis (RESP2): пул соединений
+    и конвейер команд. Поддерживает адреса вида redis://[:пароль@]хост:порт/база.
+    """
+
+    def __init__(self, url: str, pool_size: int = REDIS_POOL_SIZE):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.database = int(parsed.path.lstrip("/") or 0)
+        self.pool_size = pool_size
+        self._idle = []  # Свободные соединения (reader, writer)
+        self._slots = None
+
+    async def _connect(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.database:
+            setup.append(("SELECT", self.database))
+        if setup:
+            writer.write(b"".join(_encode(command) for command in setup))
+            for _ in setup:
+                reply = await _read_reply(reader)
+                if isinstance(reply, RedisError):
+                    writer.close()
+                    raise reply
+        return reader, writer
+
+    async def pipeline(self, *commands) -> List:
+        """Отправляет команды одним пакетом и возвращает их ответы (одна сетевая задержка на все)"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.pool_size)
+        async with self._slots:
+            conn = self._idle.pop() if self._idle else await self._connect()
+            reader, writer = conn
+            try:
+                writer.write(b"".join(_encode(command) for command in commands))
+                await writer.drain()
+                replies = [await _read_reply(reader) for _ in commands]
+            except BaseException:
+                # Состояние соединения неизвестно (в том числе при отмене) — не возвращаем его в пул
+                writer.close()
+                raise
+            self._idle.append(conn)
+
+        for reply in replies:
+            if isinstance(reply, RedisError):
+                raise reply
+        return replies
+
+    async def execute(self, *args):
+        return (await self.pipeline(args))[0]
+
+    async def close(self):
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+
+
+# Аренда продлевается, только если её держит тот же владелец
+_ACQUIRE_LEASE = """
+local owner = redis.call('GET', KEYS[1])
+if not owner then
+    redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+    return 1
+end
+if owner == ARGV[1] then
+    redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    return 1
+end
+return 0
+"""
+
+_RELEASE_LEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class SharedState:
+    """
+    Состояние, общее для процессов бота. Без адреса Redis бот работает одним
+    процессом: FSM хранится в SQLite, антифлуд — в памяти, а процесс всегда ведущий.
+    С Redis несколько вебхук-процессов обслуживают один токен, а периодические
+    задачи выполняет только держатель аренды.
+    """
+
+    def __init__(self, url: str = REDIS_URL):
+        self.redis: Optional[RedisClient] = RedisClient(url) if url else None
+
+    @property
+    def shared(self) -> bool:
+        return self.redis is not None
+
+    async def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        """Получает или продлевает аренду name на ttl секунд; False — её держит другой процесс"""
+        if self.redis is None:
+            return True
+        granted = await self.redis.execute("EVAL", _ACQUIRE_LEASE, 1, f"lease:{name}", owner, int(ttl * 1000))
+        return granted == 1
+
+    async def release_lease(self, name: str, owner: str):
+        if self.redis is not None:
+            await self.redis.execute("EVAL", _RELEASE_LEASE, 1, f"lease:{name}", owner)
+
+    async def close(self):
+        if self.redis is not None:
+            await self.redis.close()
+
+
+class Lease:
+    """
+    Аренда роли ведущего для задачи name: выполнять её может только процесс,
+    получивший аренду. Если ведущий процесс остановится, аренду через ttl
+    получит другой.
+    """
+
+    def __init__(self, name: str, ttl: float = LEADER_LEASE_TTL, state: Optional[SharedState] = None):
+        self.name = name
+        self.ttl = ttl
+        self.state = state or shared_state
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{id(self)}"
+        self.held = False
+
+    async def acquire(self) -> bool:
+        try:
+            held = await self.state.acquire_lease(self.name, self.owner, self.ttl)
+        except (OSError, RedisError) as e:
+            logging.error(f"Lease {self.name}: {e}")
+            held = False
+        if held != self.held:
+            logging.info(f"Lease {self.name} {'acquired' if held else 'lost'} by {self.owner}")
+        self.held = held
+        return held
+
+    async def release(self):
+        if not self.held:
+            return
+        self.held = False
+        try:
+            await self.state.release_lease(self.name, self.owner)
+        except (OSError, RedisError) as e:
+            logging.error(f"Lease {self.name}: {e}")
+
+    @asynccontextmanager
+    async def keep(self):
+        """Продлевает аренду, пока выполняется тело блока (задача может идти дольше ttl)"""
+        async def _renew():
+            while True:
+                await asyncio.sleep(self.ttl / 3)
+                if not await self.acquire():
+                    logging.warning(f"Lease {self.name} lost while the job is running")
+
+        task = asyncio.create_task(_renew())
+        try:
+            yield
+        finally:
+            task.cancel()
+
+
+# Глобальное общее состояние процесса
+shared_state = SharedState()
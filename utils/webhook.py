@@ -0,0 +1,48 @@
+import asyncio
+import logging
+import secrets
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from config.settings import WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_SECRET
+from utils.shared_state import shared_state
+
+
+def create_webhook_app(dp: Dispatcher, bot: Bot, secret_token: str) -> web.Application:
+    """aiohttp-приложение, принимающее обновления Telegram и передающее их диспетчеру"""
+    app = web.Application()
+    # Запросы без правильного X-Telegram-Bot-Api-Secret-Token отклоняются (401)
+    SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=secret_token).register(app, path=WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot):
+    """Запускает встроенный веб-сервер и регистрирует вебхук в Telegram"""
+    if not WEBHOOK_URL:
+        raise RuntimeError("WEBHOOK_URL is required in webhook mode")
+
+    # Несколько процессов регистрируют один вебхук — случайный секрет каждого отменял бы секреты остальных
+    if shared_state.shared and not WEBHOOK_SECRET:
+        raise RuntimeError("WEBHOOK_SECRET is required when several bot processes share state")
+
+    # Если секрет не задан, генерируем его на время работы процесса
+    secret_token = WEBHOOK_SECRET or secrets.token_urlsafe(32)
+
+    app = create_webhook_app(dp, bot, secret_token)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    # С общим состоянием процессы слушают один порт, ядро распределяет между ними соединения
+    site = web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT, reuse_port=shared_state.shared or None)
+    await site.start()
+    logging.info(f"Webhook server listening on {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+
+    try:
+        await bot.set_webhook(
+            url=f"{WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}",
+            secret_token=secret_token,
+            allowed_updates=dp.resolve_used_update_types()
+        )
+        await asyncio.Event().wait()  # Работаем до отмены задачи
+    finally:
+        await runner.cleanup()
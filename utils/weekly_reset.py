@@ -1,119 +1,91 @@
-import sqlite3
-from datetime import datetime, timedelta
-import asyncio
+from datetime import date
 import logging
 from aiogram import Bot
-from config.settings import ADMIN_ID
+from config.settings import ADMIN_ID, ARCHIVE_BATCH_SIZE
+from config.database import db
+from utils.calendar_engine import calendar
+from utils.occupancy import occupancy
+from utils.sender import sender, PRIORITY_NOTIFY
+from utils.scheduler import PeriodicJob, next_daily
+from utils.shared_state import Lease
 
 class WeekManager:
     def __init__(self):
         self.bot = None
-        self.db_path = "clinic.db"
-        self.day_map = {
-            "Понедельник": 0,
-            "Вторник": 1, 
-            "Среда": 2,
-            "Четверг": 3,
-            "Пятница": 4
-        }
-        self.last_reset_date = None  # Дата последнего сброса
+        self.archive_job = None
 
     def init(self, bot: Bot):
         """Инициализация с экземпляром бота"""
         self.bot = bot
     
-    async def schedule_reset(self):
-        """Запускает еженедельный сброс в субботу в 00:00"""
+    async def schedule_archive(self):
+        """Ежедневно в 00:00 переносит прошедшие записи в архив (пропущенный запуск выполняется при старте)"""
+        self.archive_job = PeriodicJob(
+            name="archive_past",
+            next_run=next_daily,
+            callback=self.archive_past_appointments,
+            lease=Lease("archive_past")  # При нескольких процессах архивирует только один
+        )
+        await self.archive_job.run_forever()
+
+    async def stop(self, timeout: float):
+        """Останавливает планировщик, дав идущей архивации завершиться"""
+        if self.archive_job is not None:
+            await self.archive_job.stop(timeout)
+
+    @staticmethod
+    def _archive_batch(conn, before: str, batch_size: int) -> int:
+        """Переносит в архив одну пачку записей на даты раньше before, возвращает её размер"""
+        with conn:
+            ids = [row[0] for row in conn.execute(
+                "SELECT id FROM appointments WHERE date < ? OR date IS NULL ORDER BY id LIMIT ?",
+                (before, batch_size)
+            )]
+            if not ids:
+                return 0
+            placeholders = ",".join("?" * len(ids))
+            # Неделя записи — понедельник недели её даты; для старых записей без даты
+            # считаем от created_at (в выходные записывались на следующую неделю)
+            conn.execute(
+                f"""INSERT OR IGNORE INTO appointments_archive
+                        (id, user_id, day, time, doctor, created_at, date, slot, week_start)
+                    SELECT id, user_id, day, time, doctor, created_at, date, slot,
+                           COALESCE(date(date, '-6 days', 'weekday 1'),
+                                    date(created_at, 'localtime', '-4 days', 'weekday 1'))
+                    FROM appointments WHERE id IN ({placeholders})""",
+                ids
+            )
+            conn.execute(f"DELETE FROM appointments WHERE id IN ({placeholders})", ids)
+            return len(ids)
+
+    async def archive_appointments(self, before: date) -> int:
+        """Переносит записи на даты раньше before в архив небольшими транзакциями"""
+        # Между пачками блокировка записи освобождается, и новые записи не ждут конца архивации
+        total = 0
         while True:
-            try:
-                now = datetime.now()
-                current_date = now.date()
-
-                # Проверяем, что сегодня суббота (5) и сброс еще не выполнялся
-                if now.weekday() == 5 and self.last_reset_date != current_date:
-                    # Вычисляем время до 00:00
-                    time_until_midnight = (now.replace(hour=0, minute=0, second=0, microsecond=0) 
-                                         + timedelta(days=1) - now).total_seconds()
-
-                    # Ждем до 00:00
-                    if time_until_midnight > 0:
-                        await asyncio.sleep(time_until_midnight)
-
-                    # Выполняем сброс
-                    await self.reset_database()
-                    self.last_reset_date = current_date
-
-                    # Ждем 24 часа перед следующей проверкой
-                    await asyncio.sleep(86400)
-                else:
-                    # Ждем 1 час до следующей проверки
-                    await asyncio.sleep(3600)
-                    
-            except Exception as e:
-                logging.error(f"Error in schedule_reset: {e}")
-                await asyncio.sleep(3600)  # Ждем час перед повторной попыткой
-    
-    async def reset_database(self):
-        """Очищает таблицу записей и уведомляет админа"""
-        conn = None
+            moved = await db.run(self._archive_batch, before.isoformat(), ARCHIVE_BATCH_SIZE)
+            if not moved:
+                break
+            total += moved
+        return total
+
+    async def archive_past_appointments(self):
+        """Архивирует записи на прошедшие даты; живая таблица хранит только будущие"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            # Проверяем количество записей перед удалением
-            cursor.execute("SELECT COUNT(*) FROM appointments")
-            count = cursor.fetchone()[0]
-
-            if count > 0:
-                cursor.execute("DELETE FROM appointments")
-                conn.commit()
-                logging.info(f"Cleared {count} appointments from database")
-
-                if self.bot and ADMIN_ID:
-                    try:
-                        await self.bot.send_message(
-                            chat_id=ADMIN_ID,
-                            text=f"🔄 База очищена. Удалено {count} записей"
-                        )
-                    except Exception as e:
-                        logging.error(f"Notification error: {e}")
-            else:
-                logging.info("No appointments to clear - database was empty")
+            today = calendar.today()
+            count = await self.archive_appointments(today)
+            occupancy.prune(today.isoformat())
+            logging.info(f"Archived {count} past appointments")
 
         except Exception as e:
-            logging.error(f"Error resetting database: {e}")
+            logging.error(f"Error archiving appointments: {e}")
             if self.bot and ADMIN_ID:
-                await self.bot.send_message(
+                await sender.send_message(
                     chat_id=ADMIN_ID,
-                    text=f"❌ Ошибка при очистке базы: {str(e)}"
+                    text=f"❌ Ошибка при архивации записей: {str(e)}",
+                    priority=PRIORITY_NOTIFY
                 )
-        finally:
-            if conn:
-                conn.close()
-
-    def is_day_available(self, day_name: str) -> bool:
-        """Проверяет доступность дня для записи"""
-        try:
-            today = datetime.now().weekday()
-
-            # Если сейчас суббота (5) или воскресенье (6) - все дни доступны
-            if today >= 5:
-                return True
-
-            # Проверяем, что день существует в нашем словаре
-            if day_name not in self.day_map:
-                return False
-
-            return self.day_map[day_name] >= today
-
-        except Exception as e:
-            logging.error(f"Error in is_day_available: {e}")
-            return False
-
-    def get_current_weekday(self) -> str:
-        """Возвращает текущий день недели на русском"""
-        days = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота", "Воскресенье"]
-        return days[datetime.now().weekday()]
+            raise  # Планировщик повторит архивацию позже
 
 # Глобальный экземпляр менеджера
 week_manager = WeekManager()